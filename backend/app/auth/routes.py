@@ -1,6 +1,7 @@
 from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel, EmailStr, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.auth.service import (
     forgot_password, login_user, logout_user, refresh_access_token,
@@ -8,7 +9,7 @@ from app.auth.service import (
     verify_email, verify_login_challenge, verify_totp_login_challenge, update_user_profile,
 )
 from app.core.request_context import get_request_context
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 
 router = APIRouter(tags=["auth"])
 
@@ -59,9 +60,9 @@ def resend(p: ResendRequest, db: Session = Depends(get_db)):
     return resend_verification_code(db, p.email)
 
 @router.post("/login")
-def login(p: LoginRequest, request: Request, db: Session = Depends(get_db)):
+async def login(p: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     ctx = get_request_context(request)
-    return login_user(db, p.email, p.password, ip=ctx.ip_address, ua=ctx.user_agent)
+    return await login_user(db, p.email, p.password, ip=ctx.ip_address, ua=ctx.user_agent)
 
 @router.post("/login/challenge")
 def challenge(p: ChallengeRequest, request: Request, db: Session = Depends(get_db)):
@@ -83,9 +84,9 @@ def reset(p: ResetPasswordRequest, db: Session = Depends(get_db)):
     return reset_password(db, p.email, p.code, p.new_password)
 
 @router.post("/refresh")
-def refresh(p: RefreshRequest, request: Request, db: Session = Depends(get_db)):
+async def refresh(p: RefreshRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     ctx = get_request_context(request)
-    return refresh_access_token(db, p.refresh_token, ip=ctx.ip_address, ua=ctx.user_agent)
+    return await refresh_access_token(db, p.refresh_token, ip=ctx.ip_address, ua=ctx.user_agent)
 
 @router.post("/logout")
 def logout(p: LogoutRequest, request: Request, db: Session = Depends(get_db)):
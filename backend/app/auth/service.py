@@ -6,7 +6,10 @@ from datetime import datetime, timedelta
 from uuid import UUID, uuid4
 
 from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.auth.models import RefreshToken, User
 from app.core.adaptive_security import compute_login_risk, prune_security_artifacts
@@ -225,48 +228,50 @@ def resend_verification_code(db: Session, email: str) -> dict:
 
 # ─── Login — ALWAYS requires OTP ─────────────────────────────────────────────
 
-def login_user(db: Session, email: str, password: str, *, ip: str, ua: str) -> dict:
+async def login_user(db: AsyncSession, email: str, password: str, *, ip: str, ua: str) -> dict:
     norm = email.lower().strip()
     now  = datetime.utcnow()
 
-    try: prune_security_artifacts(db, now=now)
-    except Exception: db.rollback()
+    # Query-only helpers run over the async connection via run_sync; the
+    # argon2 check and the email send are blocking and go to the threadpool.
+    try: await db.run_sync(prune_security_artifacts, now=now)
+    except Exception: await db.rollback()
 
-    user = db.query(User).filter(User.email == norm).first()
+    user = (await db.execute(select(User).where(User.email == norm))).scalars().first()
 
     # Rate-limit / block check (adaptive security)
-    risk = compute_login_risk(db, user=user, email=norm, ip_address=ip, user_agent=ua, now=now)
+    risk = await db.run_sync(compute_login_risk, user=user, email=norm, ip_address=ip, user_agent=ua, now=now)
     if risk.action == "block_temporarily" and risk.cooldown_until:
         secs = max(1, int((risk.cooldown_until - now).total_seconds()))
-        _log(db, email=norm, ip=ip, ua=ua, success=False, user=user, reason=f"cooldown:{secs}s")
-        db.commit()
+        await db.run_sync(_log, email=norm, ip=ip, ua=ua, success=False, user=user, reason=f"cooldown:{secs}s")
+        await db.commit()
         raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, detail={"message": "Too many attempts. Try again shortly.", "retry_after_seconds": secs})
 
     if user and user.disabled:
-        _log(db, email=norm, ip=ip, ua=ua, success=False, user=user, reason="disabled")
-        db.commit()
+        await db.run_sync(_log, email=norm, ip=ip, ua=ua, success=False, user=user, reason="disabled")
+        await db.commit()
         raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Account disabled")
 
-    if not user or not verify_password(password, user.password_hash):
-        _log(db, email=norm, ip=ip, ua=ua, success=False, user=user, reason="bad_credentials")
-        db.commit()
+    if not user or not await run_in_threadpool(verify_password, password, user.password_hash):
+        await db.run_sync(_log, email=norm, ip=ip, ua=ua, success=False, user=user, reason="bad_credentials")
+        await db.commit()
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
     if not user.email_verified:
-        _log(db, email=norm, ip=ip, ua=ua, success=False, user=user, reason="email_not_verified")
-        db.commit()
+        await db.run_sync(_log, email=norm, ip=ip, ua=ua, success=False, user=user, reason="email_not_verified")
+        await db.commit()
         raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Please verify your email before signing in")
 
     # ── ALWAYS send OTP challenge ──
-    otp = _create_otp(db, user, OTP_LOGIN)
-    email_sent = _try_send(get_email_service().send_otp_email, user.email, otp)
+    otp = await db.run_sync(_create_otp, user, OTP_LOGIN)
+    email_sent = await run_in_threadpool(_try_send, get_email_service().send_otp_email, user.email, otp)
 
-    _log(db, email=norm, ip=ip, ua=ua, success=False, user=user, reason="otp_challenge_sent")
-    db.commit()
+    await db.run_sync(_log, email=norm, ip=ip, ua=ua, success=False, user=user, reason="otp_challenge_sent")
+    await db.commit()
 
     # Check if user has a passkey set
     from app.db.models import Passkey
-    has_passkey = db.query(Passkey).filter(Passkey.user_id == user.id).first() is not None
+    has_passkey = (await db.execute(select(Passkey.id).where(Passkey.user_id == user.id).limit(1))).first() is not None
 
     return {
         "challenge_required": True,
@@ -420,7 +425,7 @@ def reset_password(db: Session, email: str, code: str, new_password: str) -> dic
 
 # ─── Token Refresh ────────────────────────────────────────────────────────────
 
-def refresh_access_token(db: Session, refresh_token: str, *, ip: str, ua: str) -> dict:
+async def refresh_access_token(db: AsyncSession, refresh_token: str, *, ip: str, ua: str) -> dict:
     payload = decode_refresh_token(refresh_token)
     if not payload:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
@@ -431,22 +436,24 @@ def refresh_access_token(db: Session, refresh_token: str, *, ip: str, ua: str) -
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
     from app.auth.models import RefreshToken as RT
-    session = db.query(RT).filter(RT.id == session_uuid, RT.user_id == user_uuid, RT.revoked.is_(False)).first()
+    session = (await db.execute(
+        select(RT).where(RT.id == session_uuid, RT.user_id == user_uuid, RT.revoked.is_(False))
+    )).scalars().first()
     if not session:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Session not found or revoked")
     if session.expires_at <= datetime.utcnow():
-        session.revoked = True; session.revoked_at = datetime.utcnow(); session.revoked_reason = "expired"; db.commit()
+        session.revoked = True; session.revoked_at = datetime.utcnow(); session.revoked_reason = "expired"; await db.commit()
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Session expired")
     if not verify_token_hash(refresh_token, session.refresh_token_hash):
-        session.revoked = True; session.revoked_at = datetime.utcnow(); session.revoked_reason = "security"; db.commit()
+        session.revoked = True; session.revoked_at = datetime.utcnow(); session.revoked_reason = "security"; await db.commit()
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    user = db.query(User).filter(User.id == user_uuid).first()
+    user = (await db.execute(select(User).where(User.id == user_uuid))).scalars().first()
     if not user or user.disabled:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="User unavailable")
 
-    tokens = _issue_tokens(db, user, ip=ip, ua=ua, existing=session)
-    db.commit()
+    tokens = await db.run_sync(_issue_tokens, user, ip=ip, ua=ua, existing=session)
+    await db.commit()
     return {"user": _serialize(user), **tokens}
 
 
@@ -0,0 +1,293 @@
+"""
+Vault blob storage backends
+===========================
+Where .syncveil containers live once they leave the upload pipeline.
+
+Backends (VAULT_STORAGE_BACKEND):
+  postgresql  Inline in vault_files.encrypted_data (legacy default).  Not a
+              BlobStore — the bytes travel with the row, so callers handle
+              it directly.
+  filesystem  Content-addressed tree under VAULT_BLOB_DIR:
+                <root>/ab/cd/abcd…  (name = SHA-256 of the container)
+  s3          Any S3-compatible object store (AWS, MinIO, R2, …) via boto3,
+              keyed <VAULT_S3_PREFIX><sha256>.  Set VAULT_S3_ENDPOINT_URL to
+              point at a local MinIO for development.
+
+Rows record storage_backend + storage_locator (the container SHA-256 hex).
+Containers carry their own HMAC, so a store only has to return the bytes it
+was given; it does not need to be trusted for integrity.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.core.config import get_settings
+
+INLINE_BACKEND = "postgresql"
+_COPY_BLOCK    = 1024 * 1024
+
+
+class BlobNotFound(LookupError):
+    pass
+
+
+class BlobStore(ABC):
+    """Minimal content-addressed blob store interface."""
+
+    name = ""
+
+    @abstractmethod
+    def put(self, source: BinaryIO) -> str:
+        """Store everything readable from source (from its current position); return the locator."""
+
+    @abstractmethod
+    def open(self, locator: str) -> BinaryIO:
+        """Return a seekable binary stream over the blob.  Caller closes it."""
+
+    def open_sequential(self, locator: str) -> BinaryIO:
+        """Return a forward-only stream — the cheapest way to read a whole blob."""
+        return self.open(locator)
+
+    @abstractmethod
+    def delete(self, locator: str) -> None:
+        """Remove the blob; missing blobs are not an error."""
+
+    @abstractmethod
+    def exists(self, locator: str) -> bool:
+        """Whether a blob is stored under locator."""
+
+
+def _check_locator(locator: str) -> str:
+    if len(locator) != 64 or any(c not in "0123456789abcdef" for c in locator):
+        raise ValueError(f"Invalid blob locator: {locator!r}")
+    return locator
+
+
+# ── Filesystem ────────────────────────────────────────────────────────────────
+
+class FilesystemBlobStore(BlobStore):
+    """Content-addressed directory tree; writes are atomic via rename."""
+
+    name = "filesystem"
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        self._tmp = self.root / ".incoming"
+        self._tmp.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, locator: str) -> Path:
+        _check_locator(locator)
+        return self.root / locator[:2] / locator[2:4] / locator
+
+    def put(self, source: BinaryIO) -> str:
+        sha = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    block = source.read(_COPY_BLOCK)
+                    if not block:
+                        break
+                    sha.update(block)
+                    out.write(block)
+                out.flush()
+                os.fsync(out.fileno())
+            locator = sha.hexdigest()
+            dest = self._path(locator)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, dest)
+            return locator
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def open(self, locator: str) -> BinaryIO:
+        try:
+            return open(self._path(locator), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(locator)
+
+    def delete(self, locator: str) -> None:
+        try:
+            self._path(locator).unlink()
+        except FileNotFoundError:
+            pass
+
+    def exists(self, locator: str) -> bool:
+        return self._path(locator).is_file()
+
+
+# ── S3-compatible ─────────────────────────────────────────────────────────────
+
+class _S3RangeReader(io.RawIOBase):
+    """Seekable raw stream over one object, served by ranged GETs.
+
+    Wrapped in a BufferedReader by S3BlobStore.open(), so sequential
+    container parsing turns into one GET per buffer, and range downloads
+    only fetch the frames they need.
+    """
+
+    def __init__(self, client, bucket: str, key: str, size: int):
+        self._client = client
+        self._bucket = bucket
+        self._key    = key
+        self._size   = size
+        self._pos    = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buf) -> int:
+        if self._pos >= self._size or len(buf) == 0:
+            return 0
+        end  = min(self._pos + len(buf), self._size) - 1
+        resp = self._client.get_object(Bucket=self._bucket, Key=self._key,
+                                       Range=f"bytes={self._pos}-{end}")
+        data = resp["Body"].read()
+        n = len(data)
+        buf[:n] = data
+        self._pos += n
+        return n
+
+
+def _s3_missing(exc: Exception) -> bool:
+    return getattr(exc, "response", {}).get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+class S3BlobStore(BlobStore):
+    name = "s3"
+
+    def __init__(self, *, bucket: str, prefix: str = "", endpoint_url: str = "",
+                 region: str = "", access_key: str = "", secret_key: str = ""):
+        try:
+            import boto3  # type: ignore
+        except ImportError:
+            raise RuntimeError("boto3 is required for VAULT_STORAGE_BACKEND=s3")
+        if not bucket:
+            raise RuntimeError("VAULT_S3_BUCKET is required for VAULT_STORAGE_BACKEND=s3")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+        )
+
+    def _key(self, locator: str) -> str:
+        return self.prefix + _check_locator(locator)
+
+    def put(self, source: BinaryIO) -> str:
+        # The key is the content hash, so hash first.  Non-seekable sources
+        # are spooled to a temp file; upload sinks are already seekable.
+        spool: Optional[BinaryIO] = None
+        if not source.seekable():
+            spool = tempfile.TemporaryFile()
+            shutil.copyfileobj(source, spool, _COPY_BLOCK)
+            spool.seek(0)
+            source = spool
+        try:
+            start = source.tell()
+            sha = hashlib.sha256()
+            for block in iter(lambda: source.read(_COPY_BLOCK), b""):
+                sha.update(block)
+            locator = sha.hexdigest()
+            source.seek(start)
+            self._client.upload_fileobj(source, self.bucket, self._key(locator))
+            return locator
+        finally:
+            if spool is not None:
+                spool.close()
+
+    def _size(self, locator: str) -> int:
+        try:
+            head = self._client.head_object(Bucket=self.bucket, Key=self._key(locator))
+        except Exception as exc:
+            if _s3_missing(exc):
+                raise BlobNotFound(locator)
+            raise
+        return int(head["ContentLength"])
+
+    def open(self, locator: str) -> BinaryIO:
+        raw = _S3RangeReader(self._client, self.bucket, self._key(locator), self._size(locator))
+        # One buffer ≈ one SSCE frame, so streaming reads cost ~one GET per frame
+        return io.BufferedReader(raw, buffer_size=2 * 1024 * 1024)
+
+    def open_sequential(self, locator: str) -> BinaryIO:
+        # One streaming GET instead of a ranged GET per buffer refill
+        try:
+            resp = self._client.get_object(Bucket=self.bucket, Key=self._key(locator))
+        except Exception as exc:
+            if _s3_missing(exc):
+                raise BlobNotFound(locator)
+            raise
+        return resp["Body"]
+
+    def delete(self, locator: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(locator))
+
+    def exists(self, locator: str) -> bool:
+        try:
+            self._size(locator)
+            return True
+        except BlobNotFound:
+            return False
+
+
+# ── Factory ───────────────────────────────────────────────────────────────────
+
+@lru_cache()
+def get_blob_store(name: str) -> BlobStore:
+    """Return the (process-wide) store for a backend name.
+
+    Rows written under an older VAULT_STORAGE_BACKEND keep their own
+    backend name, so any configured backend must stay constructible.
+    """
+    settings = get_settings()
+    if name == "filesystem":
+        root = settings.VAULT_BLOB_DIR or os.path.join(settings.VAULT_STORAGE_DIR, "containers")
+        return FilesystemBlobStore(root)
+    if name == "s3":
+        return S3BlobStore(
+            bucket       = settings.VAULT_S3_BUCKET,
+            prefix       = settings.VAULT_S3_PREFIX,
+            endpoint_url = settings.VAULT_S3_ENDPOINT_URL,
+            region       = settings.VAULT_S3_REGION,
+            access_key   = settings.VAULT_S3_ACCESS_KEY,
+            secret_key   = settings.VAULT_S3_SECRET_KEY,
+        )
+    raise ValueError(f"Unknown blob storage backend: {name!r}")
+
+
+def active_backend() -> str:
+    """Backend new uploads are written to."""
+    return get_settings().VAULT_STORAGE_BACKEND
@@ -0,0 +1,221 @@
+"""
+SSCE compression policy
+=======================
+Decides, once per container, how hard zstd should work on a payload.
+
+Already-compressed media (JPEG, MP4, ZIP/Office, gzip, …) gains ~0% from
+zstd but still pays for it, so the policy picks one of:
+
+  none       store frames raw
+  zstd-fast  level 1 — for mixed or borderline content
+  zstd       level 3 — the long-standing default
+  zstd-high  level 12 — small, highly redundant files (text, JSON, CSV)
+             where the extra CPU is bounded by the file size
+
+Signals, cheapest first:
+  1. magic bytes of the first chunk (trusted over the client's content_type)
+  2. the declared content_type
+  3. a Shannon-entropy probe over a sample of the first chunk
+
+The choice is recorded in ContainerMetadata.compression and
+VaultFile.compression_type.  Readers never depend on it — every v2 frame
+carries its own compressed flag — so the policy can change freely.  Whole
+files up to 64 KB may also use a trained dictionary, recorded as
+ContainerMetadata.dict_id (see app.core.zstd_dicts).
+
+VAULT_COMPRESSION pins a mode for every upload (none | fast | default |
+high); the default "auto" runs the policy.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import zstandard as zstd
+
+from app.core.config import get_settings
+
+
+@dataclass(frozen=True)
+class CompressionChoice:
+    name:   str              # recorded in metadata / compression_type
+    level:  int = 0          # zstd level; 0 with name "none" = store raw
+    reason: str = ""
+
+    @property
+    def enabled(self) -> bool:
+        return self.name != "none"
+
+
+NONE = CompressionChoice("none")
+FAST = CompressionChoice("zstd-fast", 1)
+DEFAULT = CompressionChoice("zstd", 3)
+HIGH = CompressionChoice("zstd-high", 12)
+
+_FIXED = {"none": NONE, "fast": FAST, "default": DEFAULT, "high": HIGH}
+
+PROBE_BYTES          = 16 * 1024   # sample size for the entropy probe
+ENTROPY_INCOMPRESSIBLE = 7.5       # bits/byte — random, encrypted or packed data
+ENTROPY_BORDERLINE     = 6.5       # above this zstd gains little; keep it cheap
+ENTROPY_REDUNDANT      = 5.0       # below this (text, markup) a high level pays off
+HIGH_LEVEL_MAX_BYTES   = 1024 * 1024
+
+# (offset, signature) → already compressed
+_COMPRESSED_MAGIC: tuple[tuple[int, bytes], ...] = (
+    (0, b"\xff\xd8\xff"),              # JPEG
+    (0, b"\x89PNG\r\n\x1a\n"),         # PNG
+    (0, b"GIF8"),                      # GIF
+    (8, b"WEBP"),                      # RIFF....WEBP
+    (4, b"ftyp"),                      # MP4 / MOV / HEIC / AVIF
+    (0, b"\x1a\x45\xdf\xa3"),          # Matroska / WebM
+    (0, b"OggS"),                      # Ogg
+    (0, b"ID3"),                       # MP3 with ID3 tag
+    (0, b"fLaC"),                      # FLAC
+    (0, b"PK\x03\x04"),                # ZIP, DOCX/XLSX/PPTX, JAR, APK, EPUB
+    (0, b"\x1f\x8b"),                  # gzip
+    (0, b"\x28\xb5\x2f\xfd"),          # zstd
+    (0, b"\xfd7zXZ\x00"),              # xz
+    (0, b"BZh"),                       # bzip2
+    (0, b"7z\xbc\xaf\x27\x1c"),        # 7-Zip
+    (0, b"Rar!\x1a\x07"),              # RAR
+    (0, b"wOF2"),                      # WOFF2
+)
+
+_COMPRESSED_TYPES = {
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/x-7z-compressed", "application/x-rar-compressed",
+    "application/vnd.rar", "application/x-xz", "application/x-bzip2",
+    "application/zstd", "application/java-archive", "application/epub+zip",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+_UNCOMPRESSED_MEDIA = {"image/bmp", "image/svg+xml", "image/tiff", "audio/wav", "audio/x-wav"}
+
+
+def _sniff_compressed(head: bytes) -> bool:
+    return any(head[off:off + len(sig)] == sig for off, sig in _COMPRESSED_MAGIC)
+
+
+def _declared_compressed(content_type: str) -> bool:
+    ct = (content_type or "").split(";", 1)[0].strip().lower()
+    if ct in _COMPRESSED_TYPES:
+        return True
+    if ct in _UNCOMPRESSED_MEDIA:
+        return False
+    return ct.startswith(("image/", "video/", "audio/"))
+
+
+def shannon_entropy(sample: bytes) -> float:
+    """Bits per byte, 0.0 – 8.0."""
+    if not sample:
+        return 0.0
+    n = len(sample)
+    return -sum(c / n * math.log2(c / n) for c in (sample.count(b) for b in range(256)) if c)
+
+
+def choose(content_type: str, first_chunk: bytes, *, whole_file: bool = False,
+           mode: Optional[str] = None) -> CompressionChoice:
+    """Pick a compression setting from the declared type and the first chunk.
+
+    whole_file: first_chunk is the entire plaintext, so its size bounds the
+    cost of a high compression level.
+    """
+    mode = mode or get_settings().VAULT_COMPRESSION
+    if mode != "auto":
+        return _FIXED[mode]
+
+    if not first_chunk:
+        return NONE
+    if _sniff_compressed(first_chunk[:16]):
+        return CompressionChoice(NONE.name, reason="magic")
+
+    entropy = shannon_entropy(first_chunk[:PROBE_BYTES])
+    if entropy >= ENTROPY_INCOMPRESSIBLE:
+        return CompressionChoice(NONE.name, reason=f"entropy={entropy:.2f}")
+    if _declared_compressed(content_type) and entropy >= ENTROPY_BORDERLINE:
+        return CompressionChoice(NONE.name, reason="content-type")
+    if entropy >= ENTROPY_BORDERLINE:
+        return CompressionChoice(FAST.name, FAST.level, f"entropy={entropy:.2f}")
+    if entropy < ENTROPY_REDUNDANT and whole_file and len(first_chunk) <= HIGH_LEVEL_MAX_BYTES:
+        return CompressionChoice(HIGH.name, HIGH.level, f"entropy={entropy:.2f}")
+    return CompressionChoice(DEFAULT.name, DEFAULT.level, f"entropy={entropy:.2f}")
+
+
+# ── Dictionaries ──────────────────────────────────────────────────────────────
+# Small files compress poorly on their own; a dictionary trained on similar
+# uploads primes zstd with their common structure.  Persistence and training
+# live in app.core.zstd_dicts, which plugs a loader and an "active
+# dictionary" provider in here so SSCE never touches the database itself.
+
+DICT_MAX_FILE_BYTES = 64 * 1024     # only whole files up to this size use a dictionary
+
+DICT_CACHE_MAX      = 256           # decoded dictionaries kept in-process (one per active user)
+
+_dict_lock   = threading.Lock()
+_dict_cache: "OrderedDict[int, zstd.ZstdCompressionDict]" = OrderedDict()
+_dict_loader: Optional[Callable[[int], Optional[bytes]]] = None
+_dict_active: Optional[Callable[[str], Optional[zstd.ZstdCompressionDict]]] = None
+
+
+def configure_dictionaries(
+    *,
+    loader: Callable[[int], Optional[bytes]],
+    active: Callable[[str], Optional[zstd.ZstdCompressionDict]],
+) -> None:
+    """Install the dictionary backend: loader(dict_id) → raw dict bytes, active(user_id) → that user's current dict."""
+    global _dict_loader, _dict_active
+    _dict_loader, _dict_active = loader, active
+
+
+def cache_dictionary(data: bytes) -> zstd.ZstdCompressionDict:
+    """Wrap raw dictionary bytes and keep them for later get_dictionary() calls."""
+    zdict   = zstd.ZstdCompressionDict(data)
+    dict_id = zdict.dict_id()
+    with _dict_lock:
+        zdict = _dict_cache.setdefault(dict_id, zdict)
+        _dict_cache.move_to_end(dict_id)
+        while len(_dict_cache) > DICT_CACHE_MAX:
+            _dict_cache.popitem(last=False)
+        return zdict
+
+
+def get_dictionary(dict_id: int) -> zstd.ZstdCompressionDict:
+    """Resolve a container's dict_id; raises ValueError if it cannot be loaded."""
+    with _dict_lock:
+        zdict = _dict_cache.get(dict_id)
+    if zdict is not None:
+        return zdict
+    data = _dict_loader(dict_id) if _dict_loader is not None else None
+    if not data:
+        raise ValueError(f"zstd dictionary {dict_id} is not available")
+    return cache_dictionary(data)
+
+
+def active_dictionary(first_chunk: bytes, whole_file: bool, user_id: str) -> Optional[zstd.ZstdCompressionDict]:
+    """Dictionary to compress this user's file with, or None."""
+    if _dict_active is None or not whole_file or len(first_chunk) > DICT_MAX_FILE_BYTES:
+        return None
+    try:
+        return _dict_active(user_id)
+    except Exception:
+        return None          # a dictionary is an optimisation, never a reason to fail an upload
+
+
+# ── Contexts ──────────────────────────────────────────────────────────────────
+# One context per container: a generator may be resumed on another worker
+# thread, and zstd contexts must not be shared between threads.  Creating
+# one costs microseconds.
+
+def compressor(level: int, zdict: Optional[zstd.ZstdCompressionDict] = None) -> zstd.ZstdCompressor:
+    return zstd.ZstdCompressor(level=level, dict_data=zdict) if zdict is not None \
+        else zstd.ZstdCompressor(level=level)
+
+
+def decompressor(dict_id: int = 0) -> zstd.ZstdDecompressor:
+    if dict_id:
+        return zstd.ZstdDecompressor(dict_data=get_dictionary(dict_id))
+    return zstd.ZstdDecompressor()
@@ -45,6 +45,24 @@ class Settings(BaseSettings):
     # ======================
     REDIS_URL: str = Field(default="", alias="REDIS_URL")
 
+    # ======================
+    # Database Connection Pool
+    # ======================
+    # Per engine (sync and async each have their own pool): persistent
+    # connections, extra ones opened under load, max seconds a checkout waits
+    # before failing, and the age after which a connection is replaced
+    DB_POOL_SIZE: int = Field(default=5, alias="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(default=10, alias="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT_SECONDS: float = Field(default=30.0, alias="DB_POOL_TIMEOUT_SECONDS")
+    DB_POOL_RECYCLE_SECONDS: int = Field(default=1800, alias="DB_POOL_RECYCLE_SECONDS")
+    # Liveness: a connection idle longer than this is pinged on checkout
+    # instead of pinging every checkout (DB_POOL_PRE_PING).  0 = off
+    DB_POOL_PRE_PING: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+    DB_LIVENESS_INTERVAL_SECONDS: int = Field(default=0, alias="DB_LIVENESS_INTERVAL_SECONDS")
+    # DATABASE_URL points at PgBouncer in transaction mode: keep no
+    # server-side prepared statements on the pooled connections
+    DB_PGBOUNCER: bool = Field(default=False, alias="DB_PGBOUNCER")
+
     # ======================
     # Email (Brevo)
     # ======================
@@ -71,8 +89,27 @@ class Settings(BaseSettings):
     # Vault Storage
     # ======================
     VAULT_ENCRYPTION_KEY: str = Field(default="", alias="VAULT_ENCRYPTION_KEY")
+    # Key rotation: version of VAULT_ENCRYPTION_KEY, and the key it replaced
+    # (kept readable until rotate_vault_keys.py has re-wrapped everything)
+    VAULT_KEY_VERSION: int = Field(default=1, alias="VAULT_KEY_VERSION")
+    VAULT_PREVIOUS_ENCRYPTION_KEY: str = Field(default="", alias="VAULT_PREVIOUS_ENCRYPTION_KEY")
+    # Further root key versions: "<version>:<secret>,…" and/or a key file with
+    # one "<version>:<secret>" per line (re-read when it changes)
+    VAULT_ENCRYPTION_KEYS: str = Field(default="", alias="VAULT_ENCRYPTION_KEYS")
+    VAULT_KEY_FILE: str = Field(default="", alias="VAULT_KEY_FILE")
+    VAULT_KEY_FILE_RELOAD_SECONDS: float = Field(default=30.0, alias="VAULT_KEY_FILE_RELOAD_SECONDS")
     VAULT_STORAGE_DIR: str = Field(default="/tmp/vault_storage", alias="VAULT_STORAGE_DIR")
 
+    # Container blob backend: postgresql (inline) | filesystem | s3
+    VAULT_STORAGE_BACKEND: str = Field(default="postgresql", alias="VAULT_STORAGE_BACKEND")
+    VAULT_BLOB_DIR: str = Field(default="", alias="VAULT_BLOB_DIR")  # default: <VAULT_STORAGE_DIR>/containers
+    VAULT_S3_BUCKET: str = Field(default="", alias="VAULT_S3_BUCKET")
+    VAULT_S3_PREFIX: str = Field(default="vault/", alias="VAULT_S3_PREFIX")
+    VAULT_S3_ENDPOINT_URL: str = Field(default="", alias="VAULT_S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+    VAULT_S3_REGION: str = Field(default="", alias="VAULT_S3_REGION")
+    VAULT_S3_ACCESS_KEY: str = Field(default="", alias="VAULT_S3_ACCESS_KEY")
+    VAULT_S3_SECRET_KEY: str = Field(default="", alias="VAULT_S3_SECRET_KEY")
+
     # ======================
     # Email Verification
     # ======================
@@ -105,6 +142,8 @@ class Settings(BaseSettings):
         default="",
         alias="INITIAL_ADMIN_EMAIL",
     )
+    # Bearer token for the detailed /health/* endpoints; unset disables them
+    HEALTH_DETAILS_TOKEN: str = Field(default="", alias="HEALTH_DETAILS_TOKEN")
 
     # ======================
     # Logging
@@ -116,10 +155,60 @@ class Settings(BaseSettings):
     # SSCE — Secure Container Engine
     # ======================
     VAULT_QUOTA_MB: int = Field(default=100, alias="VAULT_QUOTA_MB")
+    VAULT_MAX_FILE_MB: int = Field(default=5, alias="VAULT_MAX_FILE_MB")
     CLAMD_SOCKET: str   = Field(default="/var/run/clamav/clamd.ctl", alias="CLAMD_SOCKET")
     CLAMD_HOST: str     = Field(default="", alias="CLAMD_HOST")
     CLAMD_PORT: int     = Field(default=3310, alias="CLAMD_PORT")
     CLAMAV_ENABLED: bool = Field(default=False, alias="CLAMAV_ENABLED")
+    # Persistent clamd connections (IDSESSION) kept idle for reuse, per-call
+    # socket timeout, and the ceiling of the backoff after clamd is unreachable
+    CLAMD_POOL_SIZE: int            = Field(default=4, alias="CLAMD_POOL_SIZE")
+    CLAMD_TIMEOUT_SECONDS: float    = Field(default=15.0, alias="CLAMD_TIMEOUT_SECONDS")
+    CLAMD_BACKOFF_MAX_SECONDS: float = Field(default=60.0, alias="CLAMD_BACKOFF_MAX_SECONDS")
+    # inline: uploads wait for the verdict | async: stored as pending and
+    # scanned by a background worker; downloads wait for a clean verdict
+    VAULT_SCAN_MODE: str  = Field(default="inline", alias="VAULT_SCAN_MODE")
+    VAULT_SCAN_BATCH: int = Field(default=20, alias="VAULT_SCAN_BATCH")
+    # Shared verdict cache by plaintext SHA-256 + ClamAV signature version
+    VAULT_SCAN_CACHE_ENABLED: bool = Field(default=True, alias="VAULT_SCAN_CACHE_ENABLED")
+
+    # Container compression: auto (per-file policy) | none | fast | default | high
+    VAULT_COMPRESSION: str = Field(default="auto", alias="VAULT_COMPRESSION")
+
+    # Trained zstd dictionaries for small files, one per user (samples the
+    # plaintext of a user's recent small uploads in memory; dictionaries are
+    # stored encrypted).  MIN_SAMPLES counts one user's uploads
+    VAULT_ZSTD_DICT_ENABLED: bool       = Field(default=False, alias="VAULT_ZSTD_DICT_ENABLED")
+    VAULT_ZSTD_DICT_SIZE: int           = Field(default=112640, alias="VAULT_ZSTD_DICT_SIZE")
+    VAULT_ZSTD_DICT_MIN_SAMPLES: int    = Field(default=256, alias="VAULT_ZSTD_DICT_MIN_SAMPLES")
+    VAULT_ZSTD_DICT_RETRAIN_HOURS: float = Field(default=24.0, alias="VAULT_ZSTD_DICT_RETRAIN_HOURS")
+
+    # Resumable uploads: how long an unfinished upload session (and its
+    # staged chunks) is kept, and how many a user may have open at once
+    VAULT_UPLOAD_SESSION_HOURS: float = Field(default=24.0, alias="VAULT_UPLOAD_SESSION_HOURS")
+    VAULT_UPLOAD_MAX_SESSIONS: int    = Field(default=10, alias="VAULT_UPLOAD_MAX_SESSIONS")
+
+    # Threads for the SSCE batch API (build_containers / parse_containers /
+    # verify_containers) and for each /vault/upload/batch request; 0 = one per CPU
+    VAULT_BATCH_WORKERS: int = Field(default=0, alias="VAULT_BATCH_WORKERS")
+    # Threads sealing the frames of one large container in parallel, shared
+    # by all uploads; 0 = one per CPU, 1 = serial
+    VAULT_FRAME_WORKERS: int = Field(default=0, alias="VAULT_FRAME_WORKERS")
+    # Threads running the blocking part of the async vault routes (DB session,
+    # hashing, ClamAV, compress/encrypt, blob I/O); excess uploads queue.
+    # 0 = two per CPU
+    VAULT_IO_WORKERS: int = Field(default=0, alias="VAULT_IO_WORKERS")
+
+    # Background integrity scrubber: re-verifies every stored container once
+    # per interval, reading at most VAULT_SCRUB_BYTES_PER_SEC per node
+    VAULT_SCRUB_ENABLED: bool          = Field(default=False, alias="VAULT_SCRUB_ENABLED")
+    VAULT_SCRUB_INTERVAL_HOURS: float  = Field(default=168.0, alias="VAULT_SCRUB_INTERVAL_HOURS")
+    VAULT_SCRUB_BYTES_PER_SEC: int     = Field(default=8 * 1024 * 1024, alias="VAULT_SCRUB_BYTES_PER_SEC")
+    VAULT_SCRUB_BATCH: int             = Field(default=50, alias="VAULT_SCRUB_BATCH")
+
+    # Derived per-user key cache (0 entries or 0 TTL disables it)
+    KEY_CACHE_MAX_ENTRIES: int   = Field(default=4096, alias="KEY_CACHE_MAX_ENTRIES")
+    KEY_CACHE_TTL_SECONDS: float = Field(default=300.0, alias="KEY_CACHE_TTL_SECONDS")
 
     # ======================
     # Frontend
@@ -134,6 +223,30 @@ class Settings(BaseSettings):
     def normalize_env(cls, value: str) -> str:
         return (value or "development").strip().lower()
 
+    @field_validator("VAULT_STORAGE_BACKEND", mode="before")
+    @classmethod
+    def normalize_storage_backend(cls, value: str) -> str:
+        value = (value or "postgresql").strip().lower()
+        if value not in ("postgresql", "filesystem", "s3"):
+            raise ValueError("VAULT_STORAGE_BACKEND must be postgresql, filesystem or s3")
+        return value
+
+    @field_validator("VAULT_SCAN_MODE", mode="before")
+    @classmethod
+    def normalize_scan_mode(cls, value: str) -> str:
+        value = (value or "inline").strip().lower()
+        if value not in ("inline", "async"):
+            raise ValueError("VAULT_SCAN_MODE must be inline or async")
+        return value
+
+    @field_validator("VAULT_COMPRESSION", mode="before")
+    @classmethod
+    def normalize_compression(cls, value: str) -> str:
+        value = (value or "auto").strip().lower()
+        if value not in ("auto", "none", "fast", "default", "high"):
+            raise ValueError("VAULT_COMPRESSION must be auto, none, fast, default or high")
+        return value
+
     @property
     def is_production(self) -> bool:
         return self.ENV == "production"
@@ -172,10 +285,14 @@ class Settings(BaseSettings):
         if self.JWT_SECRET and len(self.JWT_SECRET) < 32:
             errors.append("JWT_SECRET must be at least 32 characters")
 
-        if not self.VAULT_ENCRYPTION_KEY:
-            errors.append("VAULT_ENCRYPTION_KEY is required")
-        elif len(self.VAULT_ENCRYPTION_KEY) < 32:
+        if not (self.VAULT_ENCRYPTION_KEY or self.VAULT_ENCRYPTION_KEYS or self.VAULT_KEY_FILE):
+            errors.append("VAULT_ENCRYPTION_KEY (or VAULT_ENCRYPTION_KEYS / VAULT_KEY_FILE) is required")
+        elif self.VAULT_ENCRYPTION_KEY and len(self.VAULT_ENCRYPTION_KEY) < 32:
             errors.append("VAULT_ENCRYPTION_KEY must be at least 32 characters")
+        if self.VAULT_KEY_VERSION < 1:
+            errors.append("VAULT_KEY_VERSION must be 1 or higher")
+        if self.VAULT_PREVIOUS_ENCRYPTION_KEY and self.VAULT_PREVIOUS_ENCRYPTION_KEY == self.VAULT_ENCRYPTION_KEY:
+            errors.append("VAULT_PREVIOUS_ENCRYPTION_KEY must differ from VAULT_ENCRYPTION_KEY")
 
         # Frontend URL — warn but don't block startup
         if not self.FRONTEND_URL:
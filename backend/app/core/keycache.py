@@ -0,0 +1,167 @@
+"""
+Derived key cache
+=================
+Per-user keys are HKDF outputs of the root key, so they are deterministic and
+cheap to keep around — but HKDF plus a fresh AESGCM object on every upload,
+download and TOTP verify is wasted CPU on the hottest paths.
+
+KeyCache holds derived keys (and the AESGCM object built from each) keyed by
+(user_id, key_version, purpose):
+
+  - bounded LRU (KEY_CACHE_MAX_ENTRIES) with a TTL (KEY_CACHE_TTL_SECONDS),
+    so a key never outlives its window in memory
+  - key bytes live in a bytearray that is overwritten with zeros when the
+    entry is evicted, expires or the cache is cleared
+  - thread-safe; derivation runs outside the lock so a slow HKDF for one user
+    never blocks lookups for others
+  - hit/miss/eviction counters via stats()
+
+Callers get the key back as immutable bytes (the cryptography APIs need it),
+so zeroisation bounds the lifetime of the cached copy only.  The AESGCM
+object keeps its own copy inside OpenSSL, released when it is collected.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, TypeVar
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.core.config import get_settings
+
+# Purposes — part of the cache key, so the same user never shares an entry
+# across key uses even if two derivations happened to collide.
+PURPOSE_VAULT_WRAP = "vault-wrap"
+PURPOSE_TOTP       = "totp"
+PURPOSE_ZSTD_DICT  = "zstd-dict"
+PURPOSE_UPLOAD_STAGING = "upload-staging"
+
+CacheKey = tuple[str, int, str]
+T = TypeVar("T")
+
+
+class _Entry:
+    __slots__ = ("key", "cipher", "expires")
+
+    def __init__(self, key: bytes, expires: float):
+        self.key: bytearray = bytearray(key)
+        self.cipher: Optional[AESGCM] = None
+        self.expires = expires
+
+    def wipe(self) -> None:
+        for i in range(len(self.key)):
+            self.key[i] = 0
+        self.cipher = None
+
+
+class KeyCache:
+    """Bounded, thread-safe TTL LRU of derived keys and their AESGCM objects."""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max(0, max_entries)
+        self.ttl         = ttl_seconds
+        self._clock      = clock
+        self._lock       = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._hits = self._misses = self._evictions = self._expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _lookup(self, cache_key: CacheKey) -> Optional[_Entry]:
+        """Return the live entry or None.  Caller holds the lock."""
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        if entry.expires <= self._clock():
+            del self._entries[cache_key]
+            entry.wipe()
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(cache_key)
+        return entry
+
+    def _store(self, cache_key: CacheKey, key: bytes) -> _Entry:
+        """Insert (or return a concurrently inserted) entry.  Caller holds the lock."""
+        entry = self._lookup(cache_key)
+        if entry is not None:
+            return entry
+        entry = _Entry(key, self._clock() + self.ttl)
+        self._entries[cache_key] = entry
+        while len(self._entries) > self.max_entries:
+            _, old = self._entries.popitem(last=False)
+            old.wipe()
+            self._evictions += 1
+        return entry
+
+    def _with_entry(self, cache_key: CacheKey, derive: Callable[[], bytes],
+                    use: Callable[[_Entry], T]) -> T:
+        """Run use(entry) under the lock that found or stored the entry.
+
+        Eviction and invalidate() zero entries in place, so reading the key
+        (or building the cipher) after releasing the lock could see zeros.
+        """
+        with self._lock:
+            entry = self._lookup(cache_key)
+            if entry is not None:
+                self._hits += 1
+                return use(entry)
+            self._misses += 1
+        key = derive()
+        with self._lock:
+            return use(self._store(cache_key, key))
+
+    def get_key(self, cache_key: CacheKey, derive: Callable[[], bytes]) -> bytes:
+        """Return the cached key for cache_key, calling derive() on a miss."""
+        if not self.enabled:
+            return derive()
+        return self._with_entry(cache_key, derive, lambda entry: bytes(entry.key))
+
+    def get_cipher(self, cache_key: CacheKey, derive: Callable[[], bytes]) -> AESGCM:
+        """Return a cached AESGCM for the derived key (safe to share across threads)."""
+        if not self.enabled:
+            return AESGCM(derive())
+
+        def _cipher(entry: _Entry) -> AESGCM:
+            if entry.cipher is None:
+                entry.cipher = AESGCM(bytes(entry.key))
+            return entry.cipher
+        return self._with_entry(cache_key, derive, _cipher)
+
+    def invalidate(self, user_id: Optional[str] = None, key_version: Optional[int] = None) -> None:
+        """Drop (and zero) every entry, or only those for one user and/or key version."""
+        with self._lock:
+            for ck in [k for k in self._entries
+                       if (user_id is None or k[0] == user_id)
+                       and (key_version is None or k[1] == key_version)]:
+                self._entries.pop(ck).wipe()
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled":     self.enabled,
+                "size":        len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits":        self._hits,
+                "misses":      self._misses,
+                "hit_ratio":   round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions":   self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+_settings = get_settings()
+
+key_cache = KeyCache(
+    max_entries = _settings.KEY_CACHE_MAX_ENTRIES,
+    ttl_seconds = _settings.KEY_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,223 @@
+"""
+SSCE root key ring
+==================
+Holds every root key version the vault can read, so a rotation is a config
+change rather than a migration: containers record key_version, and SSCE asks
+the ring for that version's root when it unwraps a file key or checks an
+HMAC.
+
+Sources, merged (a version defined twice must carry the same secret):
+
+  VAULT_ENCRYPTION_KEY            the secret for VAULT_KEY_VERSION
+  VAULT_PREVIOUS_ENCRYPTION_KEY   the secret for VAULT_KEY_VERSION - 1
+  VAULT_ENCRYPTION_KEYS           "<version>:<secret>,<version>:<secret>,…"
+  VAULT_KEY_FILE                  one "<version>:<secret>" per line, "#"
+                                  comments, and optionally "current:<version>"
+                                  to override VAULT_KEY_VERSION
+
+The current version is the one new containers are written under.  Secrets are
+kept as given and each root is derived (HKDF) the first time it is needed.
+
+The key file is re-read when its mtime changes (checked at most every
+VAULT_KEY_FILE_RELOAD_SECONDS), so a new version can be added, made current
+and — once rotate_vault_keys.py has run — the old one removed, all without a
+restart.  A reload that would change the secret of an existing version is
+rejected and the previous ring kept.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.core.config import get_settings
+from app.core.keycache import key_cache
+
+logger = logging.getLogger(__name__)
+
+_DEV_FALLBACK = "syncveil-dev-insecure-key-change-me"
+
+
+def derive_root_key(secret: str) -> bytes:
+    """Derive a 32-byte root key from one key secret using HKDF-SHA256.
+
+    HKDF provides proper domain separation and key stretching even from a
+    high-entropy input key material (IKM).  The salt and info strings bind
+    the output to this specific application context, preventing cross-context
+    key reuse if the same IKM is ever used elsewhere.
+
+    Secrets must be high-entropy (≥32 chars enforced in production
+    validation).  Human passwords require Argon2id before HKDF — that path is
+    reserved for future password-locked containers.
+    """
+    return HKDF(
+        algorithm=SHA256(),
+        length=32,
+        salt=b"ssce-master-v1",
+        info=b"syncveil-root-key",
+    ).derive(secret.encode("utf-8"))
+
+
+def parse_key_spec(spec: str, *, separator: str = ",") -> tuple[dict[int, str], Optional[int]]:
+    """Parse "<version>:<secret>" entries (and "current:<version>").
+
+    Returns (secrets by version, current version or None).  Raises ValueError
+    on malformed entries or a version given twice.
+    """
+    secrets: dict[int, str] = {}
+    current: Optional[int] = None
+    for raw in spec.split(separator):
+        entry = raw.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        label, sep, value = entry.partition(":")
+        label, value = label.strip(), value.strip()
+        if not sep or not value:
+            raise ValueError(f"Key ring entry must be '<version>:<secret>', got {label!r}…")
+        if label == "current":
+            current = int(value)
+            continue
+        try:
+            version = int(label)
+        except ValueError:
+            raise ValueError(f"Key ring version must be an integer, got {label!r}") from None
+        if version < 1:
+            raise ValueError(f"Key ring version must be 1 or higher, got {version}")
+        if version in secrets:
+            raise ValueError(f"Key ring version {version} is defined twice")
+        secrets[version] = value
+    return secrets, current
+
+
+def _merge(into: dict[int, str], extra: dict[int, str], source: str) -> None:
+    for version, secret in extra.items():
+        if into.get(version, secret) != secret:
+            raise ValueError(f"Key version {version} from {source} conflicts with another key source")
+        into[version] = secret
+
+
+class KeyRing:
+    """Versioned root keys, derived lazily; optionally backed by a reloadable key file."""
+
+    def __init__(self, *, current: int, secrets: dict[int, str], key_file: str = "",
+                 reload_seconds: float = 30.0, fallback: str = "",
+                 clock: Callable[[], float] = time.monotonic):
+        self._base_current = current
+        self._base         = dict(secrets)        # env-provided, fixed for the process
+        self._fallback     = fallback
+        self.key_file      = key_file
+        self.reload_seconds = reload_seconds
+        self._clock        = clock
+        self._lock         = threading.Lock()
+        self._roots: dict[int, bytes] = {}
+        self._file_mtime: Optional[float] = None
+        self._checked_at   = clock()
+        self._secrets, self._current = self._assemble(self._read_file() if key_file else ({}, None))
+
+    # -- assembly ---------------------------------------------------------
+
+    def _read_file(self) -> tuple[dict[int, str], Optional[int]]:
+        self._file_mtime = os.stat(self.key_file).st_mtime
+        with open(self.key_file, encoding="utf-8") as f:
+            return parse_key_spec(f.read(), separator="\n")
+
+    def _assemble(self, from_file: tuple[dict[int, str], Optional[int]]) -> tuple[dict[int, str], int]:
+        file_secrets, file_current = from_file
+        secrets = dict(self._base)
+        _merge(secrets, file_secrets, self.key_file)
+        current = file_current or self._base_current
+        if current not in secrets:
+            # The JWT_SECRET / dev fallback only stands in for a ring with no keys at all
+            if secrets or not self._fallback:
+                raise ValueError(f"No secret configured for the current key version {current}")
+            secrets[current] = self._fallback
+        return secrets, current
+
+    def _maybe_reload(self) -> None:
+        if not self.key_file or self._clock() - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            if self._clock() - self._checked_at < self.reload_seconds:
+                return
+            self._checked_at = self._clock()
+            try:
+                if os.stat(self.key_file).st_mtime == self._file_mtime:
+                    return
+                self.reload()
+            except Exception as exc:
+                logger.error("Key file reload failed, keeping the current key ring: %s", exc)
+
+    def reload(self) -> None:
+        """Re-read the key file.  Raises ValueError (and keeps the old ring) on conflicts."""
+        secrets, current = self._assemble(self._read_file())
+        for version, secret in secrets.items():
+            if self._secrets.get(version, secret) != secret:
+                raise ValueError(f"Key file changes the secret of existing version {version}")
+        removed = set(self._secrets) - set(secrets)
+        self._secrets, self._current = secrets, current
+        for version in removed:
+            self._roots.pop(version, None)
+            key_cache.invalidate(key_version=version)
+        logger.info("Key ring reloaded: current v%d, versions %s", current, sorted(secrets))
+
+    # -- lookups ----------------------------------------------------------
+
+    @property
+    def current_version(self) -> int:
+        self._maybe_reload()
+        return self._current
+
+    def versions(self) -> list[int]:
+        """Configured versions, current first, then newest to oldest."""
+        self._maybe_reload()
+        current = self._current
+        return sorted(self._secrets, key=lambda v: (v != current, -v))
+
+    def root_key(self, key_version: int) -> bytes:
+        """Root key for key_version; raises ValueError if it is not configured."""
+        self._maybe_reload()
+        root = self._roots.get(key_version)
+        if root is not None:
+            return root
+        secret = self._secrets.get(key_version)
+        if secret is None:
+            raise ValueError(f"Root key version {key_version} is not configured")
+        root = derive_root_key(secret)
+        with self._lock:
+            if self._secrets.get(key_version) == secret:
+                self._roots[key_version] = root
+        return root
+
+    def stats(self) -> dict:
+        return {
+            "current_version": self.current_version,
+            "versions":        self.versions(),
+            "derived":         sorted(self._roots),
+            "key_file":        bool(self.key_file),
+        }
+
+
+def _from_settings() -> KeyRing:
+    settings = get_settings()
+    current  = settings.VAULT_KEY_VERSION
+    secrets, _ = parse_key_spec(settings.VAULT_ENCRYPTION_KEYS)
+    if settings.VAULT_ENCRYPTION_KEY:
+        _merge(secrets, {current: settings.VAULT_ENCRYPTION_KEY}, "VAULT_ENCRYPTION_KEY")
+    if settings.VAULT_PREVIOUS_ENCRYPTION_KEY and current > 1:
+        _merge(secrets, {current - 1: settings.VAULT_PREVIOUS_ENCRYPTION_KEY},
+               "VAULT_PREVIOUS_ENCRYPTION_KEY")
+    return KeyRing(
+        current        = current,
+        secrets        = secrets,
+        key_file       = settings.VAULT_KEY_FILE,
+        reload_seconds = settings.VAULT_KEY_FILE_RELOAD_SECONDS,
+        fallback       = settings.JWT_SECRET or _DEV_FALLBACK,
+    )
+
+
+key_ring = _from_settings()
@@ -0,0 +1,722 @@
+"""
+Malware scanning
+================
+ClamAV verdicts for the vault upload paths, spoken over clamd's own socket
+protocol (CLAMD_HOST:CLAMD_PORT, else the CLAMD_SOCKET Unix socket).
+
+  pooling     connections are opened in IDSESSION mode and kept for reuse
+              (up to CLAMD_POOL_SIZE idle), so a scan is one INSTREAM
+              exchange on an open socket — no connect, no PING.  Sessions
+              idle for IDLE_MAX_S, or closed by clamd meanwhile, are dropped
+              instead of reused
+  backoff     a missing socket or a failed connect marks clamd unavailable
+              for a backoff doubling from BACKOFF_MIN_S up to
+              CLAMD_BACKOFF_MAX_SECONDS; scans inside that window get the
+              "unavailable" PASS without touching the network
+  verdicts    definitive verdicts are cached in vault_scan_verdicts by
+              plaintext SHA-256 and signature version (clamd's VERSION,
+              re-read every VERSION_TTL_S), shared by all nodes: content
+              seen before — from any user — is not scanned again until
+              the signature database changes.  Rows of older databases
+              are purged once a node sees a newer one (ordered by database
+              number, so a node still on the previous database during a
+              rolling update leaves the newer rows alone)
+  async mode  VAULT_SCAN_MODE=async: uploads are stored with
+              malware_scan_status='pending' (unless the verdict is cached)
+              without waiting on clamd, and
+              ScanWorker scans them afterwards, claiming rows with
+              SELECT … FOR UPDATE SKIP LOCKED like the scrubber.  The vault
+              routes refuse downloads until the verdict is in; infected
+              and unscannable files stay quarantined, and so do files
+              whose stored container the worker could not read or
+              decrypt ("error")
+
+An unreachable daemon never blocks an inline upload: the verdict is a PASS
+with scanner="unavailable:<reason>" so its absence is auditable.  In async
+mode files stay pending until clamd is back.  A file clamd refuses because
+it exceeds StreamMaxLength is not a PASS: inline uploads are rejected, and
+async-mode files end up quarantined as "unscannable".
+
+ClamdPool takes its target explicitly, so tests can point it at a fake
+clamd listening on a temporary socket.
+"""
+from __future__ import annotations
+
+import io
+import json
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, undefer
+
+from app.core.blobstore import INLINE_BACKEND, BlobNotFound, get_blob_store
+from app.core.config import get_settings
+from app.db.models import VaultAuditLog, VaultFile, VaultPayload, VaultScanVerdict
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+PENDING       = "pending"    # scanner of an upload whose scan is deferred to the worker
+CACHED        = "clamav:cached"
+STREAM_LIMIT  = "clamav:stream-limit"   # scanner of a file over clamd's StreamMaxLength
+UNSCANNABLE   = "unscannable"           # its malware_scan_status
+UNREADABLE    = "error:unreadable"      # scanner of a stored container the worker cannot read or decrypt
+SCAN_ERROR    = "error"                 # its malware_scan_status
+IDLE_MAX_S    = 20.0         # below clamd's default IdleTimeout (30 s)
+BACKOFF_MIN_S = 1.0
+VERSION_TTL_S = 60.0         # clamd reloads signatures every SelfCheck (600 s by default)
+CLAIM_LEASE   = timedelta(minutes=10)   # unfinished worker claims become due again after this
+POLL_S        = 30.0                    # worker poll for files uploaded on other nodes
+_BLOCK        = 64 * 1024               # clamd reads INSTREAM data in StreamMaxLength-bounded blocks
+
+
+class MalwareScanResult:
+    __slots__ = ("clean", "threat", "scanner")
+
+    def __init__(self, clean: bool, threat: str = "", scanner: str = "clamav"):
+        self.clean   = clean
+        self.threat  = threat
+        self.scanner = scanner
+
+    def __repr__(self) -> str:
+        return f"<MalwareScanResult clean={self.clean} threat={self.threat!r}>"
+
+
+def scan_status(result: MalwareScanResult) -> str:
+    """vault_files.malware_scan_status for a verdict."""
+    if result.scanner == PENDING:
+        return PENDING
+    if result.scanner == STREAM_LIMIT:
+        return UNSCANNABLE
+    if result.scanner.startswith(UNREADABLE):
+        return SCAN_ERROR
+    if "unavailable" in result.scanner:
+        return "unavailable"
+    return "clean" if result.clean else "infected"
+
+
+def _read_reply(sock: socket.socket) -> str:
+    reply = b""
+    while not reply.endswith(b"\0"):
+        part = sock.recv(4096)
+        if not part:
+            break
+        reply += part
+    return reply.rstrip(b"\0").decode("utf-8", "replace").strip()
+
+
+def _parse_verdict(text: str) -> tuple[MalwareScanResult, bool]:
+    """(result, well_formed) for one clamd reply without its request id.
+
+    Only OK and FOUND are verdicts.  An ERROR reply or anything unrecognised
+    says nothing about the file, so it is an "unavailable" PASS like an
+    unreachable daemon — never a detection, and never cached.  The one
+    exception is clamd's StreamMaxLength error: the file can never be
+    scanned, so it is refused rather than passed.
+    """
+    if text.endswith("FOUND"):
+        threat = text.partition(":")[2].strip()[: -len("FOUND")].strip()
+        return MalwareScanResult(clean=False, threat=threat or "UNKNOWN"), True
+    if text.endswith("OK"):
+        return MalwareScanResult(clean=True), True
+    if "size limit exceeded" in text:
+        return MalwareScanResult(clean=False, scanner=STREAM_LIMIT), False
+    if not text:
+        return MalwareScanResult(clean=True, scanner="unavailable:no-reply"), False
+    logger.warning("clamd replied %r — treating the scan as unavailable", text[:200])
+    if text.endswith("ERROR"):
+        return MalwareScanResult(clean=True, scanner="unavailable:clamd-error"), False
+    return MalwareScanResult(clean=True, scanner="unavailable:bad-reply"), False
+
+
+# ── Connection pool ───────────────────────────────────────────────────────────
+
+class _Conn:
+    __slots__ = ("sock", "next_id", "last_used")
+
+    def __init__(self, sock: socket.socket):
+        self.sock      = sock
+        self.next_id   = 1              # clamd numbers the commands of a session from 1
+        self.last_used = time.monotonic()
+
+    def stale(self) -> bool:
+        if time.monotonic() - self.last_used > IDLE_MAX_S:
+            return True
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)           # EOF or unsolicited data: clamd ended the session
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ClamdPool:
+    """Idle clamd sessions plus the daemon's availability state.  Thread-safe."""
+
+    def __init__(self, *, host: str = "", port: int = 3310, socket_path: str = "",
+                 size: int = 4, timeout: float = 15.0, backoff_max: float = 60.0):
+        self.host        = host
+        self.port        = port
+        self.socket_path = socket_path
+        self.size        = max(0, size)
+        self.timeout     = timeout
+        self.backoff_max = max(BACKOFF_MIN_S, backoff_max)
+        self._lock       = threading.Lock()
+        self._idle: list[_Conn] = []
+        self._down_until = 0.0
+        self._backoff    = 0.0
+        self._reason     = ""
+        self._version: Optional[str] = None
+        self._version_at = 0.0
+        self._stats      = {"scans": 0, "infected": 0, "refused": 0, "unavailable": 0,
+                            "connects": 0, "reused": 0}
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def acquire(self) -> tuple[Optional[_Conn], str]:
+        """An open session, or (None, "unavailable:<reason>")."""
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.stale():
+                    self._stats["reused"] += 1
+                    return conn, ""
+                conn.close()
+            if time.monotonic() < self._down_until:
+                return None, self._reason
+        try:
+            sock = self._connect()
+        except Exception as exc:
+            reason = "no-socket" if isinstance(exc, FileNotFoundError) else type(exc).__name__
+            return None, self._mark_down(f"unavailable:{reason}")
+        with self._lock:
+            if self._backoff:
+                logger.info("clamd reachable again at %s", self.target)
+            self._backoff = 0.0
+            self._stats["connects"] += 1
+        return _Conn(sock), ""
+
+    def signature_version(self) -> Optional[str]:
+        """clamd engine and signature database version, e.g. "ClamAV 1.4.1/27431".
+
+        Re-read at most every VERSION_TTL_S; while clamd cannot be asked,
+        the last known version stands.  None if it was never reachable.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._version_at < VERSION_TTL_S:
+            return self._version
+        conn, _ = self.acquire()
+        if conn is None:
+            return self._version
+        try:
+            conn.sock.sendall(b"zVERSION\0")
+            text = _read_reply(conn.sock)
+        except Exception:
+            self.discard(conn)
+            return self._version
+        ident, sep, rest = text.partition(": ")
+        if not sep or ident != str(conn.next_id) or not rest.startswith("ClamAV"):
+            self.discard(conn)
+            return self._version
+        conn.next_id += 1
+        self.release(conn)
+        with self._lock:
+            self._version    = "/".join(rest.split("/")[:2])[:64]   # drop the database date
+            self._version_at = now
+            return self._version
+
+    def release(self, conn: _Conn) -> None:
+        """Return a session that is between commands."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, conn: _Conn) -> None:
+        conn.close()
+
+    def record(self, result: MalwareScanResult) -> MalwareScanResult:
+        with self._lock:
+            self._stats["scans"] += 1
+            if result.scanner == STREAM_LIMIT:
+                self._stats["refused"] += 1
+            elif not result.clean:
+                self._stats["infected"] += 1
+            elif "unavailable" in result.scanner:
+                self._stats["unavailable"] += 1
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    @property
+    def target(self) -> str:
+        return f"{self.host}:{self.port}" if self.host else self.socket_path
+
+    def _connect(self) -> socket.socket:
+        if self.host:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+        try:
+            if not self.host:
+                sock.connect(self.socket_path)
+            sock.sendall(b"zIDSESSION\0")
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def _mark_down(self, reason: str) -> str:
+        with self._lock:
+            first = not self._backoff
+            self._backoff    = min(self.backoff_max, max(BACKOFF_MIN_S, self._backoff * 2))
+            self._down_until = time.monotonic() + self._backoff
+            self._reason     = reason
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        if first:
+            logger.warning("clamd unavailable at %s (%s) — scans pass unchecked while it is down",
+                           self.target, reason)
+        return reason
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "target":     self.target,
+                "signatures": self._version,
+                "available":  self.available(),
+                "reason":     "" if self.available() else self._reason,
+                "backoff_s":  self._backoff,
+                "idle":       len(self._idle),
+                "pool_size":  self.size,
+                **self._stats,
+            }
+
+
+clamd_pool = ClamdPool(
+    host        = _settings.CLAMD_HOST,
+    port        = _settings.CLAMD_PORT,
+    socket_path = _settings.CLAMD_SOCKET,
+    size        = _settings.CLAMD_POOL_SIZE,
+    timeout     = _settings.CLAMD_TIMEOUT_SECONDS,
+    backoff_max = _settings.CLAMD_BACKOFF_MAX_SECONDS,
+)
+
+
+# ── Scanning ──────────────────────────────────────────────────────────────────
+
+class ScanStream:
+    """Incremental ClamAV INSTREAM scan on a pooled clamd session.
+
+    Lets the upload pipeline feed the scanner chunk by chunk in the same
+    pass that hashes and encrypts.  feed() the blocks, then finish() for the
+    verdict, which hands the session back to the pool; close() without
+    finish() abandons it.  ``reachable`` is False when the verdict is an
+    "unavailable" PASS because clamd could not be reached or dropped the
+    session.
+    """
+
+    def __init__(self, pool: Optional[ClamdPool] = None):
+        self._pool        = pool or clamd_pool
+        self._conn: Optional[_Conn] = None
+        self._unavailable = ""
+        self._send_failed = False
+        self.reachable    = False
+        for _ in range(2):                       # a pooled session may have died since its last use
+            conn, self._unavailable = self._pool.acquire()
+            if conn is None:
+                return
+            try:
+                conn.sock.sendall(b"zINSTREAM\0")
+            except OSError as exc:
+                self._pool.discard(conn)
+                self._unavailable = f"unavailable:{type(exc).__name__}"
+                continue
+            self._conn     = conn
+            self.reachable = True
+            return
+
+    def feed(self, data: bytes) -> None:
+        if self._conn is None or self._send_failed:
+            return
+        view = memoryview(data)
+        try:
+            for off in range(0, len(view), _BLOCK):
+                block = view[off:off + _BLOCK]
+                self._conn.sock.sendall(struct.pack("!L", len(block)))
+                self._conn.sock.sendall(block)
+        except OSError:
+            # clamd closes the stream early on StreamMaxLength — its reply
+            # is still waiting on the socket, so let finish() read it.
+            self._send_failed = True
+
+    def finish(self) -> MalwareScanResult:
+        if self._conn is None:
+            return self._pool.record(MalwareScanResult(clean=True, scanner=self._unavailable))
+        conn, self._conn = self._conn, None
+        try:
+            if not self._send_failed:
+                conn.sock.sendall(struct.pack("!L", 0))
+            text = _read_reply(conn.sock)
+        except Exception as exc:
+            self._pool.discard(conn)
+            self.reachable = False
+            return self._pool.record(MalwareScanResult(clean=True, scanner=f"unavailable:{type(exc).__name__}"))
+
+        ident, sep, rest = text.partition(": ")
+        in_sync = bool(sep) and ident == str(conn.next_id)
+        conn.next_id += 1
+        result, well_formed = _parse_verdict(rest if in_sync else text)
+        if in_sync and well_formed and not self._send_failed:
+            self._pool.release(conn)
+        else:
+            self._pool.discard(conn)
+            if not text:
+                self.reachable = False
+        return self._pool.record(result)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._pool.discard(self._conn)
+            self._conn = None
+
+
+def scan_blocks(blocks: Iterable[bytes], pool: Optional[ClamdPool] = None) -> tuple[MalwareScanResult, bool]:
+    """Scan a sequence of plaintext blocks.  Returns (verdict, clamd reached)."""
+    stream = ScanStream(pool)
+    try:
+        if stream.reachable:
+            for block in blocks:
+                stream.feed(block)
+        return stream.finish(), stream.reachable
+    finally:
+        stream.close()
+
+
+def scan_bytes(data: bytes) -> MalwareScanResult:
+    """Scan raw bytes with ClamAV (same availability semantics as ScanStream)."""
+    return scan_blocks([data])[0]
+
+
+# ── Verdict cache ─────────────────────────────────────────────────────────────
+
+def _database_number(version: str) -> int:
+    """Signature database of a version string ("ClamAV 1.4.1/27431" → 27431), 0 if unknown."""
+    tail = version.rpartition("/")[2]
+    return int(tail) if tail.isdigit() else 0
+
+
+class VerdictCache:
+    """vault_scan_verdicts access.  Each call uses its own short session, so
+    a verdict outlives the request (and the upload) that paid for it."""
+
+    def __init__(self, pool: ClamdPool, enabled: bool = True):
+        self._pool    = pool
+        self.enabled  = enabled
+        self._purged: Optional[str] = None   # signature version older rows were last purged for
+        self._stats   = {"hits": 0, "misses": 0, "stored": 0}
+
+    @staticmethod
+    def _session():
+        from app.db.session import SessionLocal
+        return SessionLocal() if SessionLocal is not None else None
+
+    def lookup(self, sha256: str) -> Optional[MalwareScanResult]:
+        if not self.enabled or not sha256:
+            return None
+        version = self._pool.signature_version()
+        db      = self._session() if version else None
+        if db is None:
+            return None
+        try:
+            row = db.get(VaultScanVerdict, (sha256, version))
+        except Exception as exc:
+            logger.warning("Scan verdict lookup failed: %s", exc)
+            return None
+        finally:
+            db.close()
+        self._stats["hits" if row is not None else "misses"] += 1
+        if row is None:
+            return None
+        return MalwareScanResult(clean=row.clean, threat=row.threat or "", scanner=CACHED)
+
+    def store(self, sha256: str, result: MalwareScanResult) -> None:
+        """Remember a verdict clamd actually gave (never an "unavailable" PASS)."""
+        if not self.enabled or not sha256 or result.scanner != "clamav":
+            return
+        version = self._pool.signature_version()
+        db      = self._session() if version else None
+        if db is None:
+            return
+        try:
+            if self._purged != version:
+                self._purge_older(db, version)
+            try:
+                with db.begin_nested():
+                    db.add(VaultScanVerdict(sha256=sha256, signature_version=version,
+                                            clean=result.clean, threat=result.threat[:255] or None))
+            except IntegrityError:
+                pass                                # another node scanned the same content
+            db.commit()
+            self._purged = version
+            self._stats["stored"] += 1
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Scan verdict store failed: %s", exc)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _purge_older(db, version: str) -> None:
+        current = _database_number(version)
+        older = [
+            v for (v,) in db.query(VaultScanVerdict.signature_version).distinct()
+            if _database_number(v) < current
+        ]
+        if older:
+            db.query(VaultScanVerdict).filter(
+                VaultScanVerdict.signature_version.in_(older),
+            ).delete(synchronize_session=False)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self._stats}
+
+
+verdict_cache = VerdictCache(clamd_pool, enabled=_settings.VAULT_SCAN_CACHE_ENABLED)
+
+
+def begin_scan(sha256: str) -> tuple[Optional[MalwareScanResult], Optional[ScanStream]]:
+    """Start the verdict for an upload whose plaintext has digest sha256.
+
+    (verdict, None) when no scan is needed: the verdict is cached, or async
+    mode leaves it to ScanWorker.  Otherwise (None, stream): feed the
+    plaintext to the stream in whichever pass reads it anyway — the upload
+    routes feed it while building the container — then finish_scan().
+    """
+    cached = verdict_cache.lookup(sha256)
+    if cached is not None:
+        return cached, None
+    if _settings.VAULT_SCAN_MODE == "async":
+        return MalwareScanResult(clean=True, scanner=PENDING), None
+    return None, ScanStream()
+
+
+def finish_scan(sha256: str, stream: ScanStream) -> MalwareScanResult:
+    """Verdict of a stream from begin_scan(), cached if clamd gave one."""
+    try:
+        result = stream.finish()
+    finally:
+        stream.close()
+    verdict_cache.store(sha256, result)
+    return result
+
+
+# ── Async mode worker ─────────────────────────────────────────────────────────
+
+# malware_scan_status the worker quarantines → vault audit event
+_QUARANTINE_EVENTS = {"infected": "malware_blocked", UNSCANNABLE: "scan_refused", SCAN_ERROR: "scan_failed"}
+
+
+class ScanWorker:
+    """Scans files stored as pending.  One per process; safe on every node."""
+
+    def __init__(self, *, batch: int, pool: ClamdPool, cache: VerdictCache):
+        self.batch  = max(1, batch)
+        self._pool  = pool
+        self._cache = cache
+        self._stop  = threading.Event()
+        self._wake  = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"scanned": 0, "infected": 0, UNSCANNABLE: 0, "cached": 0,
+                       "deferred": 0, "skipped": 0, "unreadable": 0}
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vault-scan-worker", daemon=True)
+        self._thread.start()
+        logger.info("Vault scan worker started (clamd at %s)", self._pool.target)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self) -> None:
+        """Pick up a freshly committed pending upload now instead of at the next poll."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.walk()
+            except Exception as exc:
+                logger.warning("Vault scan pass failed: %s", exc)
+                busy = False
+            if not busy:
+                self._wake.wait(POLL_S)
+                self._wake.clear()
+
+    # -- one page ---------------------------------------------------------
+
+    def walk(self) -> bool:
+        """Claim and scan one page of pending files.  False once nothing is due."""
+        from app.db.session import SessionLocal
+
+        if SessionLocal is None or not self._pool.available():
+            return False
+        claimed = self._claim(SessionLocal)
+        for file_id, stamp in claimed:
+            if self._stop.is_set():
+                break
+            self._scan(SessionLocal, file_id, stamp)
+        return bool(claimed) and self._pool.available()
+
+    def _claim(self, Session) -> list:
+        now = datetime.utcnow()
+        db  = Session()
+        try:
+            ids = [r.id for r in (
+                db.query(VaultFile.id)
+                .filter(
+                    VaultFile.malware_scan_status == PENDING,
+                    or_(VaultFile.malware_scan_at.is_(None), VaultFile.malware_scan_at < now - CLAIM_LEASE),
+                )
+                .order_by(VaultFile.uploaded_at)
+                .limit(self.batch)
+                .with_for_update(skip_locked=True)
+            )]
+            if not ids:
+                db.rollback()
+                return []
+            db.query(VaultFile).filter(VaultFile.id.in_(ids)).update(
+                {VaultFile.malware_scan_at: now}, synchronize_session=False,
+            )
+            db.commit()
+            return [(file_id, now) for file_id in ids]
+        finally:
+            db.close()
+
+    def _scan(self, Session, file_id, stamp: datetime) -> None:
+        from app.core.ssce import iter_parse_container
+
+        db = Session()
+        try:
+            vf = (
+                db.query(VaultFile)
+                .options(undefer(VaultFile.encrypted_data),
+                         joinedload(VaultFile.payload).undefer(VaultPayload.encrypted_data))
+                .filter(VaultFile.id == file_id)
+                .first()
+            )
+            if vf is None or vf.malware_scan_status != PENDING or vf.malware_scan_at != stamp:
+                self._stats["skipped"] += 1
+                return
+
+            result = self._cache.lookup(vf.sha256)
+            if result is not None:
+                self._stats["cached"] += 1
+            else:
+                try:
+                    stream = self._open(vf.payload if vf.payload_id is not None else vf)
+                    try:
+                        # decrypts only if clamd took the session
+                        result, reached = scan_blocks(iter_parse_container(stream), self._pool)
+                    finally:
+                        stream.close()
+                except Exception as exc:
+                    # Undecryptable or missing container: never scanned, so
+                    # never served; the scrubber reports the damage on its own.
+                    logger.error("Vault scan: file %s unreadable: %s", vf.id, exc)
+                    result = MalwareScanResult(clean=False, threat=type(exc).__name__, scanner=UNREADABLE)
+                    self._stats["unreadable"] += 1
+                else:
+                    if not reached:
+                        # clamd went away — hand the claim back and retry after the backoff
+                        db.query(VaultFile).filter(
+                            VaultFile.id == vf.id, VaultFile.malware_scan_at == stamp,
+                        ).update({VaultFile.malware_scan_at: None}, synchronize_session=False)
+                        db.commit()
+                        self._stats["deferred"] += 1
+                        return
+                    self._cache.store(vf.sha256, result)
+            self._finalise(db, vf, result)
+        finally:
+            db.close()
+
+    def _finalise(self, db, vf: VaultFile, result: MalwareScanResult) -> None:
+        # A verdict covers every pending file sharing the same container
+        owner = VaultFile.payload_id == vf.payload_id if vf.payload_id is not None else VaultFile.id == vf.id
+        files = (
+            db.query(VaultFile.id, VaultFile.user_id, VaultFile.file_name)
+            .filter(owner, VaultFile.malware_scan_status == PENDING)
+            .with_for_update()
+            .all()
+        )
+        if not files:
+            db.rollback()
+            self._stats["skipped"] += 1
+            return
+        verdict = scan_status(result)
+        db.query(VaultFile).filter(VaultFile.id.in_([f.id for f in files])).update(
+            {VaultFile.malware_scan_status: verdict, VaultFile.malware_scan_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+        event = _QUARANTINE_EVENTS.get(verdict)
+        if event is not None:
+            for f in files:
+                db.add(VaultAuditLog(
+                    user_id=f.user_id, file_id=f.id, event_type=event, success=False,
+                    detail=json.dumps({"threat": result.threat or result.scanner, "filename": f.file_name,
+                                       "source": "scan-worker"}),
+                ))
+            logger.warning("Vault scan: %d file(s) quarantined (%s)", len(files), result.threat or verdict)
+        db.commit()
+        if verdict != SCAN_ERROR:                    # counted as unreadable already
+            self._stats[verdict if event is not None else "scanned"] += len(files)
+
+    @staticmethod
+    def _open(src) -> BinaryIO:
+        if src.storage_backend == INLINE_BACKEND or not src.storage_locator:
+            if src.encrypted_data is None:
+                raise BlobNotFound(str(src.id))
+            return io.BytesIO(bytes(src.encrypted_data))
+        return get_blob_store(src.storage_backend).open_sequential(src.storage_locator)
+
+    def stats(self) -> dict:
+        return {
+            "mode":    _settings.VAULT_SCAN_MODE,
+            "running": self._thread is not None and self._thread.is_alive(),
+            **self._stats,
+        }
+
+
+scan_worker = ScanWorker(batch=_settings.VAULT_SCAN_BATCH, pool=clamd_pool, cache=verdict_cache)
@@ -0,0 +1,281 @@
+"""
+Vault integrity scrubber
+========================
+Background thread that re-verifies every stored container (HMAC and frame
+structure, no decryption) once per VAULT_SCRUB_INTERVAL_HOURS, so silent
+corruption or a lost blob is found before the owner asks for the file.
+
+  units      containers, not file rows: vault_payloads plus the legacy
+             vault_files rows that own their blob (payload_id IS NULL) —
+             a deduplicated payload is checked once however many files
+             point at it
+  walking    keyset pages ordered by id, only rows whose last_verified_at
+             is older than the interval (or unset)
+  claiming   each page is claimed with SELECT … FOR UPDATE SKIP LOCKED and
+             stamped last_verified_at = now, last_verify_ok = NULL in one
+             short transaction, so nodes running the scrubber side by side
+             take disjoint pages and a container is checked once per cycle.
+             A claim whose result never arrives (node died) is retried
+             after CLAIM_LEASE
+  reading    one forward pass over a sequential stream, paced by a token
+             bucket at VAULT_SCRUB_BYTES_PER_SEC per node so foreground
+             uploads and downloads keep the disk and the object store
+  results    last_verify_ok / last_verify_error on the row; failures are
+             also written to vault_audit_logs as integrity_fail for every
+             affected file.  A row rewritten while it was being read
+             (key rotation, delete) is left for the next pass
+
+Only runs with VAULT_SCRUB_ENABLED; app.main starts and stops it.
+"""
+from __future__ import annotations
+
+import io
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import undefer
+
+from app.core.blobstore import INLINE_BACKEND, BlobNotFound, get_blob_store
+from app.core.config import get_settings
+from app.core.ssce import verify_container_stream
+from app.db.models import VaultAuditLog, VaultFile, VaultPayload
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+CLAIM_LEASE  = timedelta(hours=1)   # unfinished claims become due again after this
+IDLE_SLEEP_S = 300                  # pause once nothing is due
+READ_BLOCK   = 1024 * 1024
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Throttle:
+    """Token bucket over bytes; at most one second of burst."""
+
+    def __init__(self, rate: int, stop: threading.Event):
+        self.rate  = rate
+        self._stop = stop
+        self._allowance = float(rate)
+        self._last = time.monotonic()
+
+    def consume(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._allowance = min(float(self.rate), self._allowance + (now - self._last) * self.rate)
+        self._last = now
+        self._allowance -= n
+        if self._allowance < 0 and self._stop.wait(-self._allowance / self.rate):
+            raise _Stopped()
+
+
+class _ThrottledReader(io.RawIOBase):
+    """Forward-only view of a stream that waits on the bucket for every read."""
+
+    def __init__(self, stream: BinaryIO, throttle: _Throttle):
+        self._stream   = stream
+        self._throttle = throttle
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size if size and size > 0 else READ_BLOCK)
+        self.bytes_read += len(data)
+        self._throttle.consume(len(data))
+        return data
+
+
+class Scrubber:
+    """One per process; walk() is safe to run on every node at once."""
+
+    # model → extra filter selecting the rows that own a container
+    _UNITS = (
+        (VaultPayload, None),
+        (VaultFile,    VaultFile.payload_id.is_(None)),
+    )
+
+    def __init__(self, *, interval_hours: float, bytes_per_sec: int, batch: int):
+        self.interval = timedelta(hours=interval_hours)
+        self.batch    = max(1, batch)
+        self._stop    = threading.Event()
+        self._throttle = _Throttle(bytes_per_sec, self._stop)
+        self._thread: Optional[threading.Thread] = None
+        self._cursors: dict[str, object] = {}
+        self._idle    = True
+        self._stats   = {"verified": 0, "failed": 0, "skipped": 0, "bytes": 0,
+                         "cycle_started": None, "last_pass_finished": None}
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vault-scrubber", daemon=True)
+        self._thread.start()
+        logger.info("Vault scrubber started (every %s, %d B/s)", self.interval, self._throttle.rate)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.walk()
+            except _Stopped:
+                return
+            except Exception as exc:
+                logger.warning("Vault scrub pass failed: %s", exc)
+                busy = False
+            if not busy and self._stop.wait(IDLE_SLEEP_S):
+                return
+
+    # -- one page ---------------------------------------------------------
+
+    def walk(self) -> bool:
+        """Claim and verify one page per container table.  False once nothing is due."""
+        from app.db.session import SessionLocal
+
+        if SessionLocal is None:
+            return False
+        busy = False
+        for model, owns in self._UNITS:
+            claimed = self._claim(SessionLocal, model, owns)
+            busy |= bool(claimed)
+            for row_id, stamp in claimed:
+                if self._stop.is_set():
+                    raise _Stopped()
+                self._verify(SessionLocal, model, row_id, stamp)
+        if busy and self._idle:
+            self._stats["cycle_started"] = datetime.utcnow().isoformat()
+        elif not busy and not self._idle:
+            self._stats["last_pass_finished"] = datetime.utcnow().isoformat()
+        self._idle = not busy
+        return busy
+
+    def _claim(self, Session, model, owns) -> list:
+        now  = datetime.utcnow()
+        name = model.__tablename__
+        due  = or_(
+            model.last_verified_at.is_(None),
+            model.last_verified_at < now - self.interval,
+            and_(model.last_verify_ok.is_(None), model.last_verified_at < now - CLAIM_LEASE),
+        )
+        db = Session()
+        try:
+            query = db.query(model.id).filter(due)
+            if owns is not None:
+                query = query.filter(owns)
+            cursor = self._cursors.get(name)
+            if cursor is not None:
+                query = query.filter(model.id > cursor)
+            ids = [r.id for r in query.order_by(model.id).limit(self.batch).with_for_update(skip_locked=True)]
+            if not ids:
+                if cursor is not None:                 # end of the table: next page starts over
+                    self._cursors.pop(name, None)
+                db.rollback()
+                return []
+            db.query(model).filter(model.id.in_(ids)).update(
+                {model.last_verified_at: now, model.last_verify_ok: None, model.last_verify_error: None},
+                synchronize_session=False,
+            )
+            db.commit()
+            self._cursors[name] = ids[-1]
+            return [(row_id, now) for row_id in ids]
+        finally:
+            db.close()
+
+    def _verify(self, Session, model, row_id, stamp: datetime) -> None:
+        db = Session()
+        try:
+            row = db.query(model).options(undefer(model.encrypted_data)).filter(model.id == row_id).first()
+            if row is None or row.last_verified_at != stamp:
+                self._stats["skipped"] += 1
+                return
+            hmac_before = row.hmac
+            reader = None
+            try:
+                stream = self._open(row)
+                try:
+                    reader = _ThrottledReader(stream, self._throttle)
+                    result = verify_container_stream(reader)
+                finally:
+                    stream.close()
+            except BlobNotFound:
+                result = {"integrity_ok": False, "error": "Container blob missing from storage"}
+            except _Stopped:
+                raise
+            except Exception as exc:
+                result = {"integrity_ok": False, "error": f"Unreadable container: {exc}"}
+            if reader is not None:
+                self._stats["bytes"] += reader.bytes_read
+
+            ok    = bool(result["integrity_ok"])
+            error = None if ok else (result.get("error") or "HMAC mismatch")
+            updated = db.query(model).filter(
+                model.id == row_id,
+                model.last_verified_at == stamp,
+                model.hmac == hmac_before,              # not rewritten while we read it
+            ).update({model.last_verify_ok: ok, model.last_verify_error: error and error[:500]},
+                     synchronize_session=False)
+            if not updated:
+                db.rollback()
+                self._stats["skipped"] += 1
+                return
+            if not ok:
+                self._report(db, model, row, result, error)
+            db.commit()
+            self._stats["verified" if ok else "failed"] += 1
+        finally:
+            db.close()
+
+    @staticmethod
+    def _open(row) -> BinaryIO:
+        if row.storage_backend == INLINE_BACKEND or not row.storage_locator:
+            if row.encrypted_data is None:
+                raise BlobNotFound(str(row.id))
+            return io.BytesIO(bytes(row.encrypted_data))
+        return get_blob_store(row.storage_backend).open_sequential(row.storage_locator)
+
+    @staticmethod
+    def _report(db, model, row, result: dict, error: str) -> None:
+        if model is VaultPayload:
+            file_ids = [f.id for f in db.query(VaultFile.id).filter(VaultFile.payload_id == row.id)]
+        else:
+            file_ids = [row.id]
+        detail = json.dumps({**result, "source": "scrubber"}, default=str)[:2000]
+        for file_id in file_ids:
+            db.add(VaultAuditLog(user_id=row.user_id, file_id=file_id, event_type="integrity_fail",
+                                 detail=detail, success=False))
+        logger.error("Vault scrub: %s %s failed integrity check: %s",
+                     model.__tablename__, row.id, error)
+
+    def stats(self) -> dict:
+        return {
+            "enabled":        _settings.VAULT_SCRUB_ENABLED,
+            "running":        self._thread is not None and self._thread.is_alive(),
+            "interval_hours": self.interval.total_seconds() / 3600,
+            "bytes_per_sec":  self._throttle.rate,
+            **self._stats,
+        }
+
+
+scrubber = Scrubber(
+    interval_hours = _settings.VAULT_SCRUB_INTERVAL_HOURS,
+    bytes_per_sec  = _settings.VAULT_SCRUB_BYTES_PER_SEC,
+    batch          = _settings.VAULT_SCRUB_BATCH,
+)
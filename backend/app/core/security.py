@@ -8,7 +8,7 @@ import string
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import HTTPException, status
+from fastapi import Header, HTTPException, status
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 
@@ -117,6 +117,25 @@ def verify_token(token: str) -> dict:
     return payload
 
 
+def require_health_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Dependency for the detailed /health/* endpoints (key versions, pool and
+    scanner internals).  They answer 404 unless HEALTH_DETAILS_TOKEN is set,
+    and 401 unless it is sent as a bearer token.  GET /health stays public.
+    """
+    if not settings.HEALTH_DETAILS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.HEALTH_DETAILS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid health token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
 def is_token_expired(expires_at: datetime) -> bool:
     """
     Check if a token/OTP/session has expired.
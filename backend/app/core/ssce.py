@@ -3,9 +3,9 @@ SyncVeil Secure Container Engine (SSCE)
 ========================================
 Implements the .syncveil container format.
 
-Container binary layout (all multi-byte integers are big-endian):
+Version 1 layout (all multi-byte integers are big-endian):
   [0:8]   Magic        b"SYNCVEIL"
-  [8]     Version      uint8  (currently 1)
+  [8]     Version      uint8  (1)
   [9:13]  MetaLen      uint32 — length of JSON metadata block
   [13:N]  Metadata     UTF-8 JSON  (includes key_version field)
   [N:N+12] FileNonce   12 bytes — AES-GCM nonce for the file key
@@ -17,8 +17,36 @@ Container binary layout (all multi-byte integers are big-endian):
   [CipherLen] Ciphertext  AES-256-GCM(zstd(plaintext))  (tag appended by AESGCM)
   [+32]   HMAC         HMAC-SHA256 over everything preceding this field
 
+Version 2 layout (chunked — written by build_container / iter_build_container):
+  [0:8]   Magic        b"SYNCVEIL"
+  [8]     Version      uint8  (2)
+  [9:13]  MetaLen      uint32
+  [13:N]  Metadata     UTF-8 JSON — static fields only (filename, user_id,
+                       key_version, chunk_size, ...); sizes and digests are
+                       not known until the payload has been consumed
+  [+12]   FileNonce    12 bytes
+  [+48]   EncFileKey   48 bytes  (same wrapping as v1)
+  [+8]    NoncePrefix  8 random bytes; frame i uses nonce NoncePrefix || uint32(i)
+  Frames, repeated until a zero FrameLen:
+    [4]   FrameLen     uint32 — length of the sealed frame (ciphertext + tag)
+    [1]   Flags        0x01 = payload is zstd-compressed, 0x02 = final frame
+    [FrameLen] AES-256-GCM(file_key, zstd(chunk_i) or chunk_i)
+               AAD = b"ssce-frame-v2" || uint32(i) || Flags
+  [4]     Terminator   uint32 0
+  [T]     Trailer      UTF-8 JSON — original_size, compressed_size,
+                       sha256_plaintext, frame_count, frame_sizes
+  [4]     TrailerLen   uint32 — length of Trailer (read from the end)
+  [32]    HMAC         HMAC-SHA256 over everything preceding this field
+
+  Every frame except the last holds exactly chunk_size plaintext bytes, so
+  plaintext offset → frame index is a division.  Each frame is compressed
+  and authenticated on its own; binding the index and final flag into the
+  AAD rejects reordered, spliced or truncated frame sequences.  Writers and
+  readers only ever hold one chunk in memory.
+
 Encryption hierarchy:
-  VAULT_ENCRYPTION_KEY (env)
+  Key secret for key_version N  (VAULT_ENCRYPTION_KEY, VAULT_ENCRYPTION_KEYS or
+                                 VAULT_KEY_FILE — see app.core.keyring)
        ↓  HKDF-SHA256 with salt=b"ssce-master-v1"
   Root Key  (never used directly for encryption)
        ↓  HKDF-SHA256 with info=b"user:<user_id>" + salt=b"ssce-user-v1"
@@ -26,13 +54,15 @@ Encryption hierarchy:
        ↓  encrypts
   File Key  (32 bytes, random per file, stored encrypted in container)
        ↓  encrypts
-  Payload   (zstd-compressed plaintext)
+  Payload   (zstd-compressed plaintext, one or many frames)
 
 Key versioning:
   key_version is stored in container metadata (JSON field) and in VaultFile.key_version.
-  When VAULT_ENCRYPTION_KEY is rotated, bump KEY_VERSION in config/env, re-derive
-  root and user keys, and run the key-rotation migration to re-wrap file keys.
-  Old containers remain readable as long as the old key is available for unwrapping.
+  It selects both the root that derives the user key and the container HMAC key, so
+  parse / verify work for every version the key ring holds.  To rotate: add a new
+  version to the ring and make it current (new uploads use it at once), run
+  rotate_vault_keys.py, then retire the old version.  Only the 48-byte EncFileKey,
+  the header and the HMAC change (rewrap_container); frames are copied verbatim.
 """
 from __future__ import annotations
 
@@ -40,67 +70,78 @@ import hashlib
 import hmac as _hmac
 import io
 import json
+import mmap
 import os
 import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from functools import cached_property
+from typing import BinaryIO, Generator, Iterable, Iterator, Optional, Union
 
 import zstandard as zstd
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.hashes import SHA256
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
+from app.core import compression as compression_policy
 from app.core.config import get_settings
+from app.core.keycache import PURPOSE_VAULT_WRAP, key_cache
+from app.core.keyring import key_ring
+from app.core.malware import MalwareScanResult, ScanStream, scan_bytes  # noqa: F401  (re-exported)
 
 # ── Constants ─────────────────────────────────────────────────────────────────
 
 MAGIC        = b"SYNCVEIL"
-VERSION      = 1
+VERSION      = 2                  # version written by build_container
+VERSION_V1   = 1                  # single-frame legacy layout, read-only
 COMPRESSION  = "zstd"
 ENC_ALGO     = "AES-256-GCM"
 HMAC_ALGO    = "HMAC-SHA256"
 
-# ClamAV socket path — override via env for non-standard installs
-CLAMD_SOCKET = os.getenv("CLAMD_SOCKET", "/var/run/clamav/clamd.ctl")
-CLAMD_HOST   = os.getenv("CLAMD_HOST",   "")          # e.g. "127.0.0.1"
-CLAMD_PORT   = int(os.getenv("CLAMD_PORT", "3310"))
+# v2 framing
+DEFAULT_CHUNK_SIZE = 1024 * 1024        # plaintext bytes per frame
+MAX_CHUNK_SIZE     = 64 * 1024 * 1024   # refuse headers asking for more (decompression bomb guard)
+MAX_TRAILER_LEN    = 8 * 1024 * 1024
+FRAME_COMPRESSED   = 0x01
+FRAME_FINAL        = 0x02
+_FRAME_AAD_PREFIX  = b"ssce-frame-v2"
+FRAME_BUFFER_BYTES = 32 * 1024 * 1024   # plaintext a parallel build may hold in flight
 
-_settings = get_settings()
+# Plain bytes, a readable binary stream, or an iterable of byte blocks
+ByteSource = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
 
+# Root keys by version live in the key ring (app.core.keyring): derived on
+# first use, used only to derive per-user keys and as the container HMAC key.
+# Every container records the key_version it was written under, and every
+# read below goes through that version's root.
 
-def _derive_root_key() -> bytes:
-    """Derive the 32-byte root key from VAULT_ENCRYPTION_KEY using HKDF-SHA256.
+def current_key_version() -> int:
+    """Key version new containers are written under."""
+    return key_ring.current_version
 
-    HKDF provides proper domain separation and key stretching even from a
-    high-entropy input key material (IKM).  The salt and info strings bind
-    the output to this specific application context, preventing cross-context
-    key reuse if the same IKM is ever used elsewhere.
 
-    VAULT_ENCRYPTION_KEY must be high-entropy (≥32 chars enforced in
-    production validation).  Human passwords require Argon2id before HKDF —
-    that path is reserved for future password-locked containers.
-    """
-    ikm = (
-        _settings.VAULT_ENCRYPTION_KEY
-        or _settings.JWT_SECRET
-        or "syncveil-dev-insecure-key-change-me"
-    ).encode("utf-8")
+def root_key(key_version: int) -> bytes:
+    return key_ring.root_key(key_version)
+
+
+def configured_key_versions() -> list[int]:
+    """Root key versions this process can read, current first."""
+    return key_ring.versions()
 
+
+def _hkdf_user_key(user_id: str, key_version: int) -> bytes:
     return HKDF(
         algorithm=SHA256(),
         length=32,
-        salt=b"ssce-master-v1",
-        info=b"syncveil-root-key",
-    ).derive(ikm)
-
-
-# Root key: derived once at startup, used only to derive per-user keys.
-# Never used directly for encryption — user-scoped keys are the leaf keys.
-_ROOT_KEY: bytes = _derive_root_key()
+        salt=b"ssce-user-v1",
+        info=f"syncveil-user-key:{user_id}".encode("utf-8"),
+    ).derive(root_key(key_version))
 
 
-def derive_user_key(user_id: str) -> bytes:
+def derive_user_key(user_id: str, key_version: Optional[int] = None) -> bytes:
     """Derive a 32-byte user-scoped key from the root key.
 
     Each user gets a deterministic but isolated key.  Compromising one
@@ -109,66 +150,52 @@ def derive_user_key(user_id: str) -> bytes:
 
     The info string includes the user UUID so the output is unique per user.
     The salt "ssce-user-v1" provides domain separation from other HKDF uses.
+    key_version picks the root (default: current).  Results are served from
+    the process key cache (app.core.keycache).
     """
-    return HKDF(
-        algorithm=SHA256(),
-        length=32,
-        salt=b"ssce-user-v1",
-        info=f"syncveil-user-key:{user_id}".encode("utf-8"),
-    ).derive(_ROOT_KEY)
+    user_id = str(user_id)
+    key_version = key_version or current_key_version()
+    return key_cache.get_key((user_id, key_version, PURPOSE_VAULT_WRAP),
+                             lambda: _hkdf_user_key(user_id, key_version))
 
 
-# Legacy alias — used internally only for HMAC over the container body.
-# File key encryption now uses derive_user_key(user_id) instead.
-MASTER_KEY: bytes = _ROOT_KEY
+def user_wrap_cipher(user_id: str, key_version: Optional[int] = None) -> AESGCM:
+    """Cached AESGCM over the user key — wraps/unwraps per-file keys."""
+    user_id = str(user_id)
+    key_version = key_version or current_key_version()
+    return key_cache.get_cipher((user_id, key_version, PURPOSE_VAULT_WRAP),
+                                lambda: _hkdf_user_key(user_id, key_version))
 
 
-# ── Malware scanning ──────────────────────────────────────────────────────────
+def _hkdf_system_key(purpose: str, key_version: int) -> bytes:
+    return HKDF(
+        algorithm=SHA256(),
+        length=32,
+        salt=b"ssce-system-v1",
+        info=f"syncveil-system-key:{purpose}".encode("utf-8"),
+    ).derive(root_key(key_version))
 
-class MalwareScanResult:
-    __slots__ = ("clean", "threat", "scanner")
 
-    def __init__(self, clean: bool, threat: str = "", scanner: str = "clamav"):
-        self.clean   = clean
-        self.threat  = threat
-        self.scanner = scanner
+def system_cipher(purpose: str, key_version: Optional[int] = None) -> AESGCM:
+    """Cached AESGCM for server-owned data that belongs to no single user.
 
-    def __repr__(self) -> str:
-        return f"<MalwareScanResult clean={self.clean} threat={self.threat!r}>"
+    Same root, separate HKDF salt/info, so it can never collide with a
+    user-scoped key.  Used e.g. for trained zstd dictionaries at rest.
+    """
+    key_version = key_version or current_key_version()
+    return key_cache.get_cipher(("", key_version, purpose),
+                                lambda: _hkdf_system_key(purpose, key_version))
 
 
-def scan_bytes(data: bytes) -> MalwareScanResult:
-    """Scan raw bytes with ClamAV.
+def _container_mac(key_version: int):
+    """Running HMAC-SHA256 keyed by the root of the container's key_version."""
+    return _hmac.new(root_key(key_version), digestmod=hashlib.sha256)
 
-    Tries Unix socket first, then TCP.  If ClamAV is not reachable
-    (common in dev/test), returns a PASS with scanner="unavailable" so
-    uploads are not blocked when the daemon is absent.  Production
-    deployments SHOULD have ClamAV running; the scan result is logged
-    either way so the absence is auditable.
-    """
-    try:
-        import clamd  # type: ignore
-    except ImportError:
-        return MalwareScanResult(clean=True, scanner="unavailable:no-clamd-package")
 
-    cd: Optional[clamd.ClamdBase] = None
-    try:
-        if CLAMD_HOST:
-            cd = clamd.ClamdNetworkSocket(host=CLAMD_HOST, port=CLAMD_PORT, timeout=15)
-        elif os.path.exists(CLAMD_SOCKET):
-            cd = clamd.ClamdUnixSocket(path=CLAMD_SOCKET)
-        else:
-            return MalwareScanResult(clean=True, scanner="unavailable:no-socket")
-
-        cd.ping()  # raises if daemon is down
-        result = cd.instream(io.BytesIO(data))
-        status, threat = result.get("stream", ("OK", ""))
-        if status == "OK":
-            return MalwareScanResult(clean=True)
-        return MalwareScanResult(clean=False, threat=threat or "UNKNOWN")
-    except Exception as exc:
-        # Daemon unreachable — log-worthy but non-blocking in dev
-        return MalwareScanResult(clean=True, scanner=f"unavailable:{type(exc).__name__}")
+# Legacy alias — the current root at import time.  Container HMACs are keyed
+# per version through _container_mac(); file keys are wrapped with
+# derive_user_key().
+MASTER_KEY: bytes = root_key(current_key_version())
 
 
 # ── Container metadata ────────────────────────────────────────────────────────
@@ -188,13 +215,33 @@ class ContainerMetadata:
     storage_backend:    str      = "postgresql"
     key_version:        int      = 1   # bump when VAULT_ENCRYPTION_KEY rotates
     user_id:            str      = ""  # owner UUID — binds container to a user
+    chunk_size:         int      = 0   # v2: plaintext bytes per frame (0 for v1)
+    frame_count:        int      = 0   # v2: number of frames (0 for v1)
+    dict_id:            int      = 0   # v2: trained zstd dictionary used for frames (0 = none)
+
+    # Fields only known once the whole payload has been consumed; v2 writes
+    # them to the trailer instead of the header.
+    TRAILER_FIELDS = ("original_size", "compressed_size", "sha256_plaintext", "frame_count")
 
     def to_json(self) -> bytes:
         return json.dumps(self.__dict__, separators=(",", ":")).encode("utf-8")
 
+    def header_json(self) -> bytes:
+        d = {k: v for k, v in self.__dict__.items() if k not in self.TRAILER_FIELDS}
+        return json.dumps(d, separators=(",", ":")).encode("utf-8")
+
+    def trailer_json(self, frame_sizes: list[int]) -> bytes:
+        d = {k: getattr(self, k) for k in self.TRAILER_FIELDS}
+        d["frame_sizes"] = frame_sizes
+        return json.dumps(d, separators=(",", ":")).encode("utf-8")
+
     @classmethod
-    def from_json(cls, data: bytes) -> "ContainerMetadata":
+    def from_json(cls, data: bytes, trailer: Optional[bytes] = None) -> "ContainerMetadata":
         d = json.loads(data)
+        if trailer is not None:
+            d.update(json.loads(trailer))
+        for k in cls.TRAILER_FIELDS:
+            d.setdefault(k, "" if k == "sha256_plaintext" else 0)
         return cls(**{k: v for k, v in d.items() if k in cls.__dataclass_fields__})
 
 
@@ -204,13 +251,261 @@ def _hmac_sha256(key: bytes, data: bytes) -> bytes:
     return _hmac.new(key, data, hashlib.sha256).digest()
 
 
+def _frame_nonce(prefix: bytes, index: int) -> bytes:
+    return prefix + struct.pack(">I", index)
+
+
+def _frame_aad(index: int, flags: int) -> bytes:
+    return _FRAME_AAD_PREFIX + struct.pack(">IB", index, flags)
+
+
+def _iter_chunks(source: ByteSource, chunk_size: int) -> Iterator[bytes]:
+    """Re-block any byte source into chunk_size pieces (last one may be short).
+
+    Only one chunk is buffered at a time regardless of the source type.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for off in range(0, len(view), chunk_size):
+            yield bytes(view[off:off + chunk_size])
+        return
+
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(chunk_size)
+            if not block:
+                return
+            # Streams may return short reads before EOF — top up to a full chunk
+            while len(block) < chunk_size:
+                more = source.read(chunk_size - len(block))
+                if not more:
+                    break
+                block += more
+            yield bytes(block)
+            if len(block) < chunk_size:
+                return
+
+    buf = bytearray()
+    for block in source:
+        buf += block
+        while len(buf) >= chunk_size:
+            yield bytes(buf[:chunk_size])
+            del buf[:chunk_size]
+    if buf:
+        yield bytes(buf)
+
+
+def _iter_ordered(pool: ThreadPoolExecutor, fn, items: Iterable, window: int, *,
+                  return_exceptions: bool = False) -> Iterator:
+    """Run fn over items on pool, yielding results in input order.
+
+    At most window items are submitted ahead of the consumer.  On an early
+    close or a raised failure, work that has not started is cancelled.
+    """
+    pending: deque = deque()
+
+    def _next_result():
+        future = pending.popleft()
+        try:
+            return future.result()
+        except Exception as exc:
+            if not return_exceptions:
+                raise
+            return exc
+
+    try:
+        for item in items:
+            if len(pending) >= window:
+                yield _next_result()
+            pending.append(pool.submit(fn, item))
+        while pending:
+            yield _next_result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# Frames of one large file are sealed on a process-wide pool shared by all
+# uploads, so concurrent builds cannot multiply the thread count.
+_frame_pool_lock = threading.Lock()
+_frame_pool_obj: Optional[ThreadPoolExecutor] = None
+
+
+def _frame_workers() -> int:
+    return max(1, get_settings().VAULT_FRAME_WORKERS or os.cpu_count() or 1)
+
+
+def _frame_pool() -> ThreadPoolExecutor:
+    global _frame_pool_obj
+    with _frame_pool_lock:
+        if _frame_pool_obj is None:
+            _frame_pool_obj = ThreadPoolExecutor(max_workers=_frame_workers(),
+                                                 thread_name_prefix="ssce-frame")
+        return _frame_pool_obj
+
+
+def _seal_frame(cipher: AESGCM, cctx, nonce_prefix: bytes, index: int,
+                chunk: bytes, final: bool) -> tuple[bytes, int]:
+    """Compress (if it helps) and seal one chunk.  Returns (frame record, payload size)."""
+    payload, flags = chunk, 0
+    if cctx is not None:
+        packed = cctx.compress(chunk)
+        if len(packed) < len(chunk):
+            payload, flags = packed, FRAME_COMPRESSED
+    if final:
+        flags |= FRAME_FINAL
+    sealed = cipher.encrypt(_frame_nonce(nonce_prefix, index), payload, _frame_aad(index, flags))
+    return struct.pack(">IB", len(sealed), flags) + sealed, len(payload)
+
+
+def iter_build_container(
+    source: ByteSource,
+    *,
+    filename: str,
+    content_type: str,
+    user_id: str,
+    key_version: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compression: Optional[str] = None,
+) -> Generator[bytes, None, ContainerMetadata]:
+    """Stream a v2 .syncveil container, yielding it piece by piece.
+
+    source may be bytes, a readable binary stream or an iterable of byte
+    blocks.  Peak memory is one chunk: each chunk is compressed, sealed and
+    yielded before the next one is read.  The generator's return value
+    (StopIteration.value) is the completed ContainerMetadata — use
+    write_container() when you just want to drain into a file-like sink.
+
+    The zstd level (or no compression at all) is chosen from the first
+    chunk by app.core.compression; compression= pins a mode
+    (none | fast | default | high) instead.
+
+    Files of more than one chunk are compressed and sealed on a shared pool
+    of VAULT_FRAME_WORKERS threads, a bounded window of frames ahead of the
+    consumer; output is byte-for-byte what the serial path would produce
+    for the same keys and nonces.
+    """
+    if not user_id:
+        raise ValueError("user_id is required to wrap the file key")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+
+    key_version = key_version or current_key_version()
+    mac = _container_mac(key_version)
+    sha = hashlib.sha256()
+
+    meta = ContainerMetadata(
+        original_filename = filename,
+        original_size     = 0,
+        content_type      = content_type,
+        compressed_size   = 0,
+        sha256_plaintext  = "",
+        key_version       = key_version,
+        user_id           = user_id,
+        chunk_size        = chunk_size,
+    )
+
+    # The policy looks at the first chunk, so read it (plus a one-chunk
+    # lookahead to flag the final frame) before the header goes out.
+    chunks   = _iter_chunks(source, chunk_size)
+    current  = next(chunks, b"")         # empty input still gets one (empty) frame
+    upcoming = next(chunks, None)
+    choice   = compression_policy.choose(content_type, current, whole_file=upcoming is None,
+                                         mode=compression)
+    meta.compression = choice.name
+    zdict = compression_policy.active_dictionary(current, upcoming is None, user_id) if choice.enabled else None
+    if zdict is not None:
+        meta.dict_id = zdict.dict_id()
+
+    # File key wrapped with the user-scoped key — identical to v1
+    file_key     = os.urandom(32)
+    file_nonce   = os.urandom(12)
+    enc_file_key = user_wrap_cipher(user_id, key_version).encrypt(file_nonce, file_key, None)
+    nonce_prefix = os.urandom(8)
+
+    meta_bytes = meta.header_json()
+    header = b"".join((
+        MAGIC,
+        struct.pack(">B", VERSION),
+        struct.pack(">I", len(meta_bytes)),
+        meta_bytes,
+        file_nonce,
+        enc_file_key,
+        nonce_prefix,
+    ))
+    mac.update(header)
+    yield header
+
+    file_cipher = AESGCM(file_key)
+    frame_sizes: list[int] = []
+
+    def _numbered() -> Iterator[tuple[int, bytes, bool]]:
+        # Runs on the caller's thread, in order: the plaintext digest and
+        # sizes never depend on which worker seals a frame.
+        nonlocal current, upcoming
+        index = 0
+        while True:
+            sha.update(current)
+            meta.original_size += len(current)
+            yield index, current, upcoming is None
+            if upcoming is None:
+                return
+            current, upcoming = upcoming, next(chunks, None)
+            index += 1
+
+    workers = _frame_workers()
+    if workers > 1 and upcoming is not None:
+        # Multi-frame file: seal frames in parallel, emit them in order.  Each
+        # task gets its own zstd context (contexts are not thread-safe).
+        def _seal(item: tuple[int, bytes, bool]) -> tuple[bytes, int]:
+            cctx = compression_policy.compressor(choice.level, zdict) if choice.enabled else None
+            return _seal_frame(file_cipher, cctx, nonce_prefix, *item)
+
+        window = max(2, min(2 * workers, FRAME_BUFFER_BYTES // chunk_size))
+        sealed = _iter_ordered(_frame_pool(), _seal, _numbered(), window)
+    else:
+        cctx   = compression_policy.compressor(choice.level, zdict) if choice.enabled else None
+        sealed = (_seal_frame(file_cipher, cctx, nonce_prefix, *item) for item in _numbered())
+
+    try:
+        for frame, payload_size in sealed:
+            meta.compressed_size += payload_size
+            frame_sizes.append(len(frame) - 5)
+            mac.update(frame)
+            yield frame
+    finally:
+        sealed.close()
+
+    meta.sha256_plaintext = sha.hexdigest()
+    meta.frame_count      = len(frame_sizes)
+
+    trailer = meta.trailer_json(frame_sizes)
+    tail    = struct.pack(">I", 0) + trailer + struct.pack(">I", len(trailer))
+    mac.update(tail)
+    yield tail + mac.digest()
+    return meta
+
+
+def write_container(source: ByteSource, sink: BinaryIO, **kwargs) -> tuple[int, ContainerMetadata]:
+    """Drain iter_build_container() into sink.  Returns (bytes_written, metadata)."""
+    gen = iter_build_container(source, **kwargs)
+    written = 0
+    while True:
+        try:
+            piece = next(gen)
+        except StopIteration as stop:
+            return written, stop.value
+        sink.write(piece)
+        written += len(piece)
+
+
 def build_container(
     plaintext: bytes,
     *,
     filename: str,
     content_type: str,
     user_id: str,
-    key_version: int = 1,
+    key_version: Optional[int] = None,
 ) -> tuple[bytes, ContainerMetadata]:
     """Compress → encrypt → wrap in .syncveil container.
 
@@ -223,132 +518,695 @@ def build_container(
     rather than a shared global key.  key_version tracks which rotation of
     VAULT_ENCRYPTION_KEY was used; it is stored in the container and in the
     VaultFile.key_version DB column so re-wrapping on rotation is auditable.
+
+    Convenience wrapper over iter_build_container() for callers that already
+    hold the whole file in memory; large files should stream instead.
     """
-    # 1. SHA-256 of original plaintext (integrity anchor)
-    sha256_plain = hashlib.sha256(plaintext).hexdigest()
+    buf = io.BytesIO()
+    _, meta = write_container(
+        plaintext,
+        buf,
+        filename=filename,
+        content_type=content_type,
+        user_id=user_id,
+        key_version=key_version,
+    )
+    return buf.getvalue(), meta
 
-    # 2. Compress with Zstandard (level 3 — fast, good ratio)
-    cctx = zstd.ZstdCompressor(level=3)
-    compressed = cctx.compress(plaintext)
 
-    # 3. Derive the user-scoped wrapping key for this user
-    user_key   = derive_user_key(user_id)
+class _MacReader:
+    """Sequential reader over a container that feeds every byte into an HMAC.
 
-    # 4. Generate a random 256-bit file key
-    file_key   = os.urandom(32)
-    file_nonce = os.urandom(12)
+    The HMAC key depends on the header's key_version, so bytes read before
+    keyed() is called are held back and fed in then.
+    """
 
-    # 5. Encrypt the file key with the user-scoped key
-    user_cipher  = AESGCM(user_key)
-    enc_file_key = user_cipher.encrypt(file_nonce, file_key, None)  # 32+16 = 48 bytes
+    def __init__(self, stream: BinaryIO, mac=None):
+        self._stream  = stream
+        self._mac     = mac
+        self._pending = bytearray()
+
+    def keyed(self, mac) -> None:
+        mac.update(self._pending)
+        self._pending = bytearray()
+        self._mac     = mac
+
+    def read(self, n: int) -> bytes:
+        data = self._stream.read(n)
+        while len(data) < n:
+            more = self._stream.read(n - len(data))
+            if not more:
+                raise ValueError("Truncated container")
+            data += more
+        if self._mac is None:
+            self._pending += data
+        else:
+            self._mac.update(data)
+        return data
 
-    # 6. Encrypt the compressed payload with the file key
-    data_nonce  = os.urandom(12)
-    file_cipher = AESGCM(file_key)
-    # AAD = sha256_plain bytes — binds ciphertext to original content hash
-    aad         = sha256_plain.encode("ascii")
-    ciphertext  = file_cipher.encrypt(data_nonce, compressed, aad)  # includes 16-byte GCM tag
+    def read_rest(self, limit: int) -> bytes:
+        """Read to EOF without MAC-ing (caller splits off the HMAC itself)."""
+        data = self._stream.read(limit + 1)
+        if len(data) > limit:
+            raise ValueError("Container trailer too large")
+        return data
 
-    # 7. Build metadata
-    meta = ContainerMetadata(
-        original_filename = filename,
-        original_size     = len(plaintext),
-        content_type      = content_type,
-        compressed_size   = len(compressed),
-        sha256_plaintext  = sha256_plain,
-        key_version       = key_version,
-        user_id           = user_id,
-    )
-    meta_bytes = meta.to_json()
 
-    # 8. Assemble container (everything before HMAC)
-    buf = io.BytesIO()
-    buf.write(MAGIC)                              # 8 bytes
-    buf.write(struct.pack(">B",  VERSION))        # 1 byte
-    buf.write(struct.pack(">I",  len(meta_bytes)))# 4 bytes
-    buf.write(meta_bytes)
-    buf.write(file_nonce)                         # 12 bytes
-    buf.write(enc_file_key)                       # 48 bytes
-    buf.write(data_nonce)                         # 12 bytes
-    buf.write(struct.pack(">I", len(ciphertext))) # 4 bytes
-    buf.write(ciphertext)
-    pre_hmac = buf.getvalue()
+def _as_stream(source: Union[bytes, bytearray, memoryview, BinaryIO]) -> BinaryIO:
+    if isinstance(source, bytes):
+        return io.BytesIO(source)        # BytesIO shares an immutable bytes buffer
+    if isinstance(source, (bytearray, memoryview)):
+        return io.BytesIO(bytes(source))
+    return source
 
-    # 9. HMAC-SHA256 over entire container up to this point
-    sig = _hmac_sha256(MASTER_KEY, pre_hmac)
 
-    container = pre_hmac + sig                    # + 32 bytes HMAC
-    return container, meta
+def _unwrap_file_key(meta: ContainerMetadata, file_nonce: bytes, enc_file_key: bytes) -> bytes:
+    if not meta.user_id:
+        raise ValueError("Container missing user_id — cannot derive decryption key")
+    user_cipher = user_wrap_cipher(meta.user_id, meta.key_version)
+    try:
+        return user_cipher.decrypt(file_nonce, enc_file_key, None)
+    except Exception:
+        raise ValueError("File key decryption failed")
 
 
-def parse_container(container: bytes) -> tuple[bytes, ContainerMetadata]:
-    """Verify HMAC → decrypt → decompress → return (plaintext, metadata).
+def _split_trailer(rest: bytes) -> tuple[bytes, bytes, bytes]:
+    """Split the bytes after the terminator into (trailer, mac_covered_tail, hmac)."""
+    if len(rest) < 4 + 32:
+        raise ValueError("Truncated container trailer")
+    stored_hmac  = rest[-32:]
+    trailer_len  = struct.unpack(">I", rest[-36:-32])[0]
+    trailer      = rest[:-36]
+    if len(trailer) != trailer_len:
+        raise ValueError("Container trailer length mismatch")
+    return trailer, rest[:-32], stored_hmac
 
-    Raises ValueError on any tampering, wrong key, or format error.
-    The user-scoped key is re-derived from the user_id embedded in container
-    metadata, so callers do not need to pass the key explicitly.
+
+def _open_frame(cipher: AESGCM, dctx, nonce_prefix: bytes, index: int,
+                flags: int, sealed: bytes, chunk_size: int) -> bytes:
+    try:
+        payload = cipher.decrypt(_frame_nonce(nonce_prefix, index), sealed, _frame_aad(index, flags))
+    except Exception:
+        raise ValueError(f"Frame {index} decryption failed — wrong key or tampered data")
+    if not flags & FRAME_COMPRESSED:
+        return payload
+    try:
+        return dctx.decompress(payload, max_output_size=chunk_size)
+    except Exception as exc:
+        raise ValueError(f"Frame {index} decompression failed: {exc}") from exc
+
+
+# ── Zero-copy container inspection ────────────────────────────────────────────
+
+class ContainerView:
+    """Lazily parsed, copy-free view over a stored container.
+
+    Wraps bytes / bytearray / memoryview / mmap directly, an io.BytesIO via
+    its shared buffer, and a plain on-disk file via a read-only mmap.  Any
+    other seekable stream (e.g. an S3 range reader or a spooled temp file)
+    is read on demand, so header inspection touches only the header and the
+    tail.  Header fields are parsed the first time they are asked for; the
+    payload itself is only ever exposed as a memoryview span.
+
+    Use as a context manager (or call close()) to release maps and buffer
+    exports.
     """
-    if len(container) < 8 + 1 + 4 + 12 + 48 + 12 + 4 + 32:
-        raise ValueError("Container too short")
 
-    # 1. Split HMAC off the end
-    body, stored_hmac = container[:-32], container[-32:]
+    def __init__(self, source: Union[bytes, bytearray, memoryview, mmap.mmap, BinaryIO]):
+        self._mv:     Optional[memoryview] = None
+        self._map:    Optional[mmap.mmap]  = None
+        self._stream: Optional[BinaryIO]   = None
+
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self._mv = memoryview(source).cast("B")
+        elif isinstance(source, io.BytesIO):
+            self._mv = source.getbuffer()
+        elif _is_disk_file(source):
+            size = os.fstat(source.fileno()).st_size
+            if size:
+                self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mv  = memoryview(self._map)
+            else:
+                self._mv = memoryview(b"")
+        else:
+            self._stream = source
 
-    # 2. Verify HMAC first (constant-time comparison)
-    expected_hmac = _hmac_sha256(MASTER_KEY, body)
-    if not _hmac.compare_digest(stored_hmac, expected_hmac):
-        raise ValueError("HMAC verification failed — container may be tampered")
+        if self._mv is not None:
+            self.size = len(self._mv)
+        else:
+            self.size = source.seek(0, io.SEEK_END)
+
+    # -- lifecycle --------------------------------------------------------
+
+    def close(self) -> None:
+        if self._mv is not None:
+            self._mv.release()
+            self._mv = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass        # a caller still holds a slice; the map goes when it does
+            self._map = None
+        self._stream = None
+
+    def __enter__(self) -> "ContainerView":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- raw access -------------------------------------------------------
+
+    def read(self, offset: int, n: int) -> Union[memoryview, bytes]:
+        """Return exactly n bytes at offset — a memoryview slice when mapped."""
+        if offset < 0 or n < 0 or offset + n > self.size:
+            raise ValueError("Truncated container")
+        if self._mv is not None:
+            return self._mv[offset:offset + n]
+        if self._stream is None:
+            raise ValueError("ContainerView is closed")
+        self._stream.seek(offset)
+        data = self._stream.read(n)
+        if len(data) != n:
+            raise ValueError("Truncated container")
+        return data
+
+    def iter_blocks(self, start: int, end: int, block_size: int = 1024 * 1024) -> Iterator[Union[memoryview, bytes]]:
+        """Yield [start, end) in pieces — one slice when mapped, blocks otherwise."""
+        if self._mv is not None:
+            yield self.read(start, end - start)
+            return
+        for off in range(start, end, block_size):
+            yield self.read(off, min(block_size, end - off))
+
+    # -- header -----------------------------------------------------------
+
+    @cached_property
+    def magic(self) -> bytes:
+        return bytes(self.read(0, 8))
+
+    @cached_property
+    def version(self) -> int:
+        if self.magic != MAGIC:
+            raise ValueError(f"Invalid magic: {self.magic!r}")
+        version = self.read(8, 1)[0]
+        if version not in (VERSION_V1, VERSION):
+            raise ValueError(f"Unsupported container version: {version}")
+        return version
+
+    @cached_property
+    def header_json(self) -> bytes:
+        _ = self.version                  # validates magic + version first
+        meta_len = struct.unpack(">I", self.read(9, 4))[0]
+        return bytes(self.read(13, meta_len))
+
+    @property
+    def _keys_offset(self) -> int:
+        return 13 + len(self.header_json)
+
+    @cached_property
+    def file_nonce(self) -> bytes:
+        return bytes(self.read(self._keys_offset, 12))
+
+    @cached_property
+    def enc_file_key(self) -> bytes:
+        """The 48-byte wrapped file key (32 key + 16 GCM tag)."""
+        return bytes(self.read(self._keys_offset + 12, 48))
+
+    @cached_property
+    def payload_nonce(self) -> bytes:
+        """v1: the payload DataNonce.  v2: the 8-byte frame NoncePrefix."""
+        return bytes(self.read(self._keys_offset + 60, 12 if self.version == VERSION_V1 else 8))
+
+    @cached_property
+    def payload_span(self) -> tuple[int, int]:
+        """[start, end) of the encrypted payload — v1 ciphertext+tag, v2 frame records."""
+        if self.version == VERSION_V1:
+            start      = self._keys_offset + 60 + 12 + 4
+            cipher_len = struct.unpack(">I", self.read(start - 4, 4))[0]
+            if start + cipher_len + 32 != self.size:
+                raise ValueError("Truncated ciphertext")
+            return start, start + cipher_len
+        start = self._keys_offset + 68
+        end   = self.size - 32 - 4 - len(self.trailer_json or b"") - 4   # before Terminator
+        if end < start:
+            raise ValueError("Truncated container")
+        return start, end
+
+    def payload(self) -> Union[memoryview, bytes]:
+        start, end = self.payload_span
+        return self.read(start, end - start)
+
+    # -- tail -------------------------------------------------------------
+
+    @cached_property
+    def trailer_json(self) -> Optional[bytes]:
+        """v2 trailer JSON (sizes and digests); None for v1."""
+        if self.version == VERSION_V1:
+            return None
+        if self.size < 36:
+            raise ValueError("Truncated container trailer")
+        trailer_len = struct.unpack(">I", self.read(self.size - 36, 4))[0]
+        if trailer_len > MAX_TRAILER_LEN or trailer_len + 36 > self.size:
+            raise ValueError("Container trailer too large")
+        return bytes(self.read(self.size - 36 - trailer_len, trailer_len))
+
+    @cached_property
+    def hmac(self) -> bytes:
+        return bytes(self.read(self.size - 32, 32))
+
+    @cached_property
+    def metadata(self) -> ContainerMetadata:
+        return ContainerMetadata.from_json(self.header_json, self.trailer_json)
+
+    def verify_hmac(self) -> bool:
+        """Recompute HMAC-SHA256 over the body (no copy when mapped)."""
+        if self.size < 32:
+            return False
+        mac = _container_mac(ContainerMetadata.from_json(self.header_json).key_version)
+        for block in self.iter_blocks(0, self.size - 32):
+            mac.update(block)
+        return _hmac.compare_digest(self.hmac, mac.digest())
+
+
+def _is_disk_file(stream) -> bool:
+    """True for a buffered reader over a regular file — safe to mmap."""
+    return isinstance(stream, io.BufferedReader) and isinstance(stream.raw, io.FileIO)
+
+
+# ── Streaming verification ────────────────────────────────────────────────────
+
+class ContainerVerifier:
+    """Forward-only integrity check fed block by block from a storage stream.
+
+    Keeps the HMAC running over everything but a 32-byte hold-back, and
+    walks the container structure as bytes arrive: header, then v2 frame
+    records (skipped, only their lengths and flags are looked at) or the v1
+    ciphertext, then the trailer.  Memory is bounded by the header and the
+    trailer, never by the payload, and the source never has to seek — a
+    plain object-store GET body works as well as a mapped file.
+
+    Nothing is decrypted; use iter_parse_container() for that.
+    """
 
-    # 3. Parse header
-    r = io.BytesIO(body)
+    def __init__(self):
+        self._mac      = None           # keyed once the header's key_version is known
+        self._prefix: Optional[bytearray] = bytearray()   # bytes seen before that
+        self._hold     = b""            # last 32 bytes seen — the HMAC candidate
+        self._buf      = bytearray()
+        self._need     = 13             # bytes wanted by the current state
+        self._skip     = 0              # payload bytes to pass over
+        self._state    = "fixed"
+        self._rest     = bytearray()    # everything after the frames (v2) / ciphertext (v1)
+        self._frames: list[int] = []
+        self._final    = False
+        self.size      = 0
+        self.version: Optional[int] = None
+        self.magic_valid = False
+        self.header_json = b""
+        self.error: Optional[str] = None
+
+    def update(self, block: Union[bytes, bytearray, memoryview]) -> None:
+        if not block:
+            return
+        mv = memoryview(block).cast("B")
+        self.size += len(mv)
+
+        # The MAC key depends on the header's key_version, so hold back the
+        # bytes up to the end of the header — never more — and key the MAC
+        # as soon as the header is parsed; the rest of the block goes to it
+        # directly, however large the block is.
+        while len(mv) and self._mac is None and self._prefix is not None:
+            head = mv[:self._need - len(self._buf)]
+            mv   = mv[len(head):]
+            self._prefix += head
+            self._parse(head)
+            if self.error is not None:
+                self._prefix = None       # header unreadable — HMAC cannot be checked
+            elif self._state not in ("fixed", "meta"):
+                self._key_mac()
+        if not len(mv):
+            return
+        self._parse(mv)
+        if self._mac is not None:
+            self._feed_mac(mv)
+
+    def _parse(self, mv: memoryview) -> None:
+        if self.error is None:
+            try:
+                self._consume(mv)
+            except ValueError as exc:
+                self.error = str(exc)
+
+    def _key_mac(self) -> None:
+        try:
+            self._mac = _container_mac(ContainerMetadata.from_json(self.header_json).key_version)
+        except Exception as exc:
+            self.error, self._prefix = f"Unreadable metadata: {exc}", None
+            return
+        prefix, self._prefix = self._prefix, None
+        self._feed_mac(memoryview(prefix))
+
+    def _feed_mac(self, mv: memoryview) -> None:
+        if len(mv) >= 32:
+            self._mac.update(self._hold)
+            self._mac.update(mv[:-32])
+            self._hold = bytes(mv[-32:])
+        else:
+            joined = self._hold + bytes(mv)
+            self._mac.update(joined[:-32])
+            self._hold = joined[-32:]
+
+    def _consume(self, mv: memoryview) -> None:
+        while len(mv):
+            if self._skip:
+                n = min(self._skip, len(mv))
+                self._skip -= n
+                mv = mv[n:]
+                if not self._skip and self.version == VERSION_V1:
+                    self._state = "rest"
+                continue
+            if self._state == "rest":
+                if len(self._rest) + len(mv) > MAX_TRAILER_LEN + 36:
+                    raise ValueError("Container trailer too large")
+                self._rest += mv
+                return
+            take = mv[:self._need - len(self._buf)]
+            self._buf += take
+            mv = mv[len(take):]
+            if len(self._buf) == self._need:
+                field = bytes(self._buf)
+                self._buf.clear()
+                self._advance(field)
+
+    def _advance(self, field: bytes) -> None:
+        state = self._state
+        if state == "fixed":
+            self.magic_valid = field[:8] == MAGIC
+            if not self.magic_valid:
+                raise ValueError(f"Invalid magic: {field[:8]!r}")
+            self.version = field[8]
+            if self.version not in (VERSION_V1, VERSION):
+                raise ValueError(f"Unsupported container version: {self.version}")
+            meta_len = struct.unpack(">I", field[9:13])[0]
+            if meta_len > MAX_TRAILER_LEN:
+                raise ValueError("Container header too large")
+            self._state, self._need = "meta", meta_len
+            if meta_len == 0:
+                self._advance(b"")
+        elif state == "meta":
+            self.header_json = field
+            # v1: FileNonce, EncFileKey, DataNonce, CipherLen — v2: ..., NoncePrefix
+            self._state, self._need = "keys", (12 + 48 + 12 + 4 if self.version == VERSION_V1 else 68)
+        elif state == "keys":
+            if self.version == VERSION_V1:
+                self._skip  = struct.unpack(">I", field[-4:])[0]
+                self._state = "rest" if not self._skip else "cipher"
+            else:
+                self._state, self._need = "frame_len", 4
+        elif state == "frame_len":
+            frame_len = struct.unpack(">I", field)[0]
+            if frame_len == 0:
+                self._state = "rest"
+                return
+            if self._final:
+                raise ValueError("Frame after final frame")
+            if frame_len > MAX_CHUNK_SIZE + 1024:
+                raise ValueError(f"Frame {len(self._frames)} too large")
+            self._frames.append(frame_len)
+            self._state, self._need = "frame_flags", 1
+        elif state == "frame_flags":
+            self._final = bool(field[0] & FRAME_FINAL)
+            self._skip  = self._frames[-1]
+            self._state, self._need = "frame_len", 4
+
+    def result(self) -> dict:
+        """Finish the pass; same shape as verify_container_integrity()."""
+        result = {
+            "hmac_valid":        False,
+            "magic_valid":       self.magic_valid,
+            "version":           self.version,
+            "metadata_readable": False,
+            "integrity_ok":      False,
+            "error":             self.error,
+        }
+        if self.size < 64:
+            result["error"] = "Container too short"
+            return result
+        result["hmac_valid"] = (self._mac is not None
+                                and _hmac.compare_digest(self._hold, self._mac.digest()))
+        if self.error is None:
+            try:
+                meta = self._finish_structure()
+                result["metadata_readable"] = True
+                result["original_filename"] = meta.original_filename
+                result["original_size"]     = meta.original_size
+                result["compression"]       = meta.compression
+                result["encryption"]        = meta.encryption
+                result["created_at"]        = meta.created_at
+            except ValueError as exc:
+                self.error = result["error"] = str(exc)
+            except Exception as exc:
+                self.error = result["error"] = f"Unreadable metadata: {exc}"
+        result["integrity_ok"] = (result["hmac_valid"] and result["magic_valid"]
+                                  and result["metadata_readable"] and self.error is None)
+        return result
+
+    def _finish_structure(self) -> ContainerMetadata:
+        if self._state != "rest" or self._skip:
+            raise ValueError("Truncated container")
+        if self.version == VERSION_V1:
+            if len(self._rest) != 32:
+                raise ValueError("Unexpected data after ciphertext")
+            return ContainerMetadata.from_json(self.header_json)
+        if not self._final:
+            raise ValueError("Container truncated — final frame missing")
+        trailer, _, _ = _split_trailer(bytes(self._rest))
+        meta = ContainerMetadata.from_json(self.header_json, trailer)
+        if meta.frame_count != len(self._frames) or json.loads(trailer).get("frame_sizes") != self._frames:
+            raise ValueError("Container trailer does not match frames")
+        return meta
+
+
+def verify_container_stream(stream: BinaryIO, block_size: int = 1024 * 1024) -> dict:
+    """Run ContainerVerifier over a sequential stream in constant memory."""
+    verifier = ContainerVerifier()
+    for block in iter(lambda: stream.read(block_size), b""):
+        verifier.update(block)
+    return verifier.result()
+
+
+def iter_parse_container(
+    source: Union[bytes, bytearray, memoryview, BinaryIO],
+) -> Generator[bytes, None, ContainerMetadata]:
+    """Verify and decrypt a container, yielding plaintext one frame at a time.
+
+    Each v2 frame is AES-GCM authenticated on its own, so its plaintext is
+    yielded as soon as it decrypts; the whole-container HMAC and plaintext
+    SHA-256 are checked once the stream is exhausted and a ValueError is
+    raised then if either mismatches.  Callers relaying chunks to a client
+    must treat that late error as a failed transfer.
+
+    v1 containers are single-frame and are parsed whole, then re-chunked.
+    The generator's return value is the ContainerMetadata.
+    """
+    stream = _as_stream(source)
+    r      = _MacReader(stream)
 
     magic = r.read(8)
     if magic != MAGIC:
         raise ValueError(f"Invalid magic: {magic!r}")
-
     version = struct.unpack(">B", r.read(1))[0]
+
+    if version == VERSION_V1:
+        plaintext, meta = parse_container(magic + bytes([version]) + stream.read())
+        for off in range(0, len(plaintext), DEFAULT_CHUNK_SIZE):
+            yield plaintext[off:off + DEFAULT_CHUNK_SIZE]
+        return meta
     if version != VERSION:
         raise ValueError(f"Unsupported container version: {version}")
 
-    meta_len   = struct.unpack(">I", r.read(4))[0]
-    meta_bytes = r.read(meta_len)
-    meta       = ContainerMetadata.from_json(meta_bytes)
+    meta_len     = struct.unpack(">I", r.read(4))[0]
+    header_json  = r.read(meta_len)
+    header_meta  = ContainerMetadata.from_json(header_json)
+    chunk_size   = header_meta.chunk_size
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Invalid chunk size: {chunk_size}")
+    mac = _container_mac(header_meta.key_version)
+    r.keyed(mac)
+
+    file_nonce   = r.read(12)
+    enc_file_key = r.read(48)
+    nonce_prefix = r.read(8)
+    file_cipher  = AESGCM(_unwrap_file_key(header_meta, file_nonce, enc_file_key))
+    dctx         = compression_policy.decompressor(header_meta.dict_id)
+    sha          = hashlib.sha256()
+
+    index, total, final_seen = 0, 0, False
+    while True:
+        frame_len = struct.unpack(">I", r.read(4))[0]
+        if frame_len == 0:
+            break
+        if final_seen:
+            raise ValueError("Frame after final frame")
+        if frame_len > chunk_size + 1024:
+            raise ValueError(f"Frame {index} too large")
+        flags = r.read(1)[0]
+        chunk = _open_frame(file_cipher, dctx, nonce_prefix, index, flags, r.read(frame_len), chunk_size)
+        final_seen = bool(flags & FRAME_FINAL)
+        if not final_seen and len(chunk) != chunk_size:
+            raise ValueError(f"Frame {index} has short plaintext")
+        sha.update(chunk)
+        total += len(chunk)
+        index += 1
+        yield chunk
+
+    if not final_seen:
+        raise ValueError("Container truncated — final frame missing")
+
+    trailer, covered, stored_hmac = _split_trailer(r.read_rest(MAX_TRAILER_LEN + 36))
+    mac.update(covered)
+    if not _hmac.compare_digest(stored_hmac, mac.digest()):
+        raise ValueError("HMAC verification failed — container may be tampered")
 
-    file_nonce  = r.read(12)
-    enc_file_key= r.read(48)        # 32 encrypted key + 16 GCM tag
-    data_nonce  = r.read(12)
-    cipher_len  = struct.unpack(">I", r.read(4))[0]
-    ciphertext  = r.read(cipher_len)
+    meta = ContainerMetadata.from_json(header_json, trailer)
+    if meta.frame_count != index or meta.original_size != total:
+        raise ValueError("Container trailer does not match frames")
+    if sha.hexdigest() != meta.sha256_plaintext:
+        raise ValueError("Plaintext integrity check failed — sha256 mismatch")
+    return meta
 
-    if len(ciphertext) != cipher_len:
-        raise ValueError("Truncated ciphertext")
 
-    # 4. Recover file key using the user-scoped key from metadata
-    if not meta.user_id:
-        raise ValueError("Container missing user_id — cannot derive decryption key")
-    user_key      = derive_user_key(meta.user_id)
-    user_cipher   = AESGCM(user_key)
-    try:
-        file_key = user_cipher.decrypt(file_nonce, enc_file_key, None)
-    except Exception:
-        raise ValueError("File key decryption failed")
+@dataclass
+class _FrameIndex:
+    """Random-access view of a v2 container: header fields plus frame offsets."""
+    meta:         ContainerMetadata
+    file_nonce:   bytes
+    enc_file_key: bytes
+    nonce_prefix: bytes
+    offsets:      list[int]      # absolute offset of each frame's FrameLen field
+    sizes:        list[int]      # sealed length of each frame
+
+
+def _load_frame_index(view: ContainerView) -> _FrameIndex:
+    """Read a v2 header and trailer through a ContainerView without touching frames."""
+    if view.version != VERSION:
+        raise ValueError(f"Unsupported container version for random access: {view.version}")
+    meta = view.metadata
+    if not 0 < meta.chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Invalid chunk size: {meta.chunk_size}")
+    sizes = [int(n) for n in json.loads(view.trailer_json).get("frame_sizes", [])]
+    if len(sizes) != meta.frame_count or not sizes:
+        raise ValueError("Container frame index is inconsistent")
+
+    offsets, pos = [], view.payload_span[0]
+    for n in sizes:
+        offsets.append(pos)
+        pos += 5 + n
+    return _FrameIndex(meta, view.file_nonce, view.enc_file_key, view.payload_nonce, offsets, sizes)
+
+
+def iter_container_range(
+    source: Union[bytes, bytearray, memoryview, BinaryIO],
+    start: int,
+    end: int,
+) -> Iterator[bytes]:
+    """Yield plaintext bytes [start, end] (inclusive) of a container.
+
+    For v2 only the frames overlapping the range are read and decrypted —
+    frame i covers plaintext [i*chunk_size, (i+1)*chunk_size).  Each frame
+    is GCM-authenticated on its own; the whole-container HMAC is not
+    checked because that would mean reading every byte.  v1 containers are
+    single-frame, so they are parsed in full and sliced.
+
+    source must be a buffer or a seekable binary stream; mapped sources
+    (bytes, BytesIO, on-disk files) are decrypted without copying frames.
+    """
+    if start < 0 or end < start:
+        raise ValueError("Invalid byte range")
+
+    with ContainerView(source) as view:
+        if view.version == VERSION_V1:
+            plaintext, _ = parse_container(view.read(0, view.size))
+            yield plaintext[start:end + 1]
+            return
+
+        idx        = _load_frame_index(view)
+        chunk_size = idx.meta.chunk_size
+        if end >= idx.meta.original_size:
+            raise ValueError("Byte range beyond end of file")
+
+        cipher = AESGCM(_unwrap_file_key(idx.meta, idx.file_nonce, idx.enc_file_key))
+        dctx   = compression_policy.decompressor(idx.meta.dict_id)
+        last   = len(idx.sizes) - 1
+        for i in range(start // chunk_size, end // chunk_size + 1):
+            sealed_len, flags = struct.unpack(">IB", view.read(idx.offsets[i], 5))
+            if sealed_len != idx.sizes[i] or bool(flags & FRAME_FINAL) != (i == last):
+                raise ValueError(f"Frame {i} does not match container index")
+            sealed = view.read(idx.offsets[i] + 5, sealed_len)
+            chunk  = _open_frame(cipher, dctx, idx.nonce_prefix, i, flags, sealed, chunk_size)
+
+            base = i * chunk_size
+            lo   = max(start - base, 0)
+            hi   = min(end - base + 1, len(chunk))
+            yield chunk[lo:hi]
 
-    # 5. Decrypt payload
-    file_cipher = AESGCM(file_key)
-    aad         = meta.sha256_plaintext.encode("ascii")
-    try:
-        compressed = file_cipher.decrypt(data_nonce, ciphertext, aad)
-    except Exception:
-        raise ValueError("Payload decryption failed — wrong key or tampered data")
 
-    # 6. Decompress
+def parse_container(container: bytes) -> tuple[bytes, ContainerMetadata]:
+    """Verify HMAC → decrypt → decompress → return (plaintext, metadata).
+
+    Raises ValueError on any tampering, wrong key, or format error.
+    The user-scoped key is re-derived from the user_id embedded in container
+    metadata, so callers do not need to pass the key explicitly.
+
+    Handles both layouts; v2 containers are decoded via iter_parse_container()
+    and joined, so prefer the iterator for anything large.
+    """
+    if len(container) < 8 + 1 + 4 + 12 + 48 + 12 + 4 + 32:
+        raise ValueError("Container too short")
+    if bytes(container[:8]) != MAGIC:
+        raise ValueError(f"Invalid magic: {bytes(container[:8])!r}")
+
+    if container[8] != VERSION_V1:
+        gen = iter_parse_container(container)
+        chunks: list[bytes] = []
+        while True:
+            try:
+                chunks.append(next(gen))
+            except StopIteration as stop:
+                return b"".join(chunks), stop.value
+
+    with ContainerView(container) as view:
+        # 1. Verify HMAC over the body first (constant-time comparison)
+        if not view.verify_hmac():
+            raise ValueError("HMAC verification failed — container may be tampered")
+
+        # 2. Header fields, read in place
+        meta         = ContainerMetadata.from_json(view.header_json)
+        file_nonce   = view.file_nonce
+        enc_file_key = view.enc_file_key        # 32 encrypted key + 16 GCM tag
+        data_nonce   = view.payload_nonce
+
+        # 3. Recover file key using the user-scoped key from metadata
+        file_key = _unwrap_file_key(meta, file_nonce, enc_file_key)
+
+        # 4. Decrypt payload straight out of the container buffer
+        file_cipher = AESGCM(file_key)
+        aad         = meta.sha256_plaintext.encode("ascii")
+        try:
+            compressed = file_cipher.decrypt(data_nonce, view.payload(), aad)
+        except Exception:
+            raise ValueError("Payload decryption failed — wrong key or tampered data")
+
+    # 5. Decompress
     dctx = zstd.ZstdDecompressor()
     try:
         plaintext = dctx.decompress(compressed, max_output_size=100 * 1024 * 1024)
     except Exception as exc:
         raise ValueError(f"Decompression failed: {exc}") from exc
 
-    # 7. Verify SHA-256 of recovered plaintext
+    # 6. Verify SHA-256 of recovered plaintext
     actual_sha256 = hashlib.sha256(plaintext).hexdigest()
     if actual_sha256 != meta.sha256_plaintext:
         raise ValueError("Plaintext integrity check failed — sha256 mismatch")
@@ -356,47 +1214,214 @@ def parse_container(container: bytes) -> tuple[bytes, ContainerMetadata]:
     return plaintext, meta
 
 
-def verify_container_integrity(container: bytes) -> dict:
+def verify_container_integrity(container: Union[bytes, memoryview, BinaryIO, ContainerView]) -> dict:
     """Verify a stored container without decrypting the payload.
 
-    Returns a dict suitable for the integrity API endpoint.
+    Accepts raw bytes, a ContainerView or a binary stream.  Buffers, mapped
+    views and on-disk files are checked in place; any other stream (object
+    store bodies) is read once, front to back, in constant memory.  Either
+    way a single ContainerVerifier pass checks the HMAC and the frame
+    structure.  Returns a dict suitable for the integrity API endpoint.
     """
-    result = {
-        "hmac_valid":        False,
-        "magic_valid":       False,
-        "version":           None,
-        "metadata_readable": False,
-        "integrity_ok":      False,
-        "error":             None,
-    }
+    if not isinstance(container, (ContainerView, bytes, bytearray, memoryview, mmap.mmap, io.BytesIO)) \
+            and not _is_disk_file(container):
+        return verify_container_stream(container)
+
+    view = container if isinstance(container, ContainerView) else ContainerView(container)
     try:
-        if len(container) < 64:
-            result["error"] = "Container too short"
-            return result
+        verifier = ContainerVerifier()
+        for block in view.iter_blocks(0, view.size):
+            verifier.update(block)
+        block = None                      # drop the last slice so the map can close
+        return verifier.result()
+    finally:
+        if view is not container:
+            view.close()
 
-        body, stored_hmac = container[:-32], container[-32:]
-        expected = _hmac_sha256(MASTER_KEY, body)
-        result["hmac_valid"] = _hmac.compare_digest(stored_hmac, expected)
 
-        r = io.BytesIO(body)
-        magic = r.read(8)
-        result["magic_valid"] = (magic == MAGIC)
+# ── Batch API ─────────────────────────────────────────────────────────────────
+# AES-GCM (OpenSSL) and zstd release the GIL while they work, so a thread
+# pool spreads many containers across cores without pickling payloads into
+# worker processes or re-deriving keys there — the key cache is shared.
 
-        version = struct.unpack(">B", r.read(1))[0]
-        result["version"] = version
+@dataclass
+class BuildJob:
+    """One build_container() call for build_containers()."""
+    plaintext:    bytes
+    filename:     str
+    content_type: str
+    user_id:      str
+    key_version:  Optional[int] = None
 
-        meta_len   = struct.unpack(">I", r.read(4))[0]
-        meta_bytes = r.read(meta_len)
-        meta       = ContainerMetadata.from_json(meta_bytes)
-        result["metadata_readable"] = True
-        result["original_filename"] = meta.original_filename
-        result["original_size"]     = meta.original_size
-        result["compression"]       = meta.compression
-        result["encryption"]        = meta.encryption
-        result["created_at"]        = meta.created_at
 
-        result["integrity_ok"] = result["hmac_valid"] and result["magic_valid"] and result["metadata_readable"]
-    except Exception as exc:
-        result["error"] = str(exc)
+def _batch_workers(workers: Optional[int]) -> int:
+    return max(1, workers or get_settings().VAULT_BATCH_WORKERS or os.cpu_count() or 1)
+
+
+def _bounded_map(fn, items: Iterable, *, workers: Optional[int], max_pending: Optional[int],
+                 return_exceptions: bool) -> Iterator:
+    """Ordered map over a thread pool with at most max_pending items in flight.
+
+    items is consumed lazily, so a slow consumer holds back the producer
+    instead of queueing the whole input in memory.  With return_exceptions
+    a failing item yields its exception in place of a result; otherwise the
+    first failure (in input order) is raised and the remaining work is
+    cancelled.
+    """
+    workers = _batch_workers(workers)
+    pool    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ssce-batch")
+    try:
+        yield from _iter_ordered(pool, fn, items, max(1, max_pending or 2 * workers),
+                                 return_exceptions=return_exceptions)
+    finally:
+        pool.shutdown(wait=True)
+
+
+def build_containers(
+    jobs: Iterable[BuildJob],
+    *,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    return_exceptions: bool = False,
+) -> Iterator[tuple[bytes, ContainerMetadata]]:
+    """build_container() over many files in parallel; results in input order.
+
+    workers defaults to VAULT_BATCH_WORKERS (0 = one per CPU); at most
+    max_pending (default 2 × workers) jobs are in flight or buffered.
+    """
+    def _build(job: BuildJob) -> tuple[bytes, ContainerMetadata]:
+        return build_container(job.plaintext, filename=job.filename, content_type=job.content_type,
+                               user_id=job.user_id, key_version=job.key_version)
+
+    return _bounded_map(_build, jobs, workers=workers, max_pending=max_pending,
+                        return_exceptions=return_exceptions)
 
-    return result
+
+def parse_containers(
+    containers: Iterable[Union[bytes, BinaryIO]],
+    *,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    return_exceptions: bool = False,
+) -> Iterator[tuple[bytes, ContainerMetadata]]:
+    """parse_container() over many containers in parallel; results in input order.
+
+    Streams are decoded with iter_parse_container() on the worker thread.
+    """
+    def _parse(container) -> tuple[bytes, ContainerMetadata]:
+        if isinstance(container, (bytes, bytearray, memoryview)):
+            return parse_container(container)
+        gen = iter_parse_container(container)
+        chunks: list[bytes] = []
+        while True:
+            try:
+                chunks.append(next(gen))
+            except StopIteration as stop:
+                return b"".join(chunks), stop.value
+
+    return _bounded_map(_parse, containers, workers=workers, max_pending=max_pending,
+                        return_exceptions=return_exceptions)
+
+
+def verify_containers(
+    containers: Iterable[Union[bytes, BinaryIO, ContainerView]],
+    *,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[dict]:
+    """verify_container_integrity() over many containers in parallel; results in input order.
+
+    Never raises for a bad container — each result dict carries its error.
+    """
+    def _verify(container) -> dict:
+        try:
+            return verify_container_integrity(container)
+        except Exception as exc:
+            return {"hmac_valid": False, "magic_valid": False, "version": None,
+                    "metadata_readable": False, "integrity_ok": False, "error": str(exc)}
+
+    return _bounded_map(_verify, containers, workers=workers, max_pending=max_pending,
+                        return_exceptions=False)
+
+
+# ── Key rotation ──────────────────────────────────────────────────────────────
+
+def rewrap_container(
+    source: Union[bytes, bytearray, memoryview, BinaryIO],
+    sink: BinaryIO,
+    *,
+    key_version: Optional[int] = None,
+    block_size: int = 1024 * 1024,
+) -> tuple[int, ContainerMetadata, bytes]:
+    """Re-wrap a container's file key under another root key version.
+
+    The random file key is unwrapped with the old user key and wrapped
+    again (fresh FileNonce) with the user key of key_version (default:
+    current); the header's key_version is updated and the HMAC recomputed
+    with the new root.  Frames, v1 ciphertext and trailer are copied
+    verbatim — nothing is decrypted or recompressed — in one forward pass
+    holding one block in memory.
+
+    The old HMAC is checked on the way; it is only known at the end, so on
+    ValueError whatever was written to sink must be discarded.  Returns
+    (bytes_written, header metadata under the new version, new HMAC).
+    """
+    key_version = key_version or current_key_version()
+    stream = _as_stream(source)
+    r      = _MacReader(stream)
+
+    magic = r.read(8)
+    if magic != MAGIC:
+        raise ValueError(f"Invalid magic: {magic!r}")
+    version = struct.unpack(">B", r.read(1))[0]
+    if version not in (VERSION_V1, VERSION):
+        raise ValueError(f"Unsupported container version: {version}")
+    meta_len = struct.unpack(">I", r.read(4))[0]
+    if meta_len > MAX_TRAILER_LEN:
+        raise ValueError("Container metadata too large")
+    header_json = r.read(meta_len)
+    old_meta    = ContainerMetadata.from_json(header_json)
+    old_mac     = _container_mac(old_meta.key_version)
+    r.keyed(old_mac)
+    file_key    = _unwrap_file_key(old_meta, r.read(12), r.read(48))
+
+    # Rewrite key_version only; any other header field is carried over as-is
+    fields = json.loads(header_json)
+    fields["key_version"] = key_version
+    new_json   = json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    new_meta   = ContainerMetadata.from_json(new_json)
+    file_nonce = os.urandom(12)
+    header = b"".join((
+        MAGIC,
+        struct.pack(">B", version),
+        struct.pack(">I", len(new_json)),
+        new_json,
+        file_nonce,
+        user_wrap_cipher(old_meta.user_id, key_version).encrypt(file_nonce, file_key, None),
+    ))
+    new_mac = _container_mac(key_version)
+    new_mac.update(header)
+    sink.write(header)
+    written = len(header)
+
+    # Everything up to the stored HMAC is covered by both MACs; keep the last
+    # 32 bytes back until EOF shows which ones they are.
+    hold = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        joined = hold + block
+        body, hold = joined[:-32], joined[-32:]
+        old_mac.update(body)
+        new_mac.update(body)
+        sink.write(body)
+        written += len(body)
+    if len(hold) < 32:
+        raise ValueError("Truncated container")
+    if not _hmac.compare_digest(hold, old_mac.digest()):
+        raise ValueError("HMAC verification failed — container tampered or wrong key")
+
+    digest = new_mac.digest()
+    sink.write(digest)
+    return written + len(digest), new_meta, digest
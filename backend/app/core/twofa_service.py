@@ -16,22 +16,31 @@ from app.core.totp import (
     verify_recovery_code,
     verify_totp,
 )
-from app.core.ssce import derive_user_key
+from app.core.keycache import PURPOSE_TOTP, key_cache
+from app.core.ssce import configured_key_versions, current_key_version, derive_user_key
 from app.db.models import TwoFactorConfig, TwoFactorRecoveryCode, User
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 
 # ─── TOTP secret encryption ──────────────────────────────────────────────────
 # TOTP secrets are encrypted at rest using a key derived from the user's
 # scoped key (from ssce.derive_user_key).  A separate HKDF context is used
-# to keep the TOTP key distinct from the vault file-wrapping key.
+# to keep the TOTP key distinct from the vault file-wrapping key.  Both keys
+# (and the AESGCM built from the TOTP key) are held in the process key cache,
+# so a login-time verify does not re-run the HKDF chain.
 # Format stored in DB:  hex(nonce_12) + ":" + hex(aesgcm_ciphertext)
+#
+# The stored format carries no key version: new secrets use the current root,
+# and decryption tries each configured root (the GCM tag tells them apart),
+# so secrets stay readable through a key rotation until re-encrypted.
 
-def _totp_cipher_key(user_id: str) -> bytes:
+
+def _totp_cipher_key(user_id: str, key_version: int) -> bytes:
     """Derive a 32-byte AES key for TOTP secret encryption for this user."""
     from cryptography.hazmat.primitives.hashes import SHA256
     from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-    user_key = derive_user_key(str(user_id))
+    user_key = derive_user_key(str(user_id), key_version)
     return HKDF(
         algorithm=SHA256(),
         length=32,
@@ -40,23 +49,46 @@ def _totp_cipher_key(user_id: str) -> bytes:
     ).derive(user_key)
 
 
+def _totp_cipher(user_id: str, key_version: Optional[int] = None) -> AESGCM:
+    user_id     = str(user_id)
+    key_version = key_version or current_key_version()
+    return key_cache.get_cipher((user_id, key_version, PURPOSE_TOTP),
+                                lambda: _totp_cipher_key(user_id, key_version))
+
+
 def _encrypt_totp_secret(user_id: str, secret: str) -> str:
     """Encrypt a plaintext TOTP secret; return storable string."""
-    key    = _totp_cipher_key(str(user_id))
     nonce  = os.urandom(12)
-    ct     = AESGCM(key).encrypt(nonce, secret.encode("utf-8"), None)
+    ct     = _totp_cipher(user_id).encrypt(nonce, secret.encode("utf-8"), None)
     return nonce.hex() + ":" + ct.hex()
 
 
-def _decrypt_totp_secret(user_id: str, stored: str) -> str:
-    """Decrypt a stored TOTP secret string; return plaintext."""
+def _decrypt_totp_secret_versioned(user_id: str, stored: str) -> tuple[str, Optional[int]]:
+    """Decrypt a stored TOTP secret; return (plaintext, root key version or None if legacy)."""
     if ":" not in stored:
         # Legacy plaintext — return as-is during migration window.
-        return stored
+        return stored, None
     nonce_hex, ct_hex = stored.split(":", 1)
-    key  = _totp_cipher_key(str(user_id))
-    pt   = AESGCM(key).decrypt(bytes.fromhex(nonce_hex), bytes.fromhex(ct_hex), None)
-    return pt.decode("utf-8")
+    nonce, ct = bytes.fromhex(nonce_hex), bytes.fromhex(ct_hex)
+    for version in configured_key_versions():
+        try:
+            return _totp_cipher(user_id, version).decrypt(nonce, ct, None).decode("utf-8"), version
+        except InvalidTag:
+            continue
+    raise InvalidTag()
+
+
+def _decrypt_totp_secret(user_id: str, stored: str) -> str:
+    """Decrypt a stored TOTP secret string; return plaintext."""
+    return _decrypt_totp_secret_versioned(user_id, stored)[0]
+
+
+def rewrap_totp_secret(user_id: str, stored: str) -> Optional[str]:
+    """Re-encrypt a stored secret under the current root; None if it already is."""
+    secret, version = _decrypt_totp_secret_versioned(user_id, stored)
+    if version == current_key_version():
+        return None
+    return _encrypt_totp_secret(user_id, secret)
 
 
 # ─── Helpers ─────────────────────────────────────────────────────────────────
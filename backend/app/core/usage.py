@@ -0,0 +1,143 @@
+"""
+Per-user vault usage counters
+=============================
+vault_usage keeps, per user, the numbers the quota check and the storage
+views need — file count, plaintext bytes, physical container bytes — so
+none of them has to aggregate vault_files.
+
+  current()    single-row lookup, read-only: a user without a row yet gets
+               a transient one holding the aggregates, so read paths (the
+               dashboard, storage stats, quota pre-checks) never write
+  prepare()    creates the missing row from the aggregates; write paths
+               call it before they add or remove any vault rows, so the
+               aggregates cannot already hold the change being counted
+  charge()     conditional UPDATE … WHERE plaintext_bytes + n <= quota in
+               the caller's transaction.  The row lock it takes serialises
+               concurrent uploads of one user until commit, so two of them
+               can never both squeeze under the quota.  Raises QuotaExceeded
+  release()    the matching decrement on delete
+  reconcile()  locks the row, recomputes it from vault_files / vault_payloads
+               and reports the drift (reconcile_vault_usage.py runs it for
+               every user)
+
+container_bytes counts each deduplicated payload once plus the legacy rows
+that own their blob, the same definition /vault/storage/stats always used.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import VaultFile, VaultPayload, VaultUsage
+
+_FIELDS = ("file_count", "plaintext_bytes", "container_bytes")
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, used: int, requested: int, quota: int):
+        super().__init__(f"{used} + {requested} bytes exceeds quota {quota}")
+        self.used      = used
+        self.requested = requested
+        self.quota     = quota
+
+
+def aggregate(db: Session, user_id) -> dict:
+    """Usage computed from the file and payload tables (the slow path)."""
+    files = (
+        db.query(func.count(VaultFile.id), func.sum(VaultFile.size_bytes))
+        .filter(VaultFile.user_id == user_id)
+        .one()
+    )
+    legacy = (
+        db.query(func.sum(VaultFile.container_size))
+        .filter(VaultFile.user_id == user_id, VaultFile.payload_id.is_(None))
+        .scalar()
+    ) or 0
+    shared = (
+        db.query(func.sum(VaultPayload.container_size))
+        .filter(VaultPayload.user_id == user_id)
+        .scalar()
+    ) or 0
+    return {
+        "file_count":      files[0] or 0,
+        "plaintext_bytes": files[1] or 0,
+        "container_bytes": legacy + shared,
+    }
+
+
+def current(db: Session, user_id) -> VaultUsage:
+    """The user's counters.  Never writes: if the row is missing, an unsaved
+    one holding the aggregates is returned."""
+    row = db.get(VaultUsage, user_id)
+    if row is not None:
+        return row
+    return VaultUsage(user_id=user_id, reconciled_at=datetime.utcnow(), **aggregate(db, user_id))
+
+
+def _ensure_row(db: Session, user_id) -> VaultUsage:
+    """The user's counter row, created (from the aggregates) if missing."""
+    row = db.get(VaultUsage, user_id)
+    if row is not None:
+        return row
+    row = VaultUsage(user_id=user_id, reconciled_at=datetime.utcnow(), **aggregate(db, user_id))
+    try:
+        with db.begin_nested():
+            db.add(row)
+    except IntegrityError:
+        # Created concurrently — theirs counts the same files
+        row = db.get(VaultUsage, user_id, populate_existing=True)
+    return row
+
+
+def prepare(db: Session, user_id) -> None:
+    """Make sure the user's counter row exists.  Call before changing vault rows."""
+    _ensure_row(db, user_id)
+
+
+def charge(db: Session, user_id, *, plaintext: int, container: int = 0, files: int = 1,
+           quota: Optional[int] = None) -> None:
+    """Add an upload to the counters, refusing it if it would pass quota."""
+    _ensure_row(db, user_id)
+    query = db.query(VaultUsage).filter(VaultUsage.user_id == user_id)
+    if quota is not None:
+        query = query.filter(VaultUsage.plaintext_bytes + plaintext <= quota)
+    updated = query.update({
+        VaultUsage.file_count:      VaultUsage.file_count + files,
+        VaultUsage.plaintext_bytes: VaultUsage.plaintext_bytes + plaintext,
+        VaultUsage.container_bytes: VaultUsage.container_bytes + container,
+        VaultUsage.updated_at:      datetime.utcnow(),
+    }, synchronize_session=False)
+    if not updated:
+        used = db.query(VaultUsage.plaintext_bytes).filter(VaultUsage.user_id == user_id).scalar() or 0
+        raise QuotaExceeded(used, plaintext, quota)
+
+
+def release(db: Session, user_id, *, plaintext: int, container: int = 0, files: int = 1) -> None:
+    """Remove a deleted file from the counters."""
+    charge(db, user_id, plaintext=-plaintext, container=-container, files=-files)
+
+
+def reconcile(db: Session, user_id) -> dict:
+    """Overwrite the counters with the aggregates; returns {field: drift}.  Caller commits.
+
+    The row is locked first, so uploads and deletes of this user wait and
+    the aggregates see every change that reached the counters.
+    """
+    _ensure_row(db, user_id)
+    row = (
+        db.query(VaultUsage)
+        .filter(VaultUsage.user_id == user_id)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    actual = aggregate(db, user_id)
+    drift  = {f: actual[f] - (getattr(row, f) or 0) for f in _FIELDS}
+    for f in _FIELDS:
+        setattr(row, f, actual[f])
+    row.reconciled_at = datetime.utcnow()
+    return drift
@@ -0,0 +1,364 @@
+"""
+Trained zstd dictionaries
+=========================
+Storage, training and lookup for the dictionaries app.core.compression uses
+on small (≤ 64 KB) vault files.
+
+Dictionaries are per user: one trained on user A's files and used for
+user B's would let B probe A's content through the compressed sizes of
+B's own uploads (a CRIME-style oracle).  A user's files are only ever
+compressed with a dictionary built from that user's own uploads, the same
+scoping dedup uses.
+
+  sampling   the upload route offers the plaintext of new small uploads
+             (after the malware scan, before encryption) to that user's
+             in-memory reservoir; samples are never written anywhere
+  training   once a user has VAULT_ZSTD_DICT_MIN_SAMPLES samples and their
+             newest dictionary is older than VAULT_ZSTD_DICT_RETRAIN_HOURS,
+             a background thread trains a new one and keeps it only if it
+             beats no-dictionary compression on held-out samples
+  storage    vault_zstd_dictionaries, AES-GCM encrypted under a system key
+             derived from the SSCE root key (the dictionary is made of user
+             plaintext fragments, so it is as sensitive as the files); any
+             configured root version can open it, rotate_vault_keys.py
+             re-seals it under the current one
+  lookup     containers record dict_id; any node can decode any version
+             through the DB loader, and decoded dictionaries are cached
+             in-process.  Rows from before per-user scoping (user_id NULL)
+             still decode old containers but are never used for new ones
+
+Sampling and training only happen with VAULT_ZSTD_DICT_ENABLED; loading
+old dictionaries for reads always works.  Importing this module wires the
+loader into SSCE.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+import zstandard as zstd
+from cryptography.exceptions import InvalidTag
+
+from app.core import compression
+from app.core.config import get_settings
+from app.core.keycache import PURPOSE_ZSTD_DICT
+from app.core.ssce import configured_key_versions, current_key_version, system_cipher
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+POOL_MAX_SAMPLES  = 1024           # reservoir size per user
+POOL_MAX_BYTES    = 64 * 1024 * 1024   # all users' samples together; least recently offered go first
+ACTIVE_MAX_USERS  = 1024           # users whose active dictionary is remembered
+MIN_SAMPLE_BYTES  = 64             # tiny files teach the trainer nothing
+MIN_GAIN          = 0.95           # keep a dictionary only if held-out output shrinks ≥ 5 %
+ACTIVE_REFRESH_S  = 300            # how often a node looks for a newer dictionary
+
+
+def _aad(dict_id: int) -> bytes:
+    return f"zstd-dict:{dict_id}".encode("ascii")
+
+
+def _seal(dict_id: int, data: bytes) -> tuple[bytes, bytes]:
+    nonce = os.urandom(12)
+    return nonce, system_cipher(PURPOSE_ZSTD_DICT).encrypt(nonce, data, _aad(dict_id))
+
+
+def _open_versioned(dict_id: int, nonce: bytes, sealed: bytes) -> tuple[bytes, int]:
+    # Rows carry no key version; during a rotation window try each root.
+    for version in configured_key_versions():
+        try:
+            return system_cipher(PURPOSE_ZSTD_DICT, version).decrypt(nonce, sealed, _aad(dict_id)), version
+        except InvalidTag:
+            continue
+    raise InvalidTag()
+
+
+def _open(dict_id: int, nonce: bytes, sealed: bytes) -> bytes:
+    return _open_versioned(dict_id, nonce, sealed)[0]
+
+
+def reseal(dict_id: int, nonce: bytes, sealed: bytes) -> Optional[tuple[bytes, bytes]]:
+    """Re-encrypt a stored dictionary under the current root; None if it already is."""
+    data, version = _open_versioned(dict_id, nonce, sealed)
+    if version == current_key_version():
+        return None
+    return _seal(dict_id, data)
+
+
+# ── Sample reservoirs ─────────────────────────────────────────────────────────
+
+class _SamplePool:
+    """Uniform reservoir over one user's small uploads since their last training run."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.samples: list[bytes] = []
+        self.seen     = 0
+        self.nbytes   = 0
+
+    def add(self, sample: bytes) -> None:
+        self.seen += 1
+        if len(self.samples) < self.capacity:
+            self.samples.append(sample)
+            self.nbytes += len(sample)
+            return
+        j = random.randrange(self.seen)
+        if j < self.capacity:
+            self.nbytes += len(sample) - len(self.samples[j])
+            self.samples[j] = sample
+
+
+class _Reservoirs:
+    """Per-user sample pools under one memory budget, evicted least recently offered first."""
+
+    def __init__(self, capacity: int, max_bytes: int):
+        self.capacity  = capacity
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        self._pools: "OrderedDict[str, _SamplePool]" = OrderedDict()
+        self._nbytes   = 0
+
+    def add(self, user_id: str, sample: bytes) -> int:
+        """Offer a sample; returns how many that user has offered since their last take()."""
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is None:
+                pool = self._pools[user_id] = _SamplePool(self.capacity)
+            self._pools.move_to_end(user_id)
+            before = pool.nbytes
+            pool.add(sample)
+            self._nbytes += pool.nbytes - before
+            while self._nbytes > self.max_bytes and len(self._pools) > 1:
+                _, old = self._pools.popitem(last=False)
+                self._nbytes -= old.nbytes
+            return pool.seen
+
+    def take(self, user_id: str) -> list[bytes]:
+        with self._lock:
+            pool = self._pools.pop(user_id, None)
+            if pool is None:
+                return []
+            self._nbytes -= pool.nbytes
+            return pool.samples
+
+
+class _Active:
+    """A user's newest dictionary, as last looked up."""
+
+    __slots__ = ("zdict", "checked_at", "last_trained")
+
+    def __init__(self):
+        self.zdict: Optional[zstd.ZstdCompressionDict] = None
+        self.checked_at   = float("-inf")       # monotonic time of the last DB lookup
+        self.last_trained: Optional[datetime] = None
+
+
+_pools        = _Reservoirs(POOL_MAX_SAMPLES, POOL_MAX_BYTES)
+_training: set[str] = set()        # users with a training run in flight
+_state_lock   = threading.Lock()
+_active: "OrderedDict[str, _Active]" = OrderedDict()
+
+
+def _active_state(user_id: str) -> _Active:
+    """Caller holds _state_lock."""
+    state = _active.get(user_id)
+    if state is None:
+        state = _active[user_id] = _Active()
+        while len(_active) > ACTIVE_MAX_USERS:
+            _active.popitem(last=False)
+    _active.move_to_end(user_id)
+    return state
+
+
+# ── DB access ─────────────────────────────────────────────────────────────────
+
+def _session():
+    from app.db.session import SessionLocal
+    return SessionLocal() if SessionLocal is not None else None
+
+
+def load_dictionary(dict_id: int) -> Optional[bytes]:
+    """Decrypted dictionary bytes for dict_id, or None if unknown."""
+    from app.db.models import VaultZstdDictionary
+
+    db = _session()
+    if db is None:
+        return None
+    try:
+        row = db.get(VaultZstdDictionary, dict_id)
+        return _open(dict_id, row.nonce, row.encrypted_dict) if row else None
+    finally:
+        db.close()
+
+
+def _fetch_active(user_id: str, known_id: Optional[int]) -> Optional[tuple]:
+    """The user's newest stored dictionary as (dict_id, decoded dictionary, created_at),
+    or None.  The dictionary is only opened if it is not known_id (else None)."""
+    from app.db.models import VaultZstdDictionary
+
+    db = _session()
+    if db is None:
+        return None
+    try:
+        row = (
+            db.query(VaultZstdDictionary)
+            .filter(VaultZstdDictionary.user_id == UUID(user_id))
+            .order_by(VaultZstdDictionary.created_at.desc())
+            .first()
+        )
+        if row is None:
+            return None
+        zdict = None
+        if row.dict_id != known_id:
+            zdict = compression.cache_dictionary(_open(row.dict_id, row.nonce, row.encrypted_dict))
+        return row.dict_id, zdict, row.created_at
+    finally:
+        db.close()
+
+
+def active_dictionary(user_id) -> Optional[zstd.ZstdCompressionDict]:
+    """The user's newest dictionary, re-checked against the DB every ACTIVE_REFRESH_S.
+
+    The DB query runs outside _state_lock; meanwhile other callers (this
+    user's included) keep getting the dictionary cached so far.
+    """
+    if not _settings.VAULT_ZSTD_DICT_ENABLED or not user_id:
+        return None
+    user_id = str(user_id)
+    with _state_lock:
+        state = _active_state(user_id)
+        if time.monotonic() - state.checked_at < ACTIVE_REFRESH_S:
+            return state.zdict
+        state.checked_at = time.monotonic()          # one refresh per interval
+        known = state.zdict.dict_id() if state.zdict is not None else None
+    try:
+        newest = _fetch_active(user_id, known)
+    except Exception as exc:
+        logger.warning("zstd dictionary refresh failed: %s", exc)
+        newest = None
+    with _state_lock:
+        if newest is not None:
+            _, zdict, created_at = newest
+            # A dictionary trained here meanwhile is newer than anything the query saw
+            if state.last_trained is None or created_at >= state.last_trained:
+                if zdict is not None:
+                    state.zdict = zdict
+                state.last_trained = created_at
+        return state.zdict
+
+
+# ── Training ──────────────────────────────────────────────────────────────────
+
+def _free_dict_id(db) -> int:
+    """A dict_id no stored dictionary uses (zstd reserves < 32768 and ≥ 2**31)."""
+    from app.db.models import VaultZstdDictionary
+
+    while True:
+        dict_id = random.randrange(32768, 2**31)
+        if db.get(VaultZstdDictionary, dict_id) is None:
+            return dict_id
+
+
+def train(user_id, samples: list[bytes], dict_size: Optional[int] = None) -> Optional[int]:
+    """Train, evaluate and store a dictionary for one user.  Returns its dict_id, or None if not kept."""
+    from app.db.models import VaultZstdDictionary
+
+    if len(samples) < 8:
+        return None
+    db = _session()
+    if db is None:                 # nowhere to keep it — don't spend the CPU
+        return None
+    try:
+        random.shuffle(samples)
+        held_out = samples[: max(1, len(samples) // 5)]
+        training = samples[len(held_out):]
+
+        zdict = zstd.train_dictionary(dict_size or _settings.VAULT_ZSTD_DICT_SIZE, training,
+                                      dict_id=_free_dict_id(db))
+        plain_c = compression.compressor(compression.DEFAULT.level)
+        dict_c  = compression.compressor(compression.DEFAULT.level, zdict)
+        without = sum(len(plain_c.compress(s)) for s in held_out)
+        with_d  = sum(len(dict_c.compress(s)) for s in held_out)
+        gain    = with_d / max(without, 1)
+        if gain > MIN_GAIN:
+            logger.info("zstd dictionary discarded: held-out ratio %.3f vs. no dictionary", gain)
+            return None
+
+        raw     = zdict.as_bytes()
+        dict_id = zdict.dict_id()
+        nonce, sealed = _seal(dict_id, raw)
+        db.add(VaultZstdDictionary(
+            dict_id        = dict_id,
+            user_id        = UUID(str(user_id)),
+            nonce          = nonce,
+            encrypted_dict = sealed,
+            dict_size      = len(raw),
+            sample_count   = len(training),
+            sample_bytes   = sum(len(s) for s in training),
+            ratio_gain     = f"{gain:.3f}",
+            created_at     = datetime.utcnow(),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    with _state_lock:
+        state = _active_state(str(user_id))
+        state.zdict        = compression.cache_dictionary(raw)
+        state.last_trained = datetime.utcnow()
+        state.checked_at   = time.monotonic()
+    logger.info("zstd dictionary %d trained on %d samples (held-out ratio %.3f)",
+                dict_id, len(training), gain)
+    return dict_id
+
+
+def _train_in_background(user_id: str) -> None:
+    try:
+        train(user_id, _pools.take(user_id))
+    except Exception as exc:
+        logger.warning("zstd dictionary training failed: %s", exc)
+    finally:
+        with _state_lock:
+            _training.discard(user_id)
+
+
+def _due(user_id: str) -> bool:
+    with _state_lock:
+        last = _active_state(user_id).last_trained
+    if last is None:
+        return True
+    age_h = (datetime.utcnow() - last).total_seconds() / 3600
+    return age_h >= _settings.VAULT_ZSTD_DICT_RETRAIN_HOURS
+
+
+def offer_sample(user_id, plaintext: bytes) -> None:
+    """Consider a small upload's plaintext for the uploader's next training run."""
+    if not _settings.VAULT_ZSTD_DICT_ENABLED:
+        return
+    if not MIN_SAMPLE_BYTES <= len(plaintext) <= compression.DICT_MAX_FILE_BYTES:
+        return
+    user_id = str(user_id)
+    seen = _pools.add(user_id, plaintext)
+    if seen < _settings.VAULT_ZSTD_DICT_MIN_SAMPLES:
+        return
+    active_dictionary(user_id)             # picks up last_trained from the DB
+    if not _due(user_id):
+        return
+    with _state_lock:
+        if user_id in _training:
+            return
+        _training.add(user_id)
+    threading.Thread(target=_train_in_background, args=(user_id,),
+                     name="zstd-dict-train", daemon=True).start()
+
+
+compression.configure_dictionaries(loader=load_dictionary, active=active_dictionary)
@@ -8,13 +8,15 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from pydantic import BaseModel
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core import usage
 from app.core.config import get_settings
 from app.core.security import verify_token
-from app.db.models import ConnectedAccount, LoginLog, Session as UserSession, User, VaultFile
-from app.db.session import get_db
+from app.db.models import ConnectedAccount, LoginLog, Session as UserSession, User
+from app.db.session import get_async_db, get_db
 
 settings  = get_settings()
 router    = APIRouter(prefix="/api", tags=["dashboard"])
@@ -29,11 +31,12 @@ FRONT_URL = os.getenv("FRONTEND_URL", "https://syncveil.software")
 # ─── Auth dependency ──────────────────────────────────────────────────────────
 
 class AuthUser:
-    def __init__(self, user: User, session: UserSession, db: Session):
+    def __init__(self, user: User, session: UserSession, db: Session | AsyncSession):
         self.user = user; self.session = session; self.db = db
 
 
-def get_current_user(authorization: str = Header(default=None), db: Session = Depends(get_db)) -> AuthUser:
+def _bearer_ids(authorization: Optional[str]) -> tuple[UUID, UUID]:
+    """(user id, session id) from an access token; 401 if it is missing or invalid."""
     if not authorization:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
     scheme, _, token = authorization.partition(" ")
@@ -44,7 +47,15 @@ def get_current_user(authorization: str = Header(default=None), db: Session = De
         uid, sid = payload.get("sub"), payload.get("session_id")
         if not uid or not sid:
             raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-        uu, su = UUID(str(uid)), UUID(str(sid))
+        return UUID(str(uid)), UUID(str(sid))
+    except HTTPException: raise
+    except Exception as e:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from e
+
+
+def get_current_user(authorization: str = Header(default=None), db: Session = Depends(get_db)) -> AuthUser:
+    uu, su = _bearer_ids(authorization)
+    try:
         sess = db.query(UserSession).filter(
             UserSession.id == su, UserSession.user_id == uu,
             UserSession.revoked.is_(False), UserSession.expires_at > datetime.utcnow(),
@@ -60,29 +71,61 @@ def get_current_user(authorization: str = Header(default=None), db: Session = De
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from e
 
 
+async def get_current_user_async(authorization: str = Header(default=None),
+                                 db: AsyncSession = Depends(get_async_db)) -> AuthUser:
+    """get_current_user for async routes: one joined lookup, auth.db is an AsyncSession."""
+    uu, su = _bearer_ids(authorization)
+    try:
+        row = (await db.execute(
+            select(UserSession, User)
+            .outerjoin(User, User.id == UserSession.user_id)
+            .where(
+                UserSession.id == su, UserSession.user_id == uu,
+                UserSession.revoked.is_(False), UserSession.expires_at > datetime.utcnow(),
+            )
+        )).first()
+        if not row:
+            raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+        sess, user = row
+        if not user or user.disabled:
+            raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="User unavailable")
+        return AuthUser(user=user, session=sess, db=db)
+    except HTTPException: raise
+    except Exception as e:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from e
+
+
 # ─── Dashboard Overview ───────────────────────────────────────────────────────
 
 @router.get("/dashboard")
-def get_dashboard(auth: AuthUser = Depends(get_current_user)):
+async def get_dashboard(auth: AuthUser = Depends(get_current_user_async)):
     db, user, now = auth.db, auth.user, datetime.utcnow()
     seven_ago = now - timedelta(days=7)
 
-    vault_count = db.query(VaultFile).filter(VaultFile.user_id == user.id).count()
-    vault_size  = db.query(VaultFile).filter(VaultFile.user_id == user.id).with_entities(VaultFile.size_bytes).all()
-    total_size  = sum(r.size_bytes or 0 for r in vault_size)
+    vault_usage = await db.run_sync(usage.current, user.id)
+    vault_count = vault_usage.file_count
+    total_size  = vault_usage.plaintext_bytes
 
-    active_sessions_q = db.query(UserSession).filter(
-        UserSession.user_id == user.id, UserSession.revoked.is_(False), UserSession.expires_at > now,
-    ).order_by(desc(UserSession.last_used_at)).all()
+    active_sessions_q = (await db.execute(
+        select(UserSession).where(
+            UserSession.user_id == user.id, UserSession.revoked.is_(False), UserSession.expires_at > now,
+        ).order_by(desc(UserSession.last_used_at))
+    )).scalars().all()
     active_sessions = len(active_sessions_q)
 
-    threats_7d = db.query(LoginLog).filter(
-        LoginLog.user_id == user.id, LoginLog.success.is_(False), LoginLog.timestamp >= seven_ago,
-    ).count()
+    threats_7d = await db.scalar(
+        select(func.count(LoginLog.id)).where(
+            LoginLog.user_id == user.id, LoginLog.success.is_(False), LoginLog.timestamp >= seven_ago,
+        )
+    )
 
-    recent = db.query(LoginLog).filter(LoginLog.user_id == user.id).order_by(desc(LoginLog.timestamp)).limit(10).all()
+    recent = (await db.execute(
+        select(LoginLog).where(LoginLog.user_id == user.id).order_by(desc(LoginLog.timestamp)).limit(10)
+    )).scalars().all()
 
-    connected = db.query(ConnectedAccount).filter(ConnectedAccount.user_id == user.id).all()
+    connected = (await db.execute(
+        select(ConnectedAccount).where(ConnectedAccount.user_id == user.id)
+    )).scalars().all()
 
     from app.core.device_parser import parse_device
     def _ser_session(s: UserSession, current_sid) -> dict:
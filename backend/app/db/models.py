@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from sqlalchemy import Boolean, Column, Date, DateTime, Integer, LargeBinary, String, Text, ForeignKey, Index, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from app.db.base import Base
 
 
@@ -33,6 +33,9 @@ class User(Base):
     connected_accounts = relationship("ConnectedAccount",       back_populates="user", cascade="all, delete-orphan")
     password_resets    = relationship("PasswordResetToken",     back_populates="user", cascade="all, delete-orphan")
     vault_files        = relationship("VaultFile",              back_populates="user", cascade="all, delete-orphan")
+    vault_payloads     = relationship("VaultPayload",           back_populates="user", cascade="all, delete-orphan")
+    vault_uploads      = relationship("VaultUploadSession",     back_populates="user", cascade="all, delete-orphan")
+    vault_usage        = relationship("VaultUsage",             uselist=False, cascade="all, delete-orphan")
     vault_audit_logs   = relationship("VaultAuditLog", foreign_keys="VaultAuditLog.user_id", cascade="all, delete-orphan")
     two_factor_config  = relationship("TwoFactorConfig",        back_populates="user", uselist=False, cascade="all, delete-orphan")
     passkey            = relationship("Passkey",                back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -65,6 +68,12 @@ class VaultFile(Base):
     encryption_version   = Column(Integer,      nullable=False, default=1)
     key_version          = Column(Integer,      nullable=False, default=1)  # tracks VAULT_ENCRYPTION_KEY rotation
     storage_backend      = Column(String(50),   nullable=False, default="postgresql")
+    storage_locator      = Column(String(512),  nullable=True)   # blob-store key; NULL when inline
+
+    # Deduplicated container shared with other rows of this user.  When set,
+    # the blob lives on the payload and this row's encrypted_data /
+    # storage_locator stay NULL; legacy rows own their blob directly.
+    payload_id           = Column(UUID(as_uuid=True), ForeignKey("vault_payloads.id"), nullable=True, index=True)
 
     # File versioning
     version              = Column(Integer,      nullable=False, default=1)
@@ -73,13 +82,24 @@ class VaultFile(Base):
     malware_scan_status  = Column(String(20),   nullable=False, default="skipped")
     malware_scan_at      = Column(DateTime,     nullable=True)
 
-    # Container blob (.syncveil binary — nonce embedded inside container)
-    encrypted_data       = Column(LargeBinary,  nullable=False)
+    # Container blob (.syncveil binary — nonce embedded inside container).
+    # Only populated for storage_backend="postgresql"; other backends keep
+    # the bytes in app.core.blobstore and this stays NULL.
+    # Deferred: ordinary row loads stay metadata-only; code that needs the
+    # bytes asks for them with .options(undefer(VaultFile.encrypted_data)).
+    encrypted_data       = deferred(Column(LargeBinary,  nullable=True))
+
+    # Background scrub (app.core.scrubber) — only for rows that own their
+    # container; deduplicated rows are scrubbed through their payload
+    last_verified_at     = Column(DateTime,     nullable=True)
+    last_verify_ok       = Column(Boolean,      nullable=True)   # NULL: never checked / check in progress
+    last_verify_error    = Column(String(500),  nullable=True)
 
     uploaded_at          = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at           = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     user         = relationship("User",          back_populates="vault_files")
+    payload      = relationship("VaultPayload",  back_populates="files")
     audit_logs   = relationship("VaultAuditLog", back_populates="vault_file", cascade="all, delete-orphan")
 
     __table_args__ = (
@@ -88,6 +108,142 @@ class VaultFile(Base):
     )
 
 
+class VaultPayload(Base):
+    """Reference-counted .syncveil container, deduplicated per user by plaintext SHA-256.
+
+    Every VaultFile of a user with identical content points here; the row
+    metadata (name, content type, upload time) stays per file.  ref_count
+    tracks those rows and the blob is freed when it reaches zero.
+    """
+    __tablename__ = "vault_payloads"
+    id                   = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id              = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    sha256               = Column(String(64),   nullable=False)
+    ref_count            = Column(Integer,      nullable=False, default=1)
+
+    # Container description — copied onto each referencing VaultFile
+    container_size       = Column(BigInteger,   nullable=False)
+    hmac                 = Column(String(64),   nullable=False)
+    encrypted_file_key   = Column(LargeBinary,  nullable=False)
+    compression_type     = Column(String(20),   nullable=False, default="zstd")
+    encryption_version   = Column(Integer,      nullable=False, default=2)
+    key_version          = Column(Integer,      nullable=False, default=1)
+
+    # Blob location — same scheme as VaultFile (inline or blob store)
+    storage_backend      = Column(String(50),   nullable=False, default="postgresql")
+    storage_locator      = Column(String(512),  nullable=True)
+    encrypted_data       = deferred(Column(LargeBinary, nullable=True))
+
+    # Background scrub (app.core.scrubber)
+    last_verified_at     = Column(DateTime,     nullable=True)
+    last_verify_ok       = Column(Boolean,      nullable=True)
+    last_verify_error    = Column(String(500),  nullable=True)
+
+    created_at           = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    user  = relationship("User",      back_populates="vault_payloads")
+    files = relationship("VaultFile", back_populates="payload")
+
+    __table_args__ = (
+        Index("uq_vault_payload_user_sha256", "user_id", "sha256", unique=True),
+    )
+
+
+class VaultUsage(Base):
+    """Per-user vault totals, maintained on upload and delete (app.core.usage).
+
+    Lets the quota check and storage views read one row instead of
+    aggregating vault_files; reconcile_vault_usage.py repairs any drift.
+    """
+    __tablename__ = "vault_usage"
+    user_id         = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    file_count      = Column(BigInteger, nullable=False, default=0)
+    plaintext_bytes = Column(BigInteger, nullable=False, default=0)
+    container_bytes = Column(BigInteger, nullable=False, default=0)   # payloads once + legacy blobs
+    updated_at      = Column(DateTime, default=datetime.utcnow, nullable=False)
+    reconciled_at   = Column(DateTime, nullable=True)
+
+
+class VaultUploadSession(Base):
+    """Resumable upload in progress.
+
+    The plaintext arrives in fixed-size chunks, each sealed with AES-GCM
+    under a system key of key_version and staged like a container blob
+    (inline or in the blob store).  Finalizing builds the real container
+    from the staged chunks and deletes the session; abandoned sessions are
+    purged after expires_at.
+    """
+    __tablename__ = "vault_upload_sessions"
+    id           = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id      = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    file_name    = Column(String(500),  nullable=False)
+    content_type = Column(String(200),  nullable=False, default="application/octet-stream")
+    size_bytes   = Column(BigInteger,   nullable=False)       # declared at creation
+    chunk_size   = Column(Integer,      nullable=False)
+    key_version  = Column(Integer,      nullable=False)
+    created_at   = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at   = Column(DateTime, nullable=False, index=True)
+    finalizing_at = Column(DateTime, nullable=True)           # claimed by a running complete
+
+    user   = relationship("User", back_populates="vault_uploads")
+    chunks = relationship("VaultUploadChunk", back_populates="upload", cascade="all, delete-orphan",
+                          order_by="VaultUploadChunk.chunk_index")
+
+
+class VaultUploadChunk(Base):
+    """One staged chunk of a VaultUploadSession: nonce ‖ AES-GCM(plaintext chunk)."""
+    __tablename__ = "vault_upload_chunks"
+    upload_id       = Column(UUID(as_uuid=True), ForeignKey("vault_upload_sessions.id", ondelete="CASCADE"),
+                             primary_key=True)
+    chunk_index     = Column(Integer,      primary_key=True)
+    size_bytes      = Column(Integer,      nullable=False)     # plaintext
+    sha256          = Column(String(64),   nullable=False)     # plaintext, reported back to the client
+    storage_backend = Column(String(50),   nullable=False, default="postgresql")
+    storage_locator = Column(String(512),  nullable=True)
+    encrypted_data  = deferred(Column(LargeBinary, nullable=True))
+    created_at      = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    upload = relationship("VaultUploadSession", back_populates="chunks")
+
+
+class VaultScanVerdict(Base):
+    """ClamAV verdict for one plaintext under one signature database (app.core.malware).
+
+    Shared by all nodes so identical content uploaded again — by anyone —
+    skips the scan.  Keyed by the signature version, so a database update
+    makes every older verdict a miss; those rows are purged.
+    """
+    __tablename__ = "vault_scan_verdicts"
+    sha256            = Column(String(64), primary_key=True)    # plaintext digest
+    signature_version = Column(String(64), primary_key=True)    # e.g. "ClamAV 1.4.1/27431"
+    clean             = Column(Boolean,    nullable=False)
+    threat            = Column(String(255), nullable=True)
+    scanned_at        = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class VaultZstdDictionary(Base):
+    """Trained zstd dictionary for one user's small vault payloads, encrypted at rest.
+
+    Rows are never deleted: every container compressed with a dictionary
+    records its dict_id, so each version must stay loadable.  A user's
+    newest row is the one used for their new uploads; rows without a user
+    (trained across users, before per-user scoping) only decode old
+    containers.
+    """
+    __tablename__ = "vault_zstd_dictionaries"
+    dict_id        = Column(BigInteger, primary_key=True, autoincrement=False)   # zstd's own 32-bit id
+    user_id        = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    nonce          = Column(LargeBinary, nullable=False)
+    encrypted_dict = Column(LargeBinary, nullable=False)
+    dict_size      = Column(Integer,     nullable=False)
+    sample_count   = Column(Integer,     nullable=False)
+    sample_bytes   = Column(BigInteger,  nullable=False)
+    ratio_gain     = Column(String(20),  nullable=True)    # held-out compressed size vs. no dictionary
+    created_at     = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (Index("idx_zstd_dict_user_created", "user_id", "created_at"),)
+
+
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
     id         = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
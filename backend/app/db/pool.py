@@ -0,0 +1,166 @@
+"""
+Connection pool instrumentation
+===============================
+Both engines (sync and async) use an instrumented QueuePool so pool
+exhaustion shows up at GET /health/db instead of only as timeouts:
+
+  - checked-out / idle / overflow connections right now
+  - checkout wait histogram — time spent in pool.connect(), which includes
+    waiting for a free connection, opening a new one and any liveness ping
+  - overflow events (a connection opened beyond DB_POOL_SIZE) and checkout
+    timeouts (DB_POOL_TIMEOUT_SECONDS reached)
+
+Liveness: instead of pre-pinging on every checkout, instrument() can ping
+only connections that sat idle in the pool longer than an interval.  A dead
+one raises DisconnectionError, which makes the pool discard it and check
+out another (the pattern SQLAlchemy documents for custom pessimistic
+disconnect handling).
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds of the checkout wait histogram buckets (ms); the last one is open
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Thread-safe counters for one engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._checkouts = 0
+        self._opened = 0
+        self._overflow_opened = 0
+        self._timeouts = 0
+        self._pings = 0
+        self._ping_failures = 0
+
+    def waited(self, seconds: float) -> None:
+        ms = seconds * 1000
+        i = 0
+        while i < len(WAIT_BUCKETS_MS) and ms > WAIT_BUCKETS_MS[i]:
+            i += 1
+        with self._lock:
+            self._buckets[i] += 1
+            self._waits += 1
+            self._wait_total += ms
+            self._wait_max = max(self._wait_max, ms)
+
+    def checked_out(self) -> None:
+        with self._lock:
+            self._checkouts += 1
+
+    def opened(self, overflow: bool) -> None:
+        with self._lock:
+            self._opened += 1
+            if overflow:
+                self._overflow_opened += 1
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self._timeouts += 1
+
+    def pinged(self, ok: bool) -> None:
+        with self._lock:
+            self._pings += 1
+            if not ok:
+                self._ping_failures += 1
+
+    def stats(self, pool=None) -> dict:
+        with self._lock:
+            out = {
+                "checkouts":       self._checkouts,
+                "opened":          self._opened,
+                "overflow_opened": self._overflow_opened,
+                "timeouts":        self._timeouts,
+                "wait_ms": {
+                    "count":   self._waits,
+                    "avg":     round(self._wait_total / self._waits, 3) if self._waits else 0.0,
+                    "max":     round(self._wait_max, 3),
+                    "buckets": {
+                        **{f"le_{b}": n for b, n in zip(WAIT_BUCKETS_MS, self._buckets)},
+                        "inf": self._buckets[-1],
+                    },
+                },
+                "liveness": {"pings": self._pings, "failures": self._ping_failures},
+            }
+        if isinstance(pool, QueuePool):
+            out.update({
+                "pool_size":   pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle":        pool.checkedin(),
+                "overflow":    max(0, pool.overflow()),
+            })
+        return out
+
+
+class _Timed:
+    """Pool mixin: times every checkout into self.metrics."""
+
+    metrics: PoolMetrics | None = None
+
+    def connect(self):
+        if self.metrics is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timed_out()
+            raise
+        finally:
+            self.metrics.waited(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_Timed, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_Timed, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine, metrics: PoolMetrics, *, liveness_interval: int = 0) -> None:
+    """Attach metrics (and the idle-connection liveness check) to a sync Engine.
+
+    For an AsyncEngine pass its .sync_engine.
+    """
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, record):
+        # QueuePool counts the new connection before opening it
+        pool = engine.pool
+        metrics.opened(isinstance(pool, QueuePool) and pool.overflow() > 0)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, record):
+        record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, record, proxy):
+        idle_since = record.info.pop("idle_since", None)
+        if liveness_interval and idle_since is not None \
+                and time.monotonic() - idle_since > liveness_interval:
+            try:
+                engine.dialect.do_ping(dbapi_connection)
+            except Exception as e:
+                metrics.pinged(False)
+                raise exc.DisconnectionError("liveness check failed") from e
+            metrics.pinged(True)
+        metrics.checked_out()
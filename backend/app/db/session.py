@@ -3,27 +3,101 @@ SQL session management.
 
 SQL is REQUIRED for authentication.
 If DATABASE_URL is missing, auth endpoints will return a clear error.
+
+Two engines are built from the same DATABASE_URL:
+  engine / SessionLocal / get_db                   sync (psycopg2) — most routers,
+                                                   background workers, Alembic and
+                                                   the maintenance scripts
+  async_engine / AsyncSessionLocal / get_async_db  asyncio (asyncpg) — the hot
+                                                   per-request paths (auth
+                                                   dependency, login, refresh,
+                                                   dashboard), which wait on the
+                                                   database without holding one of
+                                                   the threadpool's threads
+
+Each engine has its own pool sized by the DB_POOL_* settings and
+instrumented by app.db.pool (metrics at GET /health/db).  DB_PGBOUNCER=true
+keeps asyncpg from preparing named statements, which a transaction-mode
+PgBouncer would hand to the wrong server connection; psycopg2 never
+prepares server-side.
 """
 
+import logging
 import os
+from uuid import uuid4
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi import HTTPException, status
 
+from app.core.config import get_settings
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, PoolMetrics, instrument
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
 DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
 
 # Coerce legacy Render postgres:// to postgresql://
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# asyncio driver per backend (the sync URL names the sync one, or none)
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
 _engine = None
 SessionLocal = None
+_async_engine = None
+AsyncSessionLocal = None
+
+sync_pool_metrics  = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size":     settings.DB_POOL_SIZE,
+        "max_overflow":  settings.DB_MAX_OVERFLOW,
+        "pool_timeout":  settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle":  settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _async_url(url: str):
+    """DATABASE_URL rewritten for the asyncio driver, plus its connect_args.
+
+    asyncpg does not understand libpq's ?sslmode=; it takes the same mode
+    names as its ssl= argument instead.
+    """
+    u = make_url(url)
+    backend = u.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"no asyncio driver known for {backend}")
+    u = u.set(drivername=f"{backend}+{driver}")
+    connect_args = {}
+    if driver == "asyncpg" and "sslmode" in u.query:
+        connect_args["ssl"] = u.query["sslmode"]
+        u = u.difference_update_query(["sslmode"])
+    if driver == "asyncpg" and settings.DB_PGBOUNCER:
+        connect_args.update({
+            "statement_cache_size": 0,             # asyncpg's own cache
+            "prepared_statement_cache_size": 0,    # SQLAlchemy's adapter cache
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        })
+    return u, connect_args
+
 
 if DATABASE_URL:
     _engine = create_engine(
         DATABASE_URL,
-        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,
+        **_pool_options(),
     )
+    instrument(_engine, sync_pool_metrics, liveness_interval=settings.DB_LIVENESS_INTERVAL_SECONDS)
     SessionLocal = sessionmaker(
         autocommit=False,
         autoflush=False,
@@ -31,8 +105,41 @@ if DATABASE_URL:
         expire_on_commit=False,
     )
 
+    try:
+        _url, _connect_args = _async_url(DATABASE_URL)
+        _async_engine = create_async_engine(
+            _url,
+            connect_args=_connect_args,
+            poolclass=InstrumentedAsyncQueuePool,
+            **_pool_options(),
+        )
+        instrument(_async_engine.sync_engine, async_pool_metrics,
+                   liveness_interval=settings.DB_LIVENESS_INTERVAL_SECONDS)
+    except (ImportError, ValueError) as exc:
+        # Sync routes keep working; the async ones answer 503
+        logger.warning("Async database engine unavailable: %s", exc)
+    else:
+        AsyncSessionLocal = async_sessionmaker(
+            bind=_async_engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
 # Expose engine for Base.metadata.create_all in lifespan
 engine = _engine
+async_engine = _async_engine
+
+
+def pool_stats() -> dict:
+    """Pool state and counters of both engines (GET /health/db)."""
+    return {
+        "configured": engine is not None,
+        "pgbouncer":  settings.DB_PGBOUNCER,
+        "pre_ping":   settings.DB_POOL_PRE_PING,
+        "liveness_interval_seconds": settings.DB_LIVENESS_INTERVAL_SECONDS,
+        "sync":  sync_pool_metrics.stats(engine.pool if engine is not None else None),
+        "async": async_pool_metrics.stats(async_engine.pool) if async_engine is not None else None,
+    }
 
 
 def get_db():
@@ -50,3 +157,22 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting an asyncio database session (async routes)"""
+    if AsyncSessionLocal is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not configured. Set DATABASE_URL environment variable."
+            if SessionLocal is None else
+            "Async database driver not installed (asyncpg).",
+        )
+    db: AsyncSession = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
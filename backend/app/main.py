@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.auth.routes import router as auth_router
 from app.dashboard_routes import router as dashboard_router
@@ -7,6 +7,11 @@ from app.vault_routes import router as vault_router
 from app.twofa_routes import router as twofa_router
 from app.passkey_routes import router as passkey_router
 from app.core.config import get_settings
+from app.core.keycache import key_cache
+from app.core.keyring import key_ring
+from app.core.malware import clamd_pool, scan_worker
+from app.core.scrubber import scrubber
+from app.core.security import require_health_token
 import sys
 
 try:
@@ -68,6 +73,81 @@ def _apply_schema(engine):
         "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS malware_scan_status VARCHAR(20) NOT NULL DEFAULT 'skipped'",
         "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS malware_scan_at TIMESTAMP",
         "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+        "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS storage_locator VARCHAR(512)",
+        "ALTER TABLE vault_files ALTER COLUMN encrypted_data DROP NOT NULL",
+        """CREATE TABLE IF NOT EXISTS vault_payloads (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            sha256 VARCHAR(64) NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 1,
+            container_size BIGINT NOT NULL,
+            hmac VARCHAR(64) NOT NULL,
+            encrypted_file_key BYTEA NOT NULL,
+            compression_type VARCHAR(20) NOT NULL DEFAULT 'zstd',
+            encryption_version INTEGER NOT NULL DEFAULT 2,
+            key_version INTEGER NOT NULL DEFAULT 1,
+            storage_backend VARCHAR(50) NOT NULL DEFAULT 'postgresql',
+            storage_locator VARCHAR(512),
+            encrypted_data BYTEA,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW())""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_vault_payload_user_sha256 ON vault_payloads(user_id, sha256)",
+        "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS payload_id UUID REFERENCES vault_payloads(id)",
+        "CREATE INDEX IF NOT EXISTS ix_vault_files_payload_id ON vault_files(payload_id)",
+        """CREATE TABLE IF NOT EXISTS vault_zstd_dictionaries (
+            dict_id BIGINT PRIMARY KEY,
+            nonce BYTEA NOT NULL,
+            encrypted_dict BYTEA NOT NULL,
+            dict_size INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            sample_bytes BIGINT NOT NULL,
+            ratio_gain VARCHAR(20),
+            created_at TIMESTAMP NOT NULL DEFAULT NOW())""",
+        "CREATE INDEX IF NOT EXISTS ix_vault_zstd_dictionaries_created_at ON vault_zstd_dictionaries(created_at)",
+        "ALTER TABLE vault_zstd_dictionaries ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES users(id) ON DELETE CASCADE",
+        "CREATE INDEX IF NOT EXISTS idx_zstd_dict_user_created ON vault_zstd_dictionaries(user_id, created_at)",
+        "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS last_verified_at TIMESTAMP",
+        "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS last_verify_ok BOOLEAN",
+        "ALTER TABLE vault_files ADD COLUMN IF NOT EXISTS last_verify_error VARCHAR(500)",
+        "ALTER TABLE vault_payloads ADD COLUMN IF NOT EXISTS last_verified_at TIMESTAMP",
+        "ALTER TABLE vault_payloads ADD COLUMN IF NOT EXISTS last_verify_ok BOOLEAN",
+        "ALTER TABLE vault_payloads ADD COLUMN IF NOT EXISTS last_verify_error VARCHAR(500)",
+        """CREATE TABLE IF NOT EXISTS vault_usage (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            file_count BIGINT NOT NULL DEFAULT 0,
+            plaintext_bytes BIGINT NOT NULL DEFAULT 0,
+            container_bytes BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            reconciled_at TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS vault_scan_verdicts (
+            sha256 VARCHAR(64) NOT NULL,
+            signature_version VARCHAR(64) NOT NULL,
+            clean BOOLEAN NOT NULL,
+            threat VARCHAR(255),
+            scanned_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (sha256, signature_version))""",
+        """CREATE TABLE IF NOT EXISTS vault_upload_sessions (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            file_name VARCHAR(500) NOT NULL,
+            content_type VARCHAR(200) NOT NULL DEFAULT 'application/octet-stream',
+            size_bytes BIGINT NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            key_version INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMP NOT NULL,
+            finalizing_at TIMESTAMP)""",
+        "CREATE INDEX IF NOT EXISTS ix_vault_upload_sessions_user_id ON vault_upload_sessions(user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_vault_upload_sessions_expires_at ON vault_upload_sessions(expires_at)",
+        """CREATE TABLE IF NOT EXISTS vault_upload_chunks (
+            upload_id UUID NOT NULL REFERENCES vault_upload_sessions(id) ON DELETE CASCADE,
+            chunk_index INTEGER NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            sha256 VARCHAR(64) NOT NULL,
+            storage_backend VARCHAR(50) NOT NULL DEFAULT 'postgresql',
+            storage_locator VARCHAR(512),
+            encrypted_data BYTEA,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (upload_id, chunk_index))""",
         """CREATE TABLE IF NOT EXISTS vault_audit_logs (
             id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
             user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -134,9 +214,19 @@ async def lifespan(_app: FastAPI):
             Base.metadata.create_all(bind=engine)
             print("✅ Database tables initialized successfully")
             _apply_schema(engine)
+            if settings.VAULT_SCRUB_ENABLED:
+                scrubber.start()
+            if settings.VAULT_SCAN_MODE == "async":
+                scan_worker.start()
     except Exception as e:
         print(f"⚠ DB init warning: {e}")
     yield
+    scrubber.stop()
+    scan_worker.stop()
+    clamd_pool.close()
+    from app.db.session import async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(title="SyncVeil API", lifespan=lifespan)
 
@@ -155,12 +245,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Vault-SHA256", "X-Vault-Version"],
+    expose_headers=["X-Vault-SHA256", "X-Vault-Version", "Accept-Ranges", "Content-Range", "ETag"],
 )
 
 @app.get("/health")
 def health(): return {"status": "ok"}
 
+@app.get("/health/keycache", dependencies=[Depends(require_health_token)])
+def health_keycache(): return key_cache.stats()
+
+@app.get("/health/keyring", dependencies=[Depends(require_health_token)])
+def health_keyring(): return key_ring.stats()
+
+@app.get("/health/scrubber", dependencies=[Depends(require_health_token)])
+def health_scrubber(): return scrubber.stats()
+
+@app.get("/health/db", dependencies=[Depends(require_health_token)])
+def health_db():
+    from app.db.session import pool_stats
+    return pool_stats()
+
+@app.get("/health/malware", dependencies=[Depends(require_health_token)])
+def health_malware(): return {"clamd": clamd_pool.stats(), "worker": scan_worker.stats()}
+
 app.include_router(auth_router, prefix="/auth")
 app.include_router(dashboard_router)
 app.include_router(vault_router)
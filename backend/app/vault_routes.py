@@ -5,8 +5,15 @@ Drop-in replacement for the vault section of dashboard_routes.py.
 
 Endpoints:
   POST   /api/vault/upload
+  POST   /api/vault/upload/batch
+  POST   /api/vault/uploads                        (resumable: create)
+  GET    /api/vault/uploads/{id}                   (resumable: progress)
+  PUT    /api/vault/uploads/{id}/chunks/{offset}   (resumable: one chunk)
+  POST   /api/vault/uploads/{id}/complete          (resumable: finalize)
+  DELETE /api/vault/uploads/{id}                   (resumable: cancel)
   GET    /api/vault/files
   GET    /api/vault/files/{id}/download
+  POST   /api/vault/files/archive                  (many files as one ZIP / TAR stream)
   GET    /api/vault/files/{id}/integrity
   DELETE /api/vault/files/{id}
   GET    /api/vault/storage/stats
@@ -20,30 +27,71 @@ Then REMOVE the vault endpoints from dashboard_routes.py
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import hashlib
 import io
+import itertools
 import json
+import logging
 import os
-from datetime import datetime
-from typing import Optional
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile, status
+from cryptography.exceptions import InvalidTag
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Request, UploadFile, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import desc, func
-from sqlalchemy.orm import Session
-
+from pydantic import BaseModel, Field
+from sqlalchemy import desc, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, undefer
+from starlette.background import BackgroundTask
+
+from app.core import usage, zstd_dicts
+from app.core.blobstore import INLINE_BACKEND, BlobNotFound, active_backend, get_blob_store
+from app.core.compression import DICT_MAX_FILE_BYTES
 from app.core.config import get_settings
+from app.core.keycache import PURPOSE_UPLOAD_STAGING
+from app.core.malware import (
+    PENDING,
+    SCAN_ERROR,
+    UNSCANNABLE,
+    MalwareScanResult,
+    ScanStream,
+    begin_scan,
+    finish_scan,
+    scan_status,
+    scan_worker,
+)
 from app.core.security import verify_token
 from app.core.ssce import (
+    DEFAULT_CHUNK_SIZE,
+    ByteSource,
     ContainerMetadata,
-    MalwareScanResult,
-    build_container,
-    parse_container,
-    scan_bytes,
+    ContainerView,
+    current_key_version,
+    iter_container_range,
+    iter_parse_container,
+    system_cipher,
     verify_container_integrity,
+    write_container,
+)
+from app.db.models import (
+    Session as UserSession,
+    User,
+    VaultAuditLog,
+    VaultFile,
+    VaultPayload,
+    VaultUploadChunk,
+    VaultUploadSession,
 )
-from app.db.models import Session as UserSession, User, VaultAuditLog, VaultFile
 from app.db.session import get_db
 
 settings = get_settings()
@@ -53,8 +101,10 @@ router   = APIRouter(prefix="/api", tags=["vault"])
 _quota_mb   = int(os.getenv("VAULT_QUOTA_MB", "100"))
 VAULT_QUOTA = _quota_mb * 1024 * 1024
 
-# Hard cap per file (5 MB MVP; raise when large-file streaming is implemented)
-MAX_FILE_SIZE = 5 * 1024 * 1024
+# Hard cap per file — settings.VAULT_MAX_FILE_MB (default 5 MB).
+# SSCE v2 containers are chunked and uploads/downloads stream, so only the
+# inline postgresql backend (VAULT_STORAGE_BACKEND) still argues for a small default.
+MAX_FILE_SIZE = settings.VAULT_MAX_FILE_MB * 1024 * 1024
 
 
 # ── Auth dependency (mirrors dashboard_routes.get_current_user) ───────────────
@@ -127,7 +177,6 @@ def _audit(
         ))
         db.flush()
     except Exception as exc:
-        import logging
         logging.getLogger(__name__).warning("Audit write failed: %s", exc)
 
 
@@ -143,9 +192,123 @@ def _ip_ua(request_headers) -> tuple[str, str]:
         return "", ""
 
 
+# ── Blob access ──────────────────────────────────────────────────────────────
+
+def _open_container(vf: VaultFile, sequential: bool = False) -> BinaryIO:
+    """Open a row's container wherever it lives.  Caller closes the stream.
+
+    Deduplicated rows resolve through their VaultPayload; legacy rows own
+    the blob themselves.  Both carry the same storage_* / encrypted_data
+    attributes.  sequential=True asks the backend for a forward-only stream
+    (one object GET) for callers that read front to back.
+    """
+    src = vf.payload if vf.payload_id is not None else vf
+    if src.storage_backend == INLINE_BACKEND or not src.storage_locator:
+        if src.encrypted_data is None:
+            raise BlobNotFound(str(vf.id))
+        return io.BytesIO(bytes(src.encrypted_data))
+    store = get_blob_store(src.storage_backend)
+    if sequential:
+        return store.open_sequential(src.storage_locator)
+    return store.open(src.storage_locator)
+
+
+def _with_blob(query):
+    """Query options that fetch a VaultFile's container bytes in the same round-trip."""
+    return query.options(
+        undefer(VaultFile.encrypted_data),
+        joinedload(VaultFile.payload).undefer(VaultPayload.encrypted_data),
+    )
+
+
+def _discard_blob(backend: str, locator: Optional[str]) -> None:
+    """Best-effort blob removal — an orphan blob is preferable to a failed request."""
+    if backend == INLINE_BACKEND or not locator:
+        return
+    try:
+        get_blob_store(backend).delete(locator)
+    except Exception as exc:
+        logging.getLogger(__name__).warning("Blob delete failed (%s:%s): %s", backend, locator, exc)
+
+
+def _require_scanned(scan_status_: Optional[str]) -> None:
+    """Refuse plaintext of a file still waiting for (or failing) its async malware scan."""
+    if scan_status_ == PENDING:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="File is still being scanned — try again shortly",
+                            headers={"Retry-After": "5"})
+    if scan_status_ == "infected":
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="File quarantined: malware detected")
+    if scan_status_ == UNSCANNABLE:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="File quarantined: too large to scan for malware")
+    if scan_status_ == SCAN_ERROR:
+        raise HTTPException(status.HTTP_403_FORBIDDEN,
+                            detail="File quarantined: its stored copy could not be read for the malware scan")
+
+
+class _ScanRejected(HTTPException):
+    """An upload refused by the malware scan (infected, or too large to scan)."""
+
+
+def _scan_rejected(db: Session, user_id, filename: str, scan: MalwareScanResult) -> tuple[int, str]:
+    """Audit an upload the malware scan refused; (HTTP status, message) to report."""
+    if scan_status(scan) == UNSCANNABLE:
+        _audit(db, user_id=user_id, event_type="scan_refused",
+               detail=json.dumps({"reason": scan.scanner, "filename": filename}), success=False)
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "File rejected: too large to scan for malware"
+    _audit(db, user_id=user_id, event_type="malware_blocked",
+           detail=json.dumps({"threat": scan.threat, "filename": filename}), success=False)
+    return status.HTTP_422_UNPROCESSABLE_ENTITY, f"File rejected: malware detected ({scan.threat})"
+
+
+# ── Event-loop offload ───────────────────────────────────────────────────────
+# The async routes (they stream request bodies) never run blocking work on
+# the event loop: the sync DB session, hashing, ClamAV, compression and
+# encryption and blob I/O go to this pool.  It is bounded by
+# VAULT_IO_WORKERS, so a burst of large uploads queues here instead of
+# occupying the threadpool that serves every sync route.
+
+_io_pool_obj: Optional[ThreadPoolExecutor] = None
+_io_pool_lock = threading.Lock()
+
+
+def _io_pool() -> ThreadPoolExecutor:
+    global _io_pool_obj
+    with _io_pool_lock:
+        if _io_pool_obj is None:
+            workers = settings.VAULT_IO_WORKERS or 2 * (os.cpu_count() or 1)
+            _io_pool_obj = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="vault-io")
+        return _io_pool_obj
+
+
+async def _offload(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the vault I/O pool and await its result (or exception)."""
+    return await asyncio.get_running_loop().run_in_executor(_io_pool(), functools.partial(fn, *args, **kwargs))
+
+
 # ── Serialiser ───────────────────────────────────────────────────────────────
 
+# Columns read by _serialize — selected directly by the list endpoint so it
+# never builds ORM identities (or touches the container blob) per file.
+_LIST_COLUMNS = (
+    VaultFile.id,
+    VaultFile.file_name,
+    VaultFile.size_bytes,
+    VaultFile.container_size,
+    VaultFile.content_type,
+    VaultFile.sha256,
+    VaultFile.hmac,
+    VaultFile.compression_type,
+    VaultFile.encryption_version,
+    VaultFile.storage_backend,
+    VaultFile.version,
+    VaultFile.malware_scan_status,
+    VaultFile.malware_scan_at,
+    VaultFile.uploaded_at,
+)
+
+
 def _serialize(vf: VaultFile) -> dict:
+    """Serialise a VaultFile or a _LIST_COLUMNS row (same attribute names)."""
     return {
         "id":                  str(vf.id),
         "file_name":           vf.file_name,
@@ -166,138 +329,906 @@ def _serialize(vf: VaultFile) -> dict:
 
 # ── Upload ────────────────────────────────────────────────────────────────────
 
+# Uploads are read from the multipart spool in SSCE-frame-sized blocks; the
+# built container is spooled to a temp file once it outgrows this much RAM.
+UPLOAD_READ_SIZE      = DEFAULT_CHUNK_SIZE
+CONTAINER_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+class _UploadLimitExceeded(Exception):
+    def __init__(self, size: int, quota: bool):
+        self.size  = size      # bytes read when the limit tripped (a lower bound)
+        self.quota = quota     # True → quota headroom, False → per-file cap
+
+
+class _UploadStream:
+    """Metered read of an upload: size limit → SHA-256.
+
+    Iterating yields the file in UPLOAD_READ_SIZE blocks.  Every block is
+    counted against ``limit`` before anything else sees it, then hashed.
+    Reads are clamped so an oversize upload is rejected after at most one
+    byte past the limit.
+    """
+
+    def __init__(self, fileobj, *, limit: int, quota_limited: bool):
+        self._f             = fileobj
+        self._limit         = limit
+        self._quota_limited = quota_limited
+        self._sha           = hashlib.sha256()
+        self.size           = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._sha.hexdigest()
+
+    def __iter__(self):
+        while True:
+            want  = min(UPLOAD_READ_SIZE, self._limit - self.size + 1)
+            block = self._f.read(want)
+            if not block:
+                return
+            self.size += len(block)
+            if self.size > self._limit:
+                raise _UploadLimitExceeded(self.size, self._quota_limited)
+            self._sha.update(block)
+            yield block
+
+    def drain(self) -> None:
+        for _ in self:
+            pass
+
+
+def _reread(fileobj) -> Iterator[bytes]:
+    """Lazy read of a metered upload from the start, in UPLOAD_READ_SIZE blocks."""
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(UPLOAD_READ_SIZE)
+        if not block:
+            return
+        yield block
+
+
+def _build_payload(source: ByteSource, *, user_id, filename: str, content_type: str) -> tuple[VaultPayload, ContainerMetadata]:
+    """Compress → encrypt source into a container and hand it to the storage backend.
+
+    Returns an unsaved VaultPayload describing the stored blob.
+    """
+    sink = tempfile.SpooledTemporaryFile(max_size=CONTAINER_SPOOL_BYTES)
+    try:
+        container_size, meta = write_container(
+            source,
+            sink,
+            filename=filename,
+            content_type=content_type,
+            user_id=str(user_id),
+        )
+
+        # Denormalised fields from the finished container (header + tail only)
+        with ContainerView(sink) as view:
+            hmac_hex = view.hmac.hex()
+            enc_key  = view.enc_file_key
+
+        backend = active_backend()
+        sink.seek(0)
+        if backend == INLINE_BACKEND:
+            container, locator = sink.read(), None
+        else:
+            container, locator = None, get_blob_store(backend).put(sink)
+    finally:
+        sink.close()
+
+    payload = VaultPayload(
+        user_id            = user_id,
+        sha256             = meta.sha256_plaintext,
+        ref_count          = 1,
+        container_size     = container_size,
+        hmac               = hmac_hex,
+        encrypted_file_key = enc_key,
+        compression_type   = meta.compression,
+        encryption_version = meta.ssce_version,
+        key_version        = meta.key_version,
+        storage_backend    = backend,
+        storage_locator    = locator,
+        encrypted_data     = container,
+    )
+    return payload, meta
+
+
+def _feeding(stream: ScanStream, blocks: Iterable[bytes]) -> Iterator[bytes]:
+    """blocks, each handed to the ClamAV stream on its way to the container build."""
+    for block in blocks:
+        stream.feed(block)
+        yield block
+
+
+def _has_payload(db: Session, user_id, sha256: str) -> bool:
+    """Dedup check without the row lock _find_payload takes."""
+    return db.query(VaultPayload.id).filter(
+        VaultPayload.user_id == user_id, VaultPayload.sha256 == sha256,
+    ).first() is not None
+
+
+def _find_payload(db: Session, user_id, sha256: str) -> Optional[VaultPayload]:
+    return (
+        db.query(VaultPayload)
+        .filter(VaultPayload.user_id == user_id, VaultPayload.sha256 == sha256)
+        .with_for_update()
+        .first()
+    )
+
+
+def _quota_lost(db: Session, user_id, exc: usage.QuotaExceeded):
+    """Audit and raise 413 for an upload that lost the race for the last of the quota."""
+    _audit(db, user_id=user_id, event_type="quota_exceeded",
+           detail=json.dumps({"used": exc.used, "upload_size": exc.requested, "quota": exc.quota}),
+           success=False)
+    db.commit()
+    raise HTTPException(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=(f"Storage quota exceeded. "
+                f"Quota: {exc.quota // (1024*1024)} MB, "
+                f"Used: {exc.used // (1024*1024)} MB."),
+    )
+
+
+def _record_file(
+    db: Session,
+    user_id,
+    *,
+    filename: str,
+    content_type: str,
+    size: int,
+    payload: VaultPayload,
+    scan: MalwareScanResult,
+    deduplicated: bool,
+    compressed_size: Optional[int],
+) -> VaultFile:
+    """Add the VaultFile row for an upload of payload, plus its audit record.  Flushes.
+
+    Charges the upload to the user's usage counters first; raises
+    usage.QuotaExceeded (nothing added) if it no longer fits.
+    """
+    usage.charge(db, user_id, plaintext=size, quota=VAULT_QUOTA,
+                 container=0 if deduplicated else payload.container_size)
+    verdict = scan_status(scan)
+    vf = VaultFile(
+        user_id             = user_id,
+        file_name           = filename,
+        content_type        = content_type,
+        size_bytes          = size,
+        container_size      = payload.container_size,
+        sha256              = payload.sha256,
+        hmac                = payload.hmac,
+        encrypted_file_key  = payload.encrypted_file_key,
+        compression_type    = payload.compression_type,
+        encryption_version  = payload.encryption_version,
+        key_version         = payload.key_version,
+        storage_backend     = payload.storage_backend,
+        payload             = payload,
+        version             = 1,
+        malware_scan_status = verdict,
+        malware_scan_at     = None if verdict == PENDING else datetime.utcnow(),
+    )
+    db.add(vf)
+    db.flush()
+    _audit(db, user_id=user_id, file_id=vf.id, event_type="upload",
+           detail=json.dumps({
+               "filename": filename,
+               "original_size": size,
+               "container_size": payload.container_size,
+               "scan": scan.scanner,
+               "deduplicated": deduplicated,
+               "compression_ratio": (
+                   round(compressed_size / max(size, 1), 3)
+                   if compressed_size is not None else None
+               ),
+           }))
+    return vf
+
+
+_Built = tuple[VaultPayload, ContainerMetadata]
+
+
+def _scan_and_build(
+    reread: Callable[[], Iterable[bytes]],
+    *,
+    user_id,
+    sha256: str,
+    size: int,
+    filename: str,
+    content_type: str,
+    build: bool,
+) -> tuple[MalwareScanResult, Optional[_Built]]:
+    """Malware verdict plus, if build, the stored container — from one pass over the plaintext.
+
+    The verdict comes from the cache when it can; otherwise ClamAV is fed
+    the blocks the build reads anyway (or a scan-only pass when there is
+    nothing to build).  Small new files feed the zstd dictionary trainer
+    (opt-in) once the verdict says clean.  A container built for a file
+    that turns out infected is discarded, so the second element is None then.
+    """
+    scan, stream = begin_scan(sha256)
+    built: Optional[_Built] = None
+    sample: Optional[bytes] = None
+    try:
+        if scan is None or scan.clean:
+            if build:
+                source: ByteSource = _feeding(stream, reread()) if stream is not None else reread()
+                if size <= DICT_MAX_FILE_BYTES:
+                    source = sample = b"".join(source)
+                built = _build_payload(source, user_id=user_id, filename=filename, content_type=content_type)
+            elif stream is not None and stream.reachable:
+                for block in reread():
+                    stream.feed(block)
+        if stream is not None:
+            scan = finish_scan(sha256, stream)
+    finally:
+        if stream is not None:
+            stream.close()
+    if not scan.clean:
+        if built is not None:
+            _discard_blob(built[0].storage_backend, built[0].storage_locator)
+        return scan, None
+    if sample is not None:
+        zstd_dicts.offer_sample(user_id, sample)
+    return scan, built
+
+
+def _store_upload(
+    auth: AuthUser,
+    *,
+    filename: str,
+    content_type: str,
+    size: int,
+    sha256: str,
+    reread: Callable[[], Iterable[bytes]],
+) -> dict:
+    """Finish an upload whose plaintext has been metered and hashed.
+
+    Verdict cache → Dedup check
+      → miss: [ClamAV + zstd → AES-GCM frames] → Store   (one pass over the plaintext)
+      → hit:  [ClamAV] unless the verdict is cached
+    → Malware verdict → VaultFile row + audit.  Commits; returns the upload response body.
+
+    reread() starts a fresh pass over the plaintext in blocks; it is called
+    at most once, unless the payload seen by the dedup check is deleted
+    before this upload can reference it.
+    """
+    def _scan_and_build_or_fail(build: bool) -> tuple[MalwareScanResult, Optional[_Built]]:
+        try:
+            return _scan_and_build(reread, user_id=auth.user.id, sha256=sha256, size=size,
+                                   filename=filename, content_type=content_type, build=build)
+        except _StagedChunkUnreadable:
+            raise
+        except Exception as exc:
+            _audit(auth.db, user_id=auth.user.id, event_type="upload",
+                   detail=f"Container build failed: {exc}", success=False)
+            auth.db.commit()
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="Encryption failed — please try again")
+
+    # 4–5. Dedup check (same user, same plaintext → nothing to build), then the
+    #      verdict — cached, left to the async worker, or scanned during the build
+    scan, built = _scan_and_build_or_fail(build=not _has_payload(auth.db, auth.user.id, sha256))
+
+    # 6. Malware verdict (non-blocking if ClamAV unavailable)
+    if not scan.clean:
+        code, message = _scan_rejected(auth.db, auth.user.id, filename, scan)
+        auth.db.commit()
+        raise _ScanRejected(code, detail=message)
+
+    # 7. Share the existing container, or insert the one just built
+    usage.prepare(auth.db, auth.user.id)
+    deduplicated = False
+    compressed_size = None
+    payload = _find_payload(auth.db, auth.user.id, sha256)
+    if payload is not None:
+        payload.ref_count += 1
+        deduplicated = True
+        if built is not None:
+            # Stored concurrently by another upload of the same content
+            _discard_blob(built[0].storage_backend, built[0].storage_locator)
+    else:
+        if built is None:
+            # The payload was deleted since the check; the verdict is cached by now
+            scan, built = _scan_and_build_or_fail(build=True)
+        payload, meta = built
+        compressed_size = meta.compressed_size
+        try:
+            with auth.db.begin_nested():
+                auth.db.add(payload)
+        except IntegrityError:
+            # A concurrent upload of the same content won the insert — use theirs
+            _discard_blob(payload.storage_backend, payload.storage_locator)
+            payload = _find_payload(auth.db, auth.user.id, sha256)
+            payload.ref_count += 1
+            deduplicated = True
+
+    # 8. Persist the per-file record
+    try:
+        vf = _record_file(auth.db, auth.user.id, filename=filename, content_type=content_type, size=size,
+                          payload=payload, scan=scan, deduplicated=deduplicated,
+                          compressed_size=compressed_size)
+        auth.db.commit()
+    except Exception as exc:
+        auth.db.rollback()
+        if not deduplicated:
+            _discard_blob(payload.storage_backend, payload.storage_locator)
+        if isinstance(exc, usage.QuotaExceeded):
+            _quota_lost(auth.db, auth.user.id, exc)
+        raise
+    auth.db.refresh(vf)
+    if vf.malware_scan_status == PENDING:
+        scan_worker.wake()
+
+    return {"file": _serialize(vf), "deduplicated": deduplicated}
+
+
 @router.post("/vault/upload")
 async def upload_file(
     file: UploadFile = File(...),
     auth: AuthUser = Depends(get_current_user),
 ):
     """
-    Full SSCE upload pipeline:
-      Read → Quota check → Malware scan → Compress → Encrypt → Store
-    """
-    from fastapi import Request  # noqa — only needed for header extraction
-    ip, ua = "", ""  # FastAPI UploadFile doesn't carry Request; IP logged best-effort
+    Streaming SSCE upload pipeline over the multipart spool:
+      Quota headroom → [size meter → SHA-256] → Verdict cache → Dedup lookup
+        → hit:  reference the existing payload (ClamAV pass only if not cached)
+        → miss: [ClamAV + zstd → AES-GCM frames] → Store
 
-    # 1. Read content
-    content = await file.read()
+    The spool is read twice at most: once to meter and hash, once to scan
+    and build together.
 
-    # 2. Per-file size limit
-    if len(content) > MAX_FILE_SIZE:
+    Memory per upload is bounded by one SSCE frame plus the container spool
+    threshold; the plaintext is never held in memory as a whole.  Everything
+    after the multipart parse runs on the vault I/O pool.
+    """
+    return await _offload(_upload_from_spool, auth, file)
+
+
+def _upload_from_spool(auth: AuthUser, file: UploadFile) -> dict:
+    """Body of /vault/upload, run on the vault I/O pool."""
+    # 1. Quota headroom — bounds how much of the stream we are willing to read
+    current_usage: int = usage.current(auth.db, auth.user.id).plaintext_bytes
+    remaining     = max(0, VAULT_QUOTA - current_usage)
+    quota_limited = remaining < MAX_FILE_SIZE
+    limit         = min(MAX_FILE_SIZE, remaining)
+
+    def _reject_oversize(size: int, quota: bool):
+        if quota:
+            _audit(auth.db, user_id=auth.user.id, event_type="quota_exceeded",
+                   detail=json.dumps({"used": current_usage, "upload_size": size, "quota": VAULT_QUOTA}),
+                   success=False)
+            auth.db.commit()
+            raise HTTPException(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=(
+                    f"Storage quota exceeded. "
+                    f"Quota: {VAULT_QUOTA // (1024*1024)} MB, "
+                    f"Used: {current_usage // (1024*1024)} MB, "
+                    f"Available: {remaining // (1024*1024)} MB."
+                ),
+            )
         _audit(auth.db, user_id=auth.user.id, event_type="upload",
-               detail=f"Rejected: file {len(content)} bytes exceeds {MAX_FILE_SIZE}", success=False)
+               detail=f"Rejected: file {size}+ bytes exceeds {MAX_FILE_SIZE}", success=False)
         auth.db.commit()
         raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                             detail=f"File exceeds {MAX_FILE_SIZE // (1024*1024)} MB limit")
 
-    # 3. Quota check
-    current_usage: int = (
-        auth.db.query(func.sum(VaultFile.size_bytes))
-        .filter(VaultFile.user_id == auth.user.id)
-        .scalar()
-    ) or 0
-    if current_usage + len(content) > VAULT_QUOTA:
-        remaining = max(0, VAULT_QUOTA - current_usage)
-        _audit(auth.db, user_id=auth.user.id, event_type="quota_exceeded",
-               detail=json.dumps({"used": current_usage, "upload_size": len(content), "quota": VAULT_QUOTA}),
-               success=False)
-        auth.db.commit()
-        raise HTTPException(
-            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=(
-                f"Storage quota exceeded. "
-                f"Quota: {VAULT_QUOTA // (1024*1024)} MB, "
-                f"Used: {current_usage // (1024*1024)} MB, "
-                f"Available: {remaining // (1024*1024)} MB."
-            ),
-        )
+    # 2. Early abort when the multipart parser already knows the size
+    if file.size is not None and file.size > limit:
+        _reject_oversize(file.size, quota=file.size <= MAX_FILE_SIZE)
 
-    # 4. Malware scan (non-blocking if ClamAV unavailable)
-    scan: MalwareScanResult = scan_bytes(content)
-    scan_status = "clean" if scan.clean else "infected"
-    if "unavailable" in scan.scanner:
-        scan_status = "unavailable"
+    # 3. Metered pass: size limit + SHA-256.  Cheap compared to
+    #    compression/encryption, and it yields the dedup and verdict key up front.
+    filename     = (file.filename or "file").strip()[:500]
+    content_type = file.content_type or "application/octet-stream"
+    metered      = _UploadStream(file.file, limit=limit, quota_limited=quota_limited)
+    try:
+        metered.drain()
+    except _UploadLimitExceeded as exc:
+        _reject_oversize(exc.size, exc.quota)
 
-    if not scan.clean:
-        _audit(auth.db, user_id=auth.user.id, event_type="malware_blocked",
-               detail=json.dumps({"threat": scan.threat, "filename": file.filename}),
+    # 4–8. Verdict, dedup, scan + build in one re-read of the spool, persist
+    #      (shared with resumable uploads)
+    return _store_upload(auth, filename=filename, content_type=content_type,
+                         size=metered.size, sha256=metered.sha256,
+                         reread=functools.partial(_reread, file.file))
+
+
+# ── Batch upload ──────────────────────────────────────────────────────────────
+# One request for many files: auth and the quota query happen once, and the
+# files move through a two-stage pipeline — one thread meters and hashes
+# file N+1 while a pool scans, compresses and encrypts the files already
+# metered, each in one pass.  DB work (dedup lookups, rows, audit) stays on
+# the request thread and lands in a single commit.
+
+BATCH_MAX_FILES = 100
+
+
+class _Metered:
+    __slots__ = ("upload", "filename", "content_type", "size", "sha256", "scan", "error")
+
+    def __init__(self, upload: UploadFile):
+        self.upload       = upload
+        self.filename     = (upload.filename or "file").strip()[:500]
+        self.content_type = upload.content_type or "application/octet-stream"
+        self.size         = 0
+        self.sha256       = ""
+        self.scan: Optional[MalwareScanResult] = None
+        self.error: Optional[str] = None
+
+
+def _meter_upload(item: _Metered, limit: int) -> _Metered:
+    """Stage 1 (metering thread): size limit + SHA-256."""
+    metered = _UploadStream(item.upload.file, limit=limit, quota_limited=False)
+    try:
+        metered.drain()
+    except _UploadLimitExceeded:
+        item.error = f"File exceeds {limit // (1024*1024)} MB limit"
+        return item
+    item.size, item.sha256 = metered.size, metered.sha256
+    return item
+
+
+def _scan_and_build_upload(item: _Metered, user_id, build: bool) -> tuple[MalwareScanResult, Optional[_Built]]:
+    """Stage 2 (worker thread): verdict, plus compress → encrypt → store on a dedup miss."""
+    return _scan_and_build(functools.partial(_reread, item.upload.file), user_id=user_id,
+                           sha256=item.sha256, size=item.size, filename=item.filename,
+                           content_type=item.content_type, build=build)
+
+
+@router.post("/vault/upload/batch")
+def upload_files_batch(
+    files: list[UploadFile] = File(...),
+    auth: AuthUser = Depends(get_current_user),
+):
+    """
+    Upload several files at once.  Same pipeline per file as /vault/upload;
+    a file that is too large, infected or fails to encrypt is reported in
+    its result entry without failing the rest.  The batch as a whole must
+    fit the remaining quota.
+    """
+    if not files:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="No files")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"At most {BATCH_MAX_FILES} files per batch")
+
+    current_usage = usage.current(auth.db, auth.user.id).plaintext_bytes
+    remaining     = max(0, VAULT_QUOTA - current_usage)
+    declared      = sum(f.size or 0 for f in files)
+
+    def _reject_quota(size: int):
+        _audit(auth.db, user_id=auth.user.id, event_type="quota_exceeded",
+               detail=json.dumps({"used": current_usage, "upload_size": size, "quota": VAULT_QUOTA,
+                                  "files": len(files)}),
                success=False)
         auth.db.commit()
-        raise HTTPException(
-            status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"File rejected: malware detected ({scan.threat})",
-        )
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=(f"Storage quota exceeded. "
+                                    f"Available: {remaining // (1024*1024)} MB, batch: {size // (1024*1024)} MB."))
+
+    if declared > remaining:
+        _reject_quota(declared)
+
+    items    = [_Metered(f) for f in files]
+    limit    = min(MAX_FILE_SIZE, remaining)
+    stage2: dict[str, object] = {}              # sha256 → Future of the one scan/build for that content
+    existing: dict[str, VaultPayload] = {}
+    workers  = min(len(items), settings.VAULT_BATCH_WORKERS or os.cpu_count() or 1)
+
+    # Separate pools, so a file's stage 2 starts as soon as it is metered
+    # instead of queueing behind the metering of the rest of the batch.
+    meter_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vault-batch-meter")
+    pool       = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vault-batch")
+    metering   = [meter_pool.submit(_meter_upload, item, limit) for item in items]
+    try:
+        accepted = 0
+        for future in metering:                  # in order, as each file finishes stage 1
+            item = future.result()
+            if item.error:
+                continue
+            accepted += item.size
+            if accepted > remaining:
+                _reject_quota(accepted)
+            if item.sha256 in stage2:
+                continue
+            payload = _find_payload(auth.db, auth.user.id, item.sha256)
+            if payload is not None:
+                existing[item.sha256] = payload
+            stage2[item.sha256] = pool.submit(_scan_and_build_upload, item, auth.user.id, payload is None)
+
+        verdicts: dict[str, MalwareScanResult] = {}
+        built: dict[str, object] = {}
+        for sha, future in stage2.items():
+            try:
+                verdicts[sha], built[sha] = future.result()
+            except Exception as exc:
+                built[sha] = exc
+    except BaseException:
+        meter_pool.shutdown(wait=True, cancel_futures=True)
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in stage2.values():
+            if not future.cancelled() and future.exception() is None:
+                _, outcome = future.result()
+                if outcome is not None:
+                    _discard_blob(outcome[0].storage_backend, outcome[0].storage_locator)
+        raise
+    finally:
+        meter_pool.shutdown(wait=True)
+        pool.shutdown(wait=True)
 
-    # 5. Build .syncveil container (compress → encrypt → wrap)
-    filename     = (file.filename or "file").strip()[:500]
-    content_type = file.content_type or "application/octet-stream"
+    results: list[dict] = []
+    new_payloads: list[VaultPayload] = []
+    files_out: list[tuple[int, VaultFile, bool]] = []
     try:
-        container, meta = build_container(
-            content,
-            filename=filename,
-            content_type=content_type,
-            user_id=str(auth.user.id),
-        )
-    except Exception as exc:
-        _audit(auth.db, user_id=auth.user.id, event_type="upload",
-               detail=f"Container build failed: {exc}", success=False)
+        usage.prepare(auth.db, auth.user.id)
+        for item in items:
+            if item.error:
+                results.append({"filename": item.filename, "error": item.error})
+                continue
+            item.scan = verdicts.get(item.sha256)
+            if item.scan is not None and not item.scan.clean:
+                _, message = _scan_rejected(auth.db, auth.user.id, item.filename, item.scan)
+                results.append({"filename": item.filename, "error": message})
+                continue
+
+            compressed_size = None
+            payload = existing.get(item.sha256)
+            outcome = built.pop(item.sha256, None)
+            if isinstance(outcome, Exception):
+                _audit(auth.db, user_id=auth.user.id, event_type="upload",
+                       detail=f"Container build failed: {outcome}", success=False)
+                existing[item.sha256] = None
+                outcome = payload = None
+            if outcome is not None:                # first file with this content: insert its payload
+                payload, meta = outcome
+                try:
+                    with auth.db.begin_nested():
+                        auth.db.add(payload)
+                    new_payloads.append(payload)
+                    compressed_size = meta.compressed_size
+                    deduplicated    = False
+                except IntegrityError:
+                    # A concurrent upload of the same content won the insert — use theirs
+                    _discard_blob(payload.storage_backend, payload.storage_locator)
+                    payload = _find_payload(auth.db, auth.user.id, item.sha256)
+                    payload.ref_count += 1
+                    deduplicated = True
+                existing[item.sha256] = payload
+            elif payload is not None:
+                payload.ref_count += 1
+                deduplicated = True
+            else:
+                results.append({"filename": item.filename, "error": "Encryption failed — please try again"})
+                continue
+
+            vf = _record_file(auth.db, auth.user.id, filename=item.filename,
+                              content_type=item.content_type, size=item.size, payload=payload,
+                              scan=item.scan, deduplicated=deduplicated, compressed_size=compressed_size)
+            files_out.append((len(results), vf, deduplicated))
+            results.append({"filename": item.filename})
         auth.db.commit()
-        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail="Encryption failed — please try again")
-
-    # 6. Compute HMAC hex for the DB index (already embedded in container, stored separately for queries)
-    import hmac as _hmac_mod
-    hmac_hex = _hmac_mod.new(
-        # Re-use master key from ssce module
-        __import__("app.core.ssce", fromlist=["MASTER_KEY"]).MASTER_KEY,
-        container,
-        __import__("hashlib").sha256,
-    ).hexdigest()
-    # Actually the HMAC is already the last 32 bytes of the container as raw bytes.
-    # Store it as hex for the DB column.
-    hmac_hex = container[-32:].hex()
-
-    # 7. Extract encrypted_file_key from container for denormalized storage
-    # Layout: MAGIC(8) + VERSION(1) + METALEN(4) + META(n) + FILE_NONCE(12) + ENC_KEY(48) + ...
-    import struct
-    offset     = 8 + 1 + 4
-    meta_len_s = struct.unpack(">I", container[8+1:8+1+4])[0]
-    offset    += meta_len_s + 12   # skip metadata + file_nonce
-    enc_key    = container[offset: offset + 48]
-
-    # 8. Persist
-    vf = VaultFile(
-        user_id             = auth.user.id,
-        file_name           = meta.original_filename,
-        content_type        = meta.content_type,
-        size_bytes          = meta.original_size,
-        container_size      = len(container),
-        sha256              = meta.sha256_plaintext,
-        hmac                = hmac_hex,
-        encrypted_file_key  = enc_key,
-        compression_type    = meta.compression,
-        encryption_version  = meta.ssce_version,
-        key_version         = meta.key_version,
-        storage_backend     = "postgresql",
-        version             = 1,
-        malware_scan_status = scan_status,
-        malware_scan_at     = datetime.utcnow(),
-        encrypted_data      = container,
+    except Exception as exc:
+        auth.db.rollback()
+        unused = [o[0] for o in built.values() if isinstance(o, tuple)]
+        for payload in new_payloads + unused:
+            _discard_blob(payload.storage_backend, payload.storage_locator)
+        if isinstance(exc, usage.QuotaExceeded):
+            _quota_lost(auth.db, auth.user.id, exc)
+        raise
+
+    for index, vf, deduplicated in files_out:
+        results[index].update({"file": _serialize(vf), "deduplicated": deduplicated})
+    if any(vf.malware_scan_status == PENDING for _, vf, _ in files_out):
+        scan_worker.wake()
+    return {"files": results, "uploaded": len(files_out)}
+
+
+# ── Resumable upload ──────────────────────────────────────────────────────────
+# create session → PUT chunks at their byte offsets (any order; re-sending a
+# stored chunk is a no-op) → GET the session to see what is still missing →
+# complete.  Each chunk is sealed with AES-GCM as soon as it arrives and
+# staged like a container blob.  Completing streams the staged chunks twice
+# — meter, then scan + compress + encrypt — one chunk in memory at a time.
+
+RESUMABLE_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+UPLOAD_SESSION_TTL   = timedelta(hours=settings.VAULT_UPLOAD_SESSION_HOURS)
+FINALIZE_LEASE       = timedelta(minutes=30)    # a complete that died is retryable after this
+
+
+class CreateUploadRequest(BaseModel):
+    filename: str = Field(min_length=1, max_length=500)
+    content_type: str = Field(default="application/octet-stream", max_length=200)
+    size: int = Field(ge=0)
+
+
+class _StagedChunkUnreadable(Exception):
+    def __init__(self, index: int):
+        self.index = index
+
+
+def _chunk_aad(upload_id, index: int) -> bytes:
+    return f"vault-upload:{upload_id}:{index}".encode("ascii")
+
+
+def _seal_chunk(upload: VaultUploadSession, index: int, data: bytes) -> bytes:
+    nonce  = os.urandom(12)
+    cipher = system_cipher(PURPOSE_UPLOAD_STAGING, upload.key_version)
+    return nonce + cipher.encrypt(nonce, data, _chunk_aad(upload.id, index))
+
+
+def _iter_staged(db: Session, upload: VaultUploadSession, chunks: list) -> Iterator[bytes]:
+    """Decrypted chunks in order; each is fetched, opened and checked on its own."""
+    cipher = system_cipher(PURPOSE_UPLOAD_STAGING, upload.key_version)
+    for chunk in chunks:
+        try:
+            if chunk.storage_backend == INLINE_BACKEND or not chunk.storage_locator:
+                # Column query, not chunk.encrypted_data: keeps the bytes out of the identity map
+                sealed = db.query(VaultUploadChunk.encrypted_data).filter(
+                    VaultUploadChunk.upload_id == upload.id,
+                    VaultUploadChunk.chunk_index == chunk.chunk_index,
+                ).scalar()
+                if sealed is None:
+                    raise BlobNotFound(f"{upload.id}:{chunk.chunk_index}")
+            else:
+                with get_blob_store(chunk.storage_backend).open(chunk.storage_locator) as f:
+                    sealed = f.read()
+            data = cipher.decrypt(sealed[:12], sealed[12:], _chunk_aad(upload.id, chunk.chunk_index))
+        except (BlobNotFound, InvalidTag) as exc:
+            raise _StagedChunkUnreadable(chunk.chunk_index) from exc
+        if len(data) != chunk.size_bytes or hashlib.sha256(data).hexdigest() != chunk.sha256:
+            raise _StagedChunkUnreadable(chunk.chunk_index)
+        yield data
+
+
+def _chunk_count(upload: VaultUploadSession) -> int:
+    return -(-upload.size_bytes // upload.chunk_size)
+
+
+def _upload_status(upload: VaultUploadSession, chunks: list) -> dict:
+    have = {c.chunk_index for c in chunks}
+    return {
+        "upload_id":   str(upload.id),
+        "filename":    upload.file_name,
+        "size":        upload.size_bytes,
+        "chunk_size":  upload.chunk_size,
+        "chunk_count": _chunk_count(upload),
+        "received":    [{"offset": c.chunk_index * upload.chunk_size, "size": c.size_bytes, "sha256": c.sha256}
+                        for c in chunks],
+        "missing":     [i * upload.chunk_size for i in range(_chunk_count(upload)) if i not in have],
+        "expires_at":  upload.expires_at.isoformat(),
+    }
+
+
+def _get_upload(auth: AuthUser, upload_id: str) -> VaultUploadSession:
+    try:
+        uid = UUID(upload_id)
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid upload ID")
+    upload = auth.db.query(VaultUploadSession).filter(
+        VaultUploadSession.id == uid,
+        VaultUploadSession.user_id == auth.user.id,
+        VaultUploadSession.expires_at > datetime.utcnow(),
+    ).first()
+    if not upload:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Upload not found or expired")
+    return upload
+
+
+def _drop_upload(db: Session, upload: VaultUploadSession) -> None:
+    """Delete a session and its staged chunks.  Commits."""
+    blobs = [(c.storage_backend, c.storage_locator) for c in upload.chunks]
+    db.delete(upload)
+    db.commit()
+    for backend, locator in blobs:
+        _discard_blob(backend, locator)
+
+
+def _release_upload(db: Session, upload: VaultUploadSession) -> None:
+    """Undo complete's claim so the client can fix things up and retry.  Commits."""
+    db.query(VaultUploadSession).filter(VaultUploadSession.id == upload.id).update(
+        {VaultUploadSession.finalizing_at: None}, synchronize_session=False)
+    db.commit()
+
+
+def _purge_expired_uploads(db: Session, limit: int = 20) -> None:
+    """Opportunistic cleanup of abandoned sessions, run when a new one is created."""
+    for upload in (
+        db.query(VaultUploadSession)
+        .filter(VaultUploadSession.expires_at <= datetime.utcnow())
+        .limit(limit)
+        .all()
+    ):
+        _drop_upload(db, upload)
+
+
+@router.post("/vault/uploads")
+def create_upload(req: CreateUploadRequest, auth: AuthUser = Depends(get_current_user)):
+    """Open a resumable upload for a file of a declared size."""
+    if req.size > MAX_FILE_SIZE:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File exceeds {MAX_FILE_SIZE // (1024*1024)} MB limit")
+    if usage.current(auth.db, auth.user.id).plaintext_bytes + req.size > VAULT_QUOTA:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Storage quota exceeded")
+
+    _purge_expired_uploads(auth.db)
+    open_sessions = auth.db.query(func.count(VaultUploadSession.id)).filter(
+        VaultUploadSession.user_id == auth.user.id,
+    ).scalar()
+    if open_sessions >= settings.VAULT_UPLOAD_MAX_SESSIONS:
+        raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many unfinished uploads — complete or cancel one first")
+
+    upload = VaultUploadSession(
+        user_id      = auth.user.id,
+        file_name    = req.filename.strip()[:500] or "file",
+        content_type = req.content_type or "application/octet-stream",
+        size_bytes   = req.size,
+        chunk_size   = RESUMABLE_CHUNK_SIZE,
+        key_version  = current_key_version(),
+        expires_at   = datetime.utcnow() + UPLOAD_SESSION_TTL,
     )
-    auth.db.add(vf)
-    auth.db.flush()
+    auth.db.add(upload)
+    auth.db.commit()
+    return _upload_status(upload, [])
 
-    _audit(auth.db, user_id=auth.user.id, file_id=vf.id, event_type="upload",
-           detail=json.dumps({
-               "filename": filename,
-               "original_size": meta.original_size,
-               "container_size": len(container),
-               "scan": scan.scanner,
-               "compression_ratio": round(meta.compressed_size / max(meta.original_size, 1), 3),
-           }))
+
+@router.get("/vault/uploads/{upload_id}")
+def get_upload(upload_id: str, auth: AuthUser = Depends(get_current_user)):
+    """Progress of a resumable upload: stored chunks with their SHA-256, missing offsets."""
+    upload = _get_upload(auth, upload_id)
+    return _upload_status(upload, list(upload.chunks))
+
+
+@router.put("/vault/uploads/{upload_id}/chunks/{offset}")
+async def put_upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(default=None),
+    auth: AuthUser = Depends(get_current_user),
+):
+    """
+    Store the chunk starting at byte offset (a multiple of chunk_size).
+    The body is the raw chunk; every chunk but the last is exactly
+    chunk_size bytes.  X-Chunk-SHA256, if sent, must match.
+    """
+    upload = await _offload(_get_upload, auth, upload_id)
+    if upload.finalizing_at is not None:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Upload is being finalized")
+    if offset < 0 or offset % upload.chunk_size or offset >= upload.size_bytes:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Offset must be a chunk boundary inside the file")
+    index    = offset // upload.chunk_size
+    expected = min(upload.chunk_size, upload.size_bytes - offset)
+
+    body = bytearray()
+    async for block in request.stream():
+        body += block
+        if len(body) > expected:
+            break
+    if len(body) != expected:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST,
+                            detail=f"Chunk at offset {offset} must be {expected} bytes")
+    return await _offload(_stage_chunk, auth, upload, index, offset, bytes(body), x_chunk_sha256)
+
+
+def _stage_chunk(auth: AuthUser, upload: VaultUploadSession, index: int, offset: int,
+                 data: bytes, x_chunk_sha256: Optional[str]) -> dict:
+    """Verify, seal and store one received chunk (vault I/O pool)."""
+    digest = hashlib.sha256(data).hexdigest()
+    if x_chunk_sha256 and x_chunk_sha256.strip().lower() != digest:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Chunk SHA-256 mismatch")
+
+    chunk = auth.db.get(VaultUploadChunk, (upload.id, index))
+    if chunk is None or chunk.sha256 != digest:
+        sealed  = _seal_chunk(upload, index, data)
+        backend = active_backend()
+        locator = None if backend == INLINE_BACKEND else get_blob_store(backend).put(io.BytesIO(sealed))
+        replaced = (chunk.storage_backend, chunk.storage_locator) if chunk is not None else None
+        if chunk is None:
+            chunk = VaultUploadChunk(upload_id=upload.id, chunk_index=index)
+            auth.db.add(chunk)
+        chunk.size_bytes      = len(data)
+        chunk.sha256          = digest
+        chunk.storage_backend = backend
+        chunk.storage_locator = locator
+        chunk.encrypted_data  = sealed if locator is None else None
+        try:
+            auth.db.commit()
+        except IntegrityError:
+            # The same chunk arrived twice at once; the other copy is as good
+            auth.db.rollback()
+            _discard_blob(backend, locator)
+            replaced = None
+        if replaced is not None:
+            _discard_blob(*replaced)
+
+    return {"offset": offset, "size": len(data), "sha256": digest}
+
+
+@router.post("/vault/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, auth: AuthUser = Depends(get_current_user)):
+    """
+    Assemble the staged chunks into an SSCE container:
+      All chunks present → Quota → [decrypt → SHA-256] → Verdict (cache | ClamAV)
+        → same verdict / dedup / build / store path as /vault/upload
+    Runs on the vault I/O pool, like /vault/upload.
+    """
+    return await _offload(_complete_upload, auth, upload_id)
+
+
+def _complete_upload(auth: AuthUser, upload_id: str) -> dict:
+    upload = _get_upload(auth, upload_id)
+    now    = datetime.utcnow()
+    # Claim the session so two concurrent completes cannot both create a file
+    claimed = auth.db.query(VaultUploadSession).filter(
+        VaultUploadSession.id == upload.id,
+        or_(VaultUploadSession.finalizing_at.is_(None),
+            VaultUploadSession.finalizing_at < now - FINALIZE_LEASE),
+    ).update({VaultUploadSession.finalizing_at: now}, synchronize_session=False)
     auth.db.commit()
-    auth.db.refresh(vf)
+    if not claimed:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Upload is already being finalized")
 
-    return {"file": _serialize(vf)}
+    chunks = list(upload.chunks)
+    try:
+        missing = _upload_status(upload, chunks)["missing"]
+        if missing:
+            raise HTTPException(status.HTTP_409_CONFLICT,
+                                detail={"message": "Upload incomplete", "missing": missing})
+        current_usage = usage.current(auth.db, auth.user.id).plaintext_bytes
+        if current_usage + upload.size_bytes > VAULT_QUOTA:
+            _audit(auth.db, user_id=auth.user.id, event_type="quota_exceeded",
+                   detail=json.dumps({"used": current_usage, "upload_size": upload.size_bytes,
+                                      "quota": VAULT_QUOTA}),
+                   success=False)
+            auth.db.commit()
+            raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Storage quota exceeded")
+
+        # Pass 1: SHA-256 (dedup and verdict key).  The scan and build pass
+        # happens inside _store_upload, and not at all for a cached dedup hit.
+        sha = hashlib.sha256()
+        for data in _iter_staged(auth.db, upload, chunks):
+            sha.update(data)
+        result = _store_upload(auth, filename=upload.file_name, content_type=upload.content_type,
+                               size=upload.size_bytes, sha256=sha.hexdigest(),
+                               reread=functools.partial(_iter_staged, auth.db, upload, chunks))
+    except _StagedChunkUnreadable as exc:
+        # Forget the bad chunk so the client sees it as missing and sends it again
+        auth.db.rollback()
+        auth.db.query(VaultUploadChunk).filter(
+            VaultUploadChunk.upload_id == upload.id,
+            VaultUploadChunk.chunk_index == exc.index,
+        ).delete(synchronize_session=False)
+        _release_upload(auth.db, upload)
+        raise HTTPException(status.HTTP_409_CONFLICT, detail={
+            "message": "A staged chunk could not be read — upload it again",
+            "missing": [exc.index * upload.chunk_size],
+        })
+    except _ScanRejected:
+        auth.db.rollback()
+        _drop_upload(auth.db, upload)              # refused by the scan: nothing left to resume
+        raise
+    except HTTPException:
+        auth.db.rollback()
+        _release_upload(auth.db, upload)
+        raise
+    except Exception:
+        auth.db.rollback()
+        _release_upload(auth.db, upload)
+        raise
+
+    _drop_upload(auth.db, upload)
+    return result
+
+
+@router.delete("/vault/uploads/{upload_id}")
+def cancel_upload(upload_id: str, auth: AuthUser = Depends(get_current_user)):
+    upload = _get_upload(auth, upload_id)
+    if upload.finalizing_at is not None:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Upload is being finalized")
+    _drop_upload(auth.db, upload)
+    return {"success": True}
 
 
 # ── List ──────────────────────────────────────────────────────────────────────
@@ -305,7 +1236,7 @@ async def upload_file(
 @router.get("/vault/files")
 def get_vault_files(auth: AuthUser = Depends(get_current_user)):
     files = (
-        auth.db.query(VaultFile)
+        auth.db.query(*_LIST_COLUMNS)
         .filter(VaultFile.user_id == auth.user.id)
         .order_by(desc(VaultFile.uploaded_at))
         .all()
@@ -315,26 +1246,118 @@ def get_vault_files(auth: AuthUser = Depends(get_current_user)):
 
 # ── Download ──────────────────────────────────────────────────────────────────
 
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (absent, malformed, other
+    units, or multiple ranges — RFC 9110 allows answering those with 200).
+    Raises HTTP 416 when the range is well-formed but unsatisfiable.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end   = int(last) if last else size - 1
+        else:
+            if not last:
+                return None
+            start = max(size - int(last), 0)    # suffix range: last N bytes
+            end   = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range holds a strong ETag or an HTTP-date; anything else fails it."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+    return if_range == etag or if_range == last_modified
+
+
+def _stream_plaintext(chunks, file_id, stream: BinaryIO) -> Iterator[bytes]:
+    """Relay decrypted chunks, logging failures that surface mid-response.
+
+    Frames are authenticated one by one, so a late error (HMAC or digest
+    mismatch at the end of the container) can only abort the transfer — the
+    status line has already been sent.  The DB session is gone by now, so
+    the failure goes to the application log instead of the audit table.
+    """
+    try:
+        yield from chunks
+    except ValueError as exc:
+        logging.getLogger(__name__).error("Vault stream aborted for file %s: %s", file_id, exc)
+        raise
+    finally:
+        stream.close()
+
+
 @router.get("/vault/files/{file_id}/download")
-def download_vault_file(file_id: str, auth: AuthUser = Depends(get_current_user)):
+def download_vault_file(
+    file_id: str,
+    auth: AuthUser = Depends(get_current_user),
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    if_range: Optional[str] = Header(default=None, alias="If-Range"),
+):
     """
-    Verify HMAC → parse container → decrypt → decompress → stream to client.
+    Stream decrypted plaintext frame by frame.
+
+    Honours a single-range ``Range`` header (206 Partial Content) — only the
+    container frames overlapping the range are decrypted — and ``If-Range``
+    against the plaintext-SHA-256 ETag or the upload timestamp.
     """
     try:
         fid = UUID(file_id)
     except ValueError:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid file ID")
 
-    vf = auth.db.query(VaultFile).filter(
+    vf = _with_blob(auth.db.query(VaultFile)).filter(
         VaultFile.id == fid,
         VaultFile.user_id == auth.user.id,
     ).first()
     if not vf:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
+    _require_scanned(vf.malware_scan_status)
 
+    size          = vf.size_bytes or 0
+    etag          = f'"{vf.sha256}"' if vf.sha256 else ""
+    last_modified = format_datetime(vf.uploaded_at.replace(tzinfo=timezone.utc), usegmt=True) if vf.uploaded_at else ""
+
+    byte_range = None
+    if range_header and _if_range_matches(if_range, etag, last_modified):
+        byte_range = _parse_range(range_header, size)
+
+    # Pull the first chunk eagerly so header/key/first-frame failures still
+    # produce a proper error status instead of a truncated 200.
+    stream = None
     try:
-        plaintext, meta = parse_container(bytes(vf.encrypted_data))
-    except ValueError as exc:
+        stream = _open_container(vf, sequential=byte_range is None)
+        if byte_range is None:
+            chunks = iter_parse_container(stream)
+        else:
+            chunks = iter_container_range(stream, *byte_range)
+        first = next(chunks, b"")
+    except (ValueError, BlobNotFound) as exc:
+        if stream is not None:
+            stream.close()
         _audit(auth.db, user_id=auth.user.id, file_id=vf.id,
                event_type="integrity_fail",
                detail=str(exc), success=False)
@@ -342,19 +1365,213 @@ def download_vault_file(file_id: str, auth: AuthUser = Depends(get_current_user)
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="File integrity verification failed")
 
-    _audit(auth.db, user_id=auth.user.id, file_id=vf.id, event_type="download")
+    try:
+        _audit(auth.db, user_id=auth.user.id, file_id=vf.id, event_type="download",
+               detail=f"bytes={byte_range[0]}-{byte_range[1]}" if byte_range else "")
+        auth.db.commit()
+
+        safe_name = vf.file_name.replace('"', '\\"')
+        headers = {
+            "Content-Disposition": f'attachment; filename="{safe_name}"',
+            "Accept-Ranges":       "bytes",
+            "X-Content-Type-Options": "nosniff",
+            "X-Vault-SHA256":      vf.sha256 or "",
+            "X-Vault-Version":     str(vf.version),
+        }
+        if etag:
+            headers["ETag"] = etag
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+
+        if byte_range is None:
+            status_code = status.HTTP_200_OK
+            headers["Content-Length"] = str(size)
+        else:
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"]  = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+            headers["Content-Length"] = str(byte_range[1] - byte_range[0] + 1)
+
+        # The generator closes the source when it runs to the end; the background
+        # task covers a response whose body is never pulled (closing twice is harmless).
+        return StreamingResponse(
+            _stream_plaintext(itertools.chain((first,), chunks), vf.id, stream),
+            status_code=status_code,
+            media_type=vf.content_type or "application/octet-stream",
+            headers=headers,
+            background=BackgroundTask(stream.close),
+        )
+    except BaseException:
+        stream.close()
+        raise
+
+
+# ── Archive download ──────────────────────────────────────────────────────────
+# Many files as one ZIP or TAR, decrypted frame by frame straight into the
+# response: each file's container is opened only when its turn comes and
+# archive bytes are handed on as soon as they are written, so neither the
+# archive nor any one file is staged in memory or on disk.
+
+ARCHIVE_MAX_FILES  = 1000
+ARCHIVE_FLUSH_SIZE = 256 * 1024
+_TAR_BLOCK         = 512
+_TAR_RECORD        = 20 * _TAR_BLOCK
+
+
+class ArchiveRequest(BaseModel):
+    file_ids: list[str] = Field(min_length=1, max_length=ARCHIVE_MAX_FILES)
+    format: str = Field(default="zip", pattern=r"^(zip|tar)$")
+
+
+class _ArchiveSink(io.RawIOBase):
+    """Write-only, unseekable buffer that the archive writer fills and the response drains."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _archive_name(name: str, used: set[str]) -> str:
+    """Flat, unique member name: no directories, "name (2).ext" on collisions."""
+    name = name.replace("/", "_").replace("\\", "_").lstrip(".") or "file"
+    stem, dot, ext = name.rpartition(".")
+    if not stem:
+        stem, dot, ext = ext, "", ""
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem} ({n}){dot}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def _iter_members(entries: list[tuple]) -> Iterator[tuple[str, int, datetime, Iterator[bytes]]]:
+    """(name, size, uploaded_at, plaintext chunks) per file, opened one at a time.
+
+    Runs inside the response, after the request's DB session is gone, so it
+    reads the containers through a session of its own.
+    """
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for file_id, name, size, uploaded_at in entries:
+            vf = _with_blob(db.query(VaultFile)).filter(VaultFile.id == file_id).first()
+            if vf is None:
+                logging.getLogger(__name__).warning("Archive: file %s deleted before it was streamed", file_id)
+                continue
+            stream = _open_container(vf, sequential=True)
+            db.expunge_all()                     # inline container bytes now live only in the stream
+            try:
+                yield name, size, uploaded_at, iter_parse_container(stream)
+            finally:
+                stream.close()
+    finally:
+        db.close()
+
+
+def _iter_zip(members) -> Iterator[bytes]:
+    sink = _ArchiveSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for name, size, uploaded_at, chunks in members:
+            info = zipfile.ZipInfo(name, date_time=max(uploaded_at, datetime(1980, 1, 1)).timetuple()[:6])
+            info.file_size = size                # lets zipfile pick ZIP64 up front for big members
+            with zf.open(info, "w") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    if sink.pending() >= ARCHIVE_FLUSH_SIZE:
+                        yield sink.take()
+            yield sink.take()
+    yield sink.take()
+
+
+def _iter_tar(members) -> Iterator[bytes]:
+    written = 0
+    for name, size, uploaded_at, chunks in members:
+        info       = tarfile.TarInfo(name)
+        info.size  = size
+        info.mtime = int(uploaded_at.replace(tzinfo=timezone.utc).timestamp())
+        info.mode  = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        yield header
+        sent = 0
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+        if sent != size:
+            raise ValueError(f"Archive member {name!r}: {sent} bytes, expected {size}")
+        padding = -size % _TAR_BLOCK
+        yield b"\0" * padding
+        written += len(header) + size + padding
+    end = 2 * _TAR_BLOCK
+    yield b"\0" * (end + (-(written + end) % _TAR_RECORD))
+
+
+def _stream_archive(parts: Iterator[bytes], count: int) -> Iterator[bytes]:
+    try:
+        for part in parts:
+            if part:
+                yield part
+    except (ValueError, BlobNotFound) as exc:
+        logging.getLogger(__name__).error("Vault archive (%d files) aborted: %s", count, exc)
+        raise
+
+
+@router.post("/vault/files/archive")
+def download_vault_archive(req: ArchiveRequest, auth: AuthUser = Depends(get_current_user)):
+    """
+    Stream the requested files, decrypted, as one ZIP (stored, ZIP64 when
+    needed) or POSIX tar.  Members are flat and uniquely named, in request
+    order.  Integrity failures surface mid-stream and abort the transfer,
+    as with single-file downloads.
+    """
+    try:
+        ids = list(dict.fromkeys(UUID(i) for i in req.file_ids))
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid file ID")
+
+    rows = {
+        r.id: r for r in auth.db.query(
+            VaultFile.id, VaultFile.file_name, VaultFile.size_bytes, VaultFile.uploaded_at,
+            VaultFile.malware_scan_status,
+        ).filter(VaultFile.user_id == auth.user.id, VaultFile.id.in_(ids))
+    }
+    if len(rows) != len(ids):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
+    for r in rows.values():
+        _require_scanned(r.malware_scan_status)
+
+    used: set[str] = set()
+    entries = []
+    for fid in ids:
+        r = rows[fid]
+        entries.append((fid, _archive_name(r.file_name, used), r.size_bytes or 0, r.uploaded_at or datetime.utcnow()))
+        _audit(auth.db, user_id=auth.user.id, file_id=fid, event_type="download",
+               detail=f"archive:{req.format}")
     auth.db.commit()
 
-    safe_name = vf.file_name.replace('"', '\\"')
+    members = _iter_members(entries)
+    parts   = _iter_zip(members) if req.format == "zip" else _iter_tar(members)
+    stamp   = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
     return StreamingResponse(
-        io.BytesIO(plaintext),
-        media_type=vf.content_type or "application/octet-stream",
+        _stream_archive(parts, len(entries)),
+        media_type="application/zip" if req.format == "zip" else "application/x-tar",
         headers={
-            "Content-Disposition": f'attachment; filename="{safe_name}"',
-            "Content-Length":      str(len(plaintext)),
+            "Content-Disposition":    f'attachment; filename="vault-{stamp}.{req.format}"',
             "X-Content-Type-Options": "nosniff",
-            "X-Vault-SHA256":      meta.sha256_plaintext,
-            "X-Vault-Version":     str(vf.version),
         },
     )
 
@@ -365,21 +1582,26 @@ def download_vault_file(file_id: str, auth: AuthUser = Depends(get_current_user)
 def check_file_integrity(file_id: str, auth: AuthUser = Depends(get_current_user)):
     """
     Verify HMAC and container structure without full decryption.
-    Lightweight — suitable for periodic background health checks.
+    One forward pass over the storage stream in constant memory —
+    suitable for periodic background health checks.
     """
     try:
         fid = UUID(file_id)
     except ValueError:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid file ID")
 
-    vf = auth.db.query(VaultFile).filter(
+    vf = _with_blob(auth.db.query(VaultFile)).filter(
         VaultFile.id == fid,
         VaultFile.user_id == auth.user.id,
     ).first()
     if not vf:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    result = verify_container_integrity(bytes(vf.encrypted_data))
+    try:
+        with _open_container(vf, sequential=True) as stream:
+            result = verify_container_integrity(stream)
+    except BlobNotFound:
+        result = {"integrity_ok": False, "error": "Container blob missing from storage"}
 
     if not result["integrity_ok"]:
         _audit(auth.db, user_id=auth.user.id, file_id=vf.id,
@@ -412,11 +1634,33 @@ def delete_vault_file(file_id: str, auth: AuthUser = Depends(get_current_user)):
     if not vf:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
 
+    usage.prepare(auth.db, auth.user.id)
     fname = vf.file_name
+    backend, locator = vf.storage_backend, vf.storage_locator
+    freed = vf.container_size or 0
+    if vf.payload_id is not None:
+        # Shared payload: drop one reference, free the blob with the last one
+        backend, locator, freed = INLINE_BACKEND, None, 0
+        payload = (
+            auth.db.query(VaultPayload)
+            .filter(VaultPayload.id == vf.payload_id)
+            .with_for_update()
+            .first()
+        )
+        if payload is not None:
+            payload.ref_count -= 1
+            if payload.ref_count <= 0:
+                backend, locator = payload.storage_backend, payload.storage_locator
+                freed = payload.container_size or 0
+                auth.db.delete(payload)
+
+    usage.release(auth.db, auth.user.id, plaintext=vf.size_bytes or 0, container=freed)
     _audit(auth.db, user_id=auth.user.id, file_id=vf.id, event_type="delete",
            detail=json.dumps({"filename": fname, "size_bytes": vf.size_bytes}))
     auth.db.delete(vf)
     auth.db.commit()
+    # Row first, blob second: a crash in between leaves an orphan blob, never a dangling row
+    _discard_blob(backend, locator)
     return {"success": True}
 
 
@@ -425,15 +1669,7 @@ def delete_vault_file(file_id: str, auth: AuthUser = Depends(get_current_user)):
 @router.get("/vault/storage/stats")
 def vault_storage_stats(auth: AuthUser = Depends(get_current_user)):
     """Per-user vault statistics including quota utilisation."""
-    rows = (
-        auth.db.query(
-            func.count(VaultFile.id).label("file_count"),
-            func.sum(VaultFile.size_bytes).label("total_plaintext"),
-            func.sum(VaultFile.container_size).label("total_container"),
-        )
-        .filter(VaultFile.user_id == auth.user.id)
-        .one()
-    )
+    counters = usage.current(auth.db, auth.user.id)
 
     malware_blocked = (
         auth.db.query(func.count(VaultAuditLog.id))
@@ -453,9 +1689,9 @@ def vault_storage_stats(auth: AuthUser = Depends(get_current_user)):
         .scalar()
     ) or 0
 
-    file_count       = rows.file_count or 0
-    total_plaintext  = rows.total_plaintext or 0
-    total_container  = rows.total_container or 0
+    file_count       = counters.file_count
+    total_plaintext  = counters.plaintext_bytes
+    total_container  = counters.container_bytes
     quota_used_pct   = round((total_plaintext / VAULT_QUOTA) * 100, 1) if VAULT_QUOTA else 0
 
     # Vault Health Score: starts at 100, deductions for issues
@@ -474,5 +1710,5 @@ def vault_storage_stats(auth: AuthUser = Depends(get_current_user)):
         "malware_blocked":     malware_blocked,
         "integrity_fails":     integrity_fails,
         "vault_health_score":  health,
-        "storage_backend":     "postgresql",
+        "storage_backend":     active_backend(),
     }
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+benchmarks/bench_ssce.py
+========================
+Micro-benchmarks for the Secure Container Engine (app/core/ssce.py).
+
+Measures, per file size and corpus:
+  build    iter_build_container() → sink        (compress + encrypt + HMAC)
+  parse    iter_parse_container() → discard     (verify + decrypt + decompress)
+  verify   verify_container_integrity()         (HMAC + structure, no decrypt)
+  hmac     HMAC-SHA256 over the container bytes (the floor for verify)
+plus the key path:
+  hkdf     user-key derivation, uncached (HKDF-SHA256 from the root)
+  keycache derive_user_key() served from the key cache
+
+Corpora:
+  text     pseudo-random words — compresses roughly 3:1
+  random   os.urandom — incompressible, exercises the store-raw path
+
+Each case reports throughput (MB/s over the median run), p50/p99 latency
+and the peak resident set size seen while it ran (sampled from
+/proc/self/statm; falls back to ru_maxrss elsewhere).  Sizes above
+--stream-above are streamed from a generator into a temp file, so a 1 GB
+case needs about one chunk of memory, not a gigabyte.
+
+Results are JSON.  Save one run as a baseline and compare later runs to it;
+any case whose throughput drops (or p99 rises) by more than --threshold
+is reported and the exit status is 1, so the script can gate CI.
+
+Usage:
+  python benchmarks/bench_ssce.py                           # default sizes, JSON to stdout
+  python benchmarks/bench_ssce.py --sizes 1K,1M,64M --output run.json
+  python benchmarks/bench_ssce.py --full --output baseline.json       # up to 1 GB
+  python benchmarks/bench_ssce.py --baseline baseline.json --threshold 0.10
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+# Make sure the backend app is on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import ssce  # noqa: E402
+from app.core.keycache import key_cache  # noqa: E402
+
+DEFAULT_SIZES = "1K,64K,1M,16M"
+FULL_SIZES    = "1K,64K,1M,16M,256M,1G"
+BLOCK         = 1024 * 1024
+USER_ID       = "00000000-0000-4000-8000-00000000beef"
+
+
+# ── Corpora ───────────────────────────────────────────────────────────────────
+
+def _text_block(seed: int = 1) -> bytes:
+    rng   = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+             for _ in range(4096)]
+    out, size = [], 0
+    while size < BLOCK:
+        line = " ".join(rng.choice(words) for _ in range(12)) + "\n"
+        out.append(line)
+        size += len(line)
+    return "".join(out).encode("ascii")[:BLOCK]
+
+
+_TEXT_BLOCK = _text_block()
+
+
+def _blocks(corpus: str, size: int) -> Iterator[bytes]:
+    """size bytes of the corpus in ≤ 1 MB blocks (random is fresh per block)."""
+    left = size
+    while left > 0:
+        n = min(BLOCK, left)
+        yield os.urandom(n) if corpus == "random" else _TEXT_BLOCK[:n]
+        left -= n
+
+
+def _corpus(corpus: str, size: int) -> bytes:
+    return b"".join(_blocks(corpus, size))
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+
+class _RssSampler:
+    """Peak resident set size while a case runs."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self._page    = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._proc    = os.path.exists("/proc/self/statm")
+        self.peak     = 0
+        self._stop    = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rss(self) -> int:
+        if self._proc:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self) -> "_RssSampler":
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def _measure(fn: Callable[[], None], *, min_time: float, min_runs: int, max_runs: int) -> list[float]:
+    fn()                                   # warm-up: imports, key cache, allocator
+    times: list[float] = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _result(name: str, op: str, corpus: str, size: int, times: list[float], peak_rss: int) -> dict:
+    times = sorted(times)
+    p50   = _percentile(times, 50)
+    return {
+        "name":        name,
+        "op":          op,
+        "corpus":      corpus,
+        "size":        size,
+        "runs":        len(times),
+        "mb_s":        round(size / p50 / 1e6, 2) if size and p50 else None,
+        "ops_s":       round(1 / p50, 1) if p50 else None,
+        "p50_ms":      round(p50 * 1e3, 4),
+        "p99_ms":      round(_percentile(times, 99) * 1e3, 4),
+        "peak_rss_mb": round(peak_rss / 1e6, 1),
+    }
+
+
+# ── Cases ─────────────────────────────────────────────────────────────────────
+
+def _container_cases(size: int, corpus: str, *, stream: bool, opts) -> list[dict]:
+    label   = _size_label(size)
+    results = []
+    runs    = {"min_time": opts.min_time, "min_runs": 1 if stream else 3,
+               "max_runs": 3 if stream else opts.max_runs}
+
+    if stream:
+        # Generator in, temp file out — constant memory at any size
+        spool = tempfile.TemporaryFile()
+
+        def build() -> None:
+            spool.seek(0)
+            spool.truncate()
+            ssce.write_container(_blocks(corpus, size), spool, filename="bench.bin",
+                                 content_type="application/octet-stream", user_id=USER_ID)
+
+        def container_source():
+            spool.seek(0)
+            return spool
+    else:
+        plaintext = _corpus(corpus, size)
+        holder: dict = {}
+
+        def build() -> None:
+            holder["c"], _ = ssce.build_container(plaintext, filename="bench.bin",
+                                                  content_type="application/octet-stream",
+                                                  user_id=USER_ID)
+
+        def container_source():
+            return holder["c"]
+
+    with _RssSampler() as rss:
+        times = _measure(build, **runs)
+    results.append(_result(f"build/{corpus}/{label}", "build", corpus, size, times, rss.peak))
+
+    def parse() -> None:
+        for _ in ssce.iter_parse_container(container_source()):
+            pass
+
+    with _RssSampler() as rss:
+        times = _measure(parse, **runs)
+    results.append(_result(f"parse/{corpus}/{label}", "parse", corpus, size, times, rss.peak))
+
+    def verify() -> None:
+        if not ssce.verify_container_integrity(container_source())["integrity_ok"]:
+            raise RuntimeError("benchmark container failed verification")
+
+    with _RssSampler() as rss:
+        times = _measure(verify, **runs)
+    results.append(_result(f"verify/{corpus}/{label}", "verify", corpus, size, times, rss.peak))
+
+    if not stream:
+        container = container_source()
+        key = ssce.root_key(ssce.current_key_version())
+
+        def mac() -> None:
+            hmac.new(key, container, hashlib.sha256).digest()
+
+        with _RssSampler() as rss:
+            times = _measure(mac, **runs)
+        results.append(_result(f"hmac/{corpus}/{label}", "hmac", corpus, len(container), times, rss.peak))
+    else:
+        spool.close()
+    return results
+
+
+def _key_cases(opts) -> list[dict]:
+    results = []
+    version = ssce.current_key_version()
+    runs    = {"min_time": opts.min_time, "min_runs": 100, "max_runs": 20000}
+    counter = iter(range(10 ** 9))
+
+    def hkdf() -> None:
+        ssce._hkdf_user_key(f"user-{next(counter)}", version)
+
+    with _RssSampler() as rss:
+        times = _measure(hkdf, **runs)
+    results.append(_result("hkdf/user-key", "hkdf", "-", 0, times, rss.peak))
+
+    def cached() -> None:
+        ssce.derive_user_key(USER_ID)
+
+    with _RssSampler() as rss:
+        times = _measure(cached, **runs)
+    results.append(_result("keycache/user-key", "keycache", "-", 0, times, rss.peak))
+    return results
+
+
+# ── Baseline comparison ───────────────────────────────────────────────────────
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Per-case deltas against a saved run; 'regressed' marks cases past threshold."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        b = base.get(r["name"])
+        if b is None:
+            continue
+        row = {"name": r["name"], "regressed": False}
+        if r.get("mb_s") and b.get("mb_s"):
+            row["mb_s"]   = [b["mb_s"], r["mb_s"]]
+            row["mb_s_x"] = round(r["mb_s"] / b["mb_s"], 3)
+            row["regressed"] |= row["mb_s_x"] < 1 - threshold
+        elif r.get("ops_s") and b.get("ops_s"):
+            row["ops_s"]   = [b["ops_s"], r["ops_s"]]
+            row["ops_s_x"] = round(r["ops_s"] / b["ops_s"], 3)
+            row["regressed"] |= row["ops_s_x"] < 1 - threshold
+        if b.get("p99_ms"):
+            row["p99_ms"]   = [b["p99_ms"], r["p99_ms"]]
+            row["p99_ms_x"] = round(r["p99_ms"] / b["p99_ms"], 3)
+            row["regressed"] |= row["p99_ms_x"] > 1 + threshold * 2   # p99 is noisier
+        rows.append(row)
+    return rows
+
+
+def _print_comparison(rows: list[dict], threshold: float) -> None:
+    print(f"\n{'case':<28} {'throughput':>22} {'x':>7} {'p99 ms':>22} {'x':>7}", file=sys.stderr)
+    for row in rows:
+        tput = row.get("mb_s") or row.get("ops_s") or ["-", "-"]
+        tx   = row.get("mb_s_x") or row.get("ops_s_x") or "-"
+        p99  = row.get("p99_ms") or ["-", "-"]
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['name']:<28} {str(tput[0]):>10} → {str(tput[1]):<9} {str(tx):>7} "
+              f"{str(p99[0]):>10} → {str(p99[1]):<9} {str(row.get('p99_ms_x', '-')):>7}{flag}",
+              file=sys.stderr)
+    bad = sum(r["regressed"] for r in rows)
+    print(f"\n{bad} regression(s) beyond {threshold:.0%}", file=sys.stderr)
+
+
+# ── Entry point ───────────────────────────────────────────────────────────────
+
+def _parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for suffix, mult in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * mult)
+    return int(text)
+
+
+def _size_label(size: int) -> str:
+    for suffix, mult in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if size >= mult and size % mult == 0:
+            return f"{size // mult}{suffix}"
+    return str(size)
+
+
+def _environment() -> dict:
+    import cryptography
+    import zstandard
+    return {
+        "timestamp":    datetime.utcnow().isoformat() + "Z",
+        "python":       platform.python_version(),
+        "platform":     platform.platform(),
+        "cpu_count":    os.cpu_count(),
+        "cryptography": cryptography.__version__,
+        "zstandard":    zstandard.__version__,
+        "frame_workers": ssce._frame_workers(),
+    }
+
+
+def run(opts) -> dict:
+    sizes   = [_parse_size(s) for s in (FULL_SIZES if opts.full else opts.sizes).split(",") if s.strip()]
+    corpora = [c.strip() for c in opts.corpora.split(",") if c.strip()]
+    results: list[dict] = []
+    for size in sizes:
+        for corpus in corpora:
+            print(f"  {corpus:<7} {_size_label(size):>5} …", file=sys.stderr)
+            results.extend(_container_cases(size, corpus, stream=size > opts.stream_above, opts=opts))
+    if not opts.no_keys:
+        results.extend(_key_cases(opts))
+    return {"environment": _environment(), "key_cache": key_cache.stats(), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SSCE container engine")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated plaintext sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--full", action="store_true",
+                        help=f"Use {FULL_SIZES}")
+    parser.add_argument("--corpora", default="text,random",
+                        help="Comma-separated corpora: text, random (default: both)")
+    parser.add_argument("--stream-above", type=_parse_size, default=_parse_size("64M"),
+                        help="Stream sizes above this through a temp file (default: 64M)")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="Seconds to spend per case, at least (default: 1.0)")
+    parser.add_argument("--max-runs", type=int, default=500,
+                        help="Cap on timed runs per in-memory case (default: 500)")
+    parser.add_argument("--no-keys", action="store_true",
+                        help="Skip the HKDF / key-cache cases")
+    parser.add_argument("--output",
+                        help="Write results JSON here instead of stdout")
+    parser.add_argument("--baseline",
+                        help="Compare against a saved results JSON; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed throughput drop before a case counts as regressed (default: 0.10)")
+    opts = parser.parse_args()
+
+    report = run(opts)
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = {
+            "baseline":  baseline.get("environment", {}).get("timestamp"),
+            "threshold": opts.threshold,
+            "cases":     compare(report, baseline, opts.threshold),
+        }
+        _print_comparison(report["comparison"]["cases"], opts.threshold)
+
+    text = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if opts.baseline and any(c["regressed"] for c in report["comparison"]["cases"]):
+        sys.exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+migrate_vault_blobs.py
+======================
+Moves inline .syncveil containers (encrypted_data with storage_backend =
+'postgresql') into a blob-store backend and leaves only the locator in the
+row.  Covers both legacy vault_files rows and deduplicated vault_payloads;
+files referencing a moved payload get their storage_backend updated too.
+
+When to run:
+  After deploying migration 005 and configuring the target backend
+  (VAULT_STORAGE_BACKEND plus VAULT_BLOB_DIR or VAULT_S3_* settings).
+  New uploads already go to the configured backend; this drains the rest.
+
+Safety:
+  - Dry-run mode by default — pass --commit to apply changes
+  - Each blob is written, read back and hash-checked before its row is
+    switched over; the inline copy is only NULLed in that same UPDATE
+  - Keyset-paginated by id and committed per batch, so it can be stopped
+    and re-run at any point (already-moved rows no longer match)
+  - Postgres does not give the space back until VACUUM (FULL) vault_files
+
+Usage:
+  DATABASE_URL=postgresql://... \
+  VAULT_STORAGE_BACKEND=filesystem VAULT_BLOB_DIR=/data/vault \
+      python migrate_vault_blobs.py [--commit] [--batch 50] [--backend filesystem]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+# Make sure the backend app is on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.blobstore import INLINE_BACKEND, get_blob_store
+
+
+def _verify(store, locator: str, expected_size: int) -> bool:
+    sha, size = hashlib.sha256(), 0
+    with store.open(locator) as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+            size += len(block)
+    return size == expected_size and sha.hexdigest() == locator
+
+
+def _migrate_table(session, store, table: str, *, backend: str, commit: bool,
+                   batch_size: int, stats: dict) -> None:
+    total = session.execute(text(
+        f"SELECT COUNT(*) FROM {table} "
+        "WHERE storage_backend = :inline AND encrypted_data IS NOT NULL"
+    ), {"inline": INLINE_BACKEND}).scalar() or 0
+    print(f"{table}: {total} inline container(s) to move to {backend!r}")
+    if total == 0:
+        return
+
+    last_id = None
+    while True:
+        # Ids only — blobs are fetched one at a time to keep memory flat
+        params = {"inline": INLINE_BACKEND, "limit": batch_size}
+        where  = "storage_backend = :inline AND encrypted_data IS NOT NULL"
+        if last_id is not None:
+            where += " AND id > :last_id"
+            params["last_id"] = last_id
+        ids = [r.id for r in session.execute(text(
+            f"SELECT id FROM {table} WHERE {where} ORDER BY id LIMIT :limit"
+        ), params).fetchall()]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        for row_id in ids:
+            row = session.execute(text(
+                f"SELECT encrypted_data FROM {table} WHERE id = :id AND storage_backend = :inline"
+            ), {"id": row_id, "inline": INLINE_BACKEND}).first()
+            if row is None or row.encrypted_data is None:
+                continue
+            data = bytes(row.encrypted_data)
+            print(f"  {table} {row_id}  {len(data)} bytes", end="  ")
+
+            if not commit:
+                print("DRY-RUN OK")
+                stats["ok"] += 1
+                continue
+
+            try:
+                locator = store.put(io.BytesIO(data))
+                if not _verify(store, locator, len(data)):
+                    print("VERIFY FAIL (read-back mismatch)")
+                    stats["err"] += 1
+                    continue
+                moved = {
+                    "backend": backend,
+                    "locator": locator,
+                    "size":    len(data),
+                    "id":      row_id,
+                    "inline":  INLINE_BACKEND,
+                }
+                if table == "vault_payloads":
+                    session.execute(text("""
+                        UPDATE vault_payloads SET
+                            storage_backend = :backend,
+                            storage_locator = :locator,
+                            container_size  = :size,
+                            encrypted_data  = NULL
+                        WHERE id = :id AND storage_backend = :inline
+                    """), moved)
+                    session.execute(text(
+                        "UPDATE vault_files SET storage_backend = :backend, updated_at = :now "
+                        "WHERE payload_id = :id"
+                    ), {"backend": backend, "now": datetime.utcnow(), "id": row_id})
+                else:
+                    session.execute(text("""
+                        UPDATE vault_files SET
+                            storage_backend = :backend,
+                            storage_locator = :locator,
+                            container_size  = :size,
+                            encrypted_data  = NULL,
+                            updated_at      = :now
+                        WHERE id = :id AND storage_backend = :inline
+                    """), {**moved, "now": datetime.utcnow()})
+                print(f"OK → {locator[:16]}…")
+                stats["ok"] += 1
+                stats["bytes"] += len(data)
+            except Exception as exc:
+                print(f"MOVE FAIL ({exc})")
+                session.rollback()
+                stats["err"] += 1
+
+        if commit:
+            session.commit()
+        elapsed = max(time.monotonic() - stats["started"], 1e-6)
+        print(f"    [checkpoint] {stats['ok']} rows, {stats['bytes'] / elapsed / 1e6:.1f} MB/s")
+
+
+def migrate(db_url: str, *, backend: str, commit: bool, batch_size: int) -> None:
+    if backend == INLINE_BACKEND:
+        print("ERROR: target backend must not be the inline postgresql backend", file=sys.stderr)
+        sys.exit(1)
+
+    store   = get_blob_store(backend)
+    engine  = create_engine(db_url, pool_pre_ping=True)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    stats = {"ok": 0, "err": 0, "bytes": 0, "started": time.monotonic()}
+    for table in ("vault_files", "vault_payloads"):
+        _migrate_table(session, store, table, backend=backend, commit=commit,
+                       batch_size=batch_size, stats=stats)
+
+    session.close()
+    print(f"\nDone. moved={stats['ok']}  errors={stats['err']}")
+    if not commit:
+        print("DRY RUN — no changes written. Pass --commit to apply.")
+    if stats["err"] > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline vault containers to a blob-store backend")
+    parser.add_argument("--commit", action="store_true",
+                        help="Actually write changes (default: dry-run)")
+    parser.add_argument("--batch",  type=int, default=50,
+                        help="Rows per keyset page / commit (default: 50)")
+    parser.add_argument("--backend", default=os.getenv("VAULT_STORAGE_BACKEND", "filesystem"),
+                        help="Target backend: filesystem or s3 (default: $VAULT_STORAGE_BACKEND)")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL", "")
+    if not db_url:
+        print("ERROR: DATABASE_URL not set", file=sys.stderr)
+        sys.exit(1)
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+
+    migrate(db_url, backend=args.backend, commit=args.commit, batch_size=args.batch)
@@ -0,0 +1,54 @@
+"""Pluggable vault blob storage
+
+Revision ID: 005_blob_storage
+Revises: 004_crypto_hardening
+Create Date: 2026-10-18
+
+Changes:
+  vault_files:
+    - ADD storage_locator VARCHAR(512) NULL
+      Content address (container SHA-256) of the blob in the filesystem or
+      S3 backend.  NULL for rows stored inline (storage_backend='postgresql').
+    - ALTER encrypted_data DROP NOT NULL
+      Rows moved out of Postgres by migrate_vault_blobs.py keep no inline copy.
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision      = "005_blob_storage"
+down_revision = "004_crypto_hardening"
+branch_labels = None
+depends_on    = None
+
+
+def _col(table: str, col: str) -> bool:
+    bind = op.get_bind()
+    return col in [c["name"] for c in inspect(bind).get_columns(table)]
+
+
+def upgrade() -> None:
+    if not _col("vault_files", "storage_locator"):
+        op.add_column("vault_files", sa.Column("storage_locator", sa.String(512), nullable=True))
+
+    op.alter_column(
+        "vault_files",
+        "encrypted_data",
+        existing_type=sa.LargeBinary(),
+        nullable=True,
+    )
+
+
+def downgrade() -> None:
+    # Only safe once every blob has been moved back inline — rows with a NULL
+    # encrypted_data would violate the restored constraint.
+    op.alter_column(
+        "vault_files",
+        "encrypted_data",
+        existing_type=sa.LargeBinary(),
+        nullable=False,
+    )
+    if _col("vault_files", "storage_locator"):
+        op.drop_column("vault_files", "storage_locator")
@@ -0,0 +1,71 @@
+"""Per-user content-addressed deduplication of vault payloads
+
+Revision ID: 006_vault_dedup
+Revises: 005_blob_storage
+Create Date: 2026-10-18
+
+Creates:
+  vault_payloads — one reference-counted container per (user_id, sha256)
+
+Changes:
+  vault_files:
+    - ADD payload_id UUID NULL REFERENCES vault_payloads(id)
+      Rows uploaded before this migration keep payload_id NULL and continue
+      to own their blob directly.
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import UUID
+
+revision      = "006_vault_dedup"
+down_revision = "005_blob_storage"
+branch_labels = None
+depends_on    = None
+
+
+def _col(table: str, col: str) -> bool:
+    bind = op.get_bind()
+    return col in [c["name"] for c in inspect(bind).get_columns(table)]
+
+
+def _tbl(table: str) -> bool:
+    return table in inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _tbl("vault_payloads"):
+        op.create_table(
+            "vault_payloads",
+            sa.Column("id",                 UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+            sa.Column("user_id",            UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("sha256",             sa.String(64),  nullable=False),
+            sa.Column("ref_count",          sa.Integer(),   nullable=False, server_default="1"),
+            sa.Column("container_size",     sa.BigInteger(), nullable=False),
+            sa.Column("hmac",               sa.String(64),  nullable=False),
+            sa.Column("encrypted_file_key", sa.LargeBinary(), nullable=False),
+            sa.Column("compression_type",   sa.String(20),  nullable=False, server_default="zstd"),
+            sa.Column("encryption_version", sa.Integer(),   nullable=False, server_default="2"),
+            sa.Column("key_version",        sa.Integer(),   nullable=False, server_default="1"),
+            sa.Column("storage_backend",    sa.String(50),  nullable=False, server_default="postgresql"),
+            sa.Column("storage_locator",    sa.String(512), nullable=True),
+            sa.Column("encrypted_data",     sa.LargeBinary(), nullable=True),
+            sa.Column("created_at",         sa.DateTime(),  nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index("uq_vault_payload_user_sha256", "vault_payloads", ["user_id", "sha256"], unique=True)
+
+    if not _col("vault_files", "payload_id"):
+        op.add_column("vault_files", sa.Column(
+            "payload_id", UUID(as_uuid=True), sa.ForeignKey("vault_payloads.id"), nullable=True))
+        op.create_index("ix_vault_files_payload_id", "vault_files", ["payload_id"])
+
+
+def downgrade() -> None:
+    if _col("vault_files", "payload_id"):
+        op.drop_index("ix_vault_files_payload_id", table_name="vault_files")
+        op.drop_column("vault_files", "payload_id")
+    if _tbl("vault_payloads"):
+        op.drop_index("uq_vault_payload_user_sha256", table_name="vault_payloads")
+        op.drop_table("vault_payloads")
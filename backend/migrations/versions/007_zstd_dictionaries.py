@@ -0,0 +1,46 @@
+"""Trained zstd dictionaries for small vault payloads
+
+Revision ID: 007_zstd_dictionaries
+Revises: 006_vault_dedup
+Create Date: 2026-10-18
+
+Creates:
+  vault_zstd_dictionaries — versioned, AES-GCM encrypted zstd dictionaries,
+  keyed by the dictionary's own dict_id (recorded in container metadata)
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision      = "007_zstd_dictionaries"
+down_revision = "006_vault_dedup"
+branch_labels = None
+depends_on    = None
+
+
+def _tbl(table: str) -> bool:
+    return table in inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _tbl("vault_zstd_dictionaries"):
+        op.create_table(
+            "vault_zstd_dictionaries",
+            sa.Column("dict_id",        sa.BigInteger(),  primary_key=True, autoincrement=False),
+            sa.Column("nonce",          sa.LargeBinary(), nullable=False),
+            sa.Column("encrypted_dict", sa.LargeBinary(), nullable=False),
+            sa.Column("dict_size",      sa.Integer(),     nullable=False),
+            sa.Column("sample_count",   sa.Integer(),     nullable=False),
+            sa.Column("sample_bytes",   sa.BigInteger(),  nullable=False),
+            sa.Column("ratio_gain",     sa.String(20),    nullable=True),
+            sa.Column("created_at",     sa.DateTime(),    nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index("ix_vault_zstd_dictionaries_created_at", "vault_zstd_dictionaries", ["created_at"])
+
+
+def downgrade() -> None:
+    if _tbl("vault_zstd_dictionaries"):
+        op.drop_index("ix_vault_zstd_dictionaries_created_at", table_name="vault_zstd_dictionaries")
+        op.drop_table("vault_zstd_dictionaries")
@@ -0,0 +1,48 @@
+"""Background integrity scrub results on container rows
+
+Revision ID: 008_vault_scrub
+Revises: 007_zstd_dictionaries
+Create Date: 2026-10-18
+
+Changes:
+  vault_payloads, vault_files:
+    - ADD last_verified_at  TIMESTAMP NULL     (last scrub, or the claim of one in progress)
+    - ADD last_verify_ok    BOOLEAN NULL       (NULL: never checked / in progress)
+    - ADD last_verify_error VARCHAR(500) NULL
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision      = "008_vault_scrub"
+down_revision = "007_zstd_dictionaries"
+branch_labels = None
+depends_on    = None
+
+_TABLES  = ("vault_payloads", "vault_files")
+_COLUMNS = (
+    ("last_verified_at",  sa.DateTime()),
+    ("last_verify_ok",    sa.Boolean()),
+    ("last_verify_error", sa.String(500)),
+)
+
+
+def _col(table: str, col: str) -> bool:
+    bind = op.get_bind()
+    return col in [c["name"] for c in inspect(bind).get_columns(table)]
+
+
+def upgrade() -> None:
+    for table in _TABLES:
+        for name, type_ in _COLUMNS:
+            if not _col(table, name):
+                op.add_column(table, sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    for table in _TABLES:
+        for name, _ in reversed(_COLUMNS):
+            if _col(table, name):
+                op.drop_column(table, name)
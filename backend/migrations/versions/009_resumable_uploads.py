@@ -0,0 +1,68 @@
+"""Resumable upload sessions and staged chunks
+
+Revision ID: 009_resumable_uploads
+Revises: 008_vault_scrub
+Create Date: 2026-10-18
+
+Creates:
+  vault_upload_sessions — one row per unfinished resumable upload
+  vault_upload_chunks   — encrypted plaintext chunks staged for a session,
+                          inline or in the blob store like containers
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import UUID
+
+revision      = "009_resumable_uploads"
+down_revision = "008_vault_scrub"
+branch_labels = None
+depends_on    = None
+
+
+def _tbl(table: str) -> bool:
+    return table in inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _tbl("vault_upload_sessions"):
+        op.create_table(
+            "vault_upload_sessions",
+            sa.Column("id",           UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+            sa.Column("user_id",      UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("file_name",    sa.String(500),  nullable=False),
+            sa.Column("content_type", sa.String(200),  nullable=False, server_default="application/octet-stream"),
+            sa.Column("size_bytes",   sa.BigInteger(), nullable=False),
+            sa.Column("chunk_size",   sa.Integer(),    nullable=False),
+            sa.Column("key_version",  sa.Integer(),    nullable=False),
+            sa.Column("created_at",   sa.DateTime(),   nullable=False, server_default=sa.func.now()),
+            sa.Column("expires_at",   sa.DateTime(),   nullable=False),
+            sa.Column("finalizing_at", sa.DateTime(),  nullable=True),
+        )
+        op.create_index("ix_vault_upload_sessions_user_id",    "vault_upload_sessions", ["user_id"])
+        op.create_index("ix_vault_upload_sessions_expires_at", "vault_upload_sessions", ["expires_at"])
+
+    if not _tbl("vault_upload_chunks"):
+        op.create_table(
+            "vault_upload_chunks",
+            sa.Column("upload_id",       UUID(as_uuid=True),
+                      sa.ForeignKey("vault_upload_sessions.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("chunk_index",     sa.Integer(),     primary_key=True),
+            sa.Column("size_bytes",      sa.Integer(),     nullable=False),
+            sa.Column("sha256",          sa.String(64),    nullable=False),
+            sa.Column("storage_backend", sa.String(50),    nullable=False, server_default="postgresql"),
+            sa.Column("storage_locator", sa.String(512),   nullable=True),
+            sa.Column("encrypted_data",  sa.LargeBinary(), nullable=True),
+            sa.Column("created_at",      sa.DateTime(),    nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    if _tbl("vault_upload_chunks"):
+        op.drop_table("vault_upload_chunks")
+    if _tbl("vault_upload_sessions"):
+        op.drop_index("ix_vault_upload_sessions_expires_at", table_name="vault_upload_sessions")
+        op.drop_index("ix_vault_upload_sessions_user_id", table_name="vault_upload_sessions")
+        op.drop_table("vault_upload_sessions")
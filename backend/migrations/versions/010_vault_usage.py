@@ -0,0 +1,60 @@
+"""Per-user vault usage counters
+
+Revision ID: 010_vault_usage
+Revises: 009_resumable_uploads
+Create Date: 2026-10-18
+
+Creates:
+  vault_usage — file count, plaintext bytes and container bytes per user,
+  backfilled here from vault_files / vault_payloads.  Users without a row
+  get one on their next vault request.
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import UUID
+
+revision      = "010_vault_usage"
+down_revision = "009_resumable_uploads"
+branch_labels = None
+depends_on    = None
+
+_BACKFILL = """
+INSERT INTO vault_usage (user_id, file_count, plaintext_bytes, container_bytes, updated_at, reconciled_at)
+SELECT u.id,
+       (SELECT COUNT(*) FROM vault_files f WHERE f.user_id = u.id),
+       (SELECT COALESCE(SUM(f.size_bytes), 0) FROM vault_files f WHERE f.user_id = u.id),
+       (SELECT COALESCE(SUM(f.container_size), 0) FROM vault_files f
+         WHERE f.user_id = u.id AND f.payload_id IS NULL)
+     + (SELECT COALESCE(SUM(p.container_size), 0) FROM vault_payloads p WHERE p.user_id = u.id),
+       NOW(), NOW()
+FROM users u
+WHERE EXISTS (SELECT 1 FROM vault_files f WHERE f.user_id = u.id)
+ON CONFLICT (user_id) DO NOTHING
+"""
+
+
+def _tbl(table: str) -> bool:
+    return table in inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _tbl("vault_usage"):
+        op.create_table(
+            "vault_usage",
+            sa.Column("user_id",         UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                      primary_key=True),
+            sa.Column("file_count",      sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("plaintext_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("container_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("updated_at",      sa.DateTime(),   nullable=False, server_default=sa.func.now()),
+            sa.Column("reconciled_at",   sa.DateTime(),   nullable=True),
+        )
+    op.execute(_BACKFILL)
+
+
+def downgrade() -> None:
+    if _tbl("vault_usage"):
+        op.drop_table("vault_usage")
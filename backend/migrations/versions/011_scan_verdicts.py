@@ -0,0 +1,42 @@
+"""Shared ClamAV verdict cache
+
+Revision ID: 011_scan_verdicts
+Revises: 010_vault_usage
+Create Date: 2026-10-18
+
+Creates:
+  vault_scan_verdicts — clean / threat per (plaintext sha256, ClamAV
+  signature version).  Starts empty; entries of superseded signature
+  versions are purged by the app.
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision      = "011_scan_verdicts"
+down_revision = "010_vault_usage"
+branch_labels = None
+depends_on    = None
+
+
+def _tbl(table: str) -> bool:
+    return table in inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _tbl("vault_scan_verdicts"):
+        op.create_table(
+            "vault_scan_verdicts",
+            sa.Column("sha256",            sa.String(64),  primary_key=True),
+            sa.Column("signature_version", sa.String(64),  primary_key=True),
+            sa.Column("clean",             sa.Boolean(),   nullable=False),
+            sa.Column("threat",            sa.String(255), nullable=True),
+            sa.Column("scanned_at",        sa.DateTime(),  nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    if _tbl("vault_scan_verdicts"):
+        op.drop_table("vault_scan_verdicts")
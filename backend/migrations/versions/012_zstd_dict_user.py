@@ -0,0 +1,53 @@
+"""Per-user zstd dictionaries
+
+Revision ID: 012_zstd_dict_user
+Revises: 011_scan_verdicts
+Create Date: 2026-10-18
+
+Changes:
+  vault_zstd_dictionaries:
+    - ADD user_id UUID NULL → users.id ON DELETE CASCADE
+    - ADD INDEX idx_zstd_dict_user_created (user_id, created_at)
+
+Existing rows keep user_id NULL: they were trained across users, still
+decode the containers that reference them, and are never picked for new
+uploads again.
+
+Migration is idempotent — safe to re-run.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import UUID
+
+revision      = "012_zstd_dict_user"
+down_revision = "011_scan_verdicts"
+branch_labels = None
+depends_on    = None
+
+_TABLE = "vault_zstd_dictionaries"
+
+
+def _col(table: str, col: str) -> bool:
+    bind = op.get_bind()
+    return col in [c["name"] for c in inspect(bind).get_columns(table)]
+
+
+def _idx(table: str, name: str) -> bool:
+    bind = op.get_bind()
+    return name in [i["name"] for i in inspect(bind).get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _col(_TABLE, "user_id"):
+        op.add_column(_TABLE, sa.Column("user_id", UUID(as_uuid=True),
+                                        sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True))
+    if not _idx(_TABLE, "idx_zstd_dict_user_created"):
+        op.create_index("idx_zstd_dict_user_created", _TABLE, ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    if _idx(_TABLE, "idx_zstd_dict_user_created"):
+        op.drop_index("idx_zstd_dict_user_created", table_name=_TABLE)
+    if _col(_TABLE, "user_id"):
+        op.drop_column(_TABLE, "user_id")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+reconcile_vault_usage.py
+========================
+Recomputes every user's vault_usage counters (file count, plaintext bytes,
+container bytes) from vault_files / vault_payloads and reports the drift.
+
+Uploads and deletes keep the counters up to date in the same transaction as
+the file rows, so drift should stay at zero; this is the periodic check
+(and the repair after manual SQL against the vault tables).
+
+Safety:
+  - Dry-run mode by default — pass --commit to write the corrected values.
+  - Each user is reconciled in its own transaction with the counter row
+    locked (usage.reconcile), so uploads of that user wait a moment instead
+    of racing the recount.
+
+Usage:
+  DATABASE_URL=postgresql://... python reconcile_vault_usage.py [--commit]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+# Make sure the backend app is on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, select, union
+from sqlalchemy.orm import sessionmaker
+
+from app.core import usage
+from app.db.models import VaultFile, VaultUsage
+
+
+def reconcile(db_url: str, *, commit: bool) -> None:
+    engine  = create_engine(db_url, pool_pre_ping=True)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as session:
+        user_ids = session.execute(
+            union(select(VaultFile.user_id), select(VaultUsage.user_id))
+        ).scalars().all()
+
+    drifted = 0
+    for user_id in user_ids:
+        session = Session()
+        try:
+            drift = usage.reconcile(session, user_id)
+            if any(drift.values()):
+                drifted += 1
+                print(f"  {user_id}: " + "  ".join(f"{k}={v:+d}" for k, v in drift.items()))
+            if commit:
+                session.commit()
+            else:
+                session.rollback()
+        except Exception as exc:
+            session.rollback()
+            print(f"  {user_id}: ERROR {exc}", file=sys.stderr)
+        finally:
+            session.close()
+
+    print(f"\nDone. users={len(user_ids)}  drifted={drifted}")
+    if not commit:
+        print("DRY RUN — no changes written. Pass --commit to apply.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute per-user vault usage counters")
+    parser.add_argument("--commit", action="store_true",
+                        help="Actually write changes (default: dry-run)")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL", "")
+    if not db_url:
+        print("ERROR: DATABASE_URL not set", file=sys.stderr)
+        sys.exit(1)
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+
+    reconcile(db_url, commit=args.commit)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+rotate_vault_keys.py
+====================
+Moves every vault container (and the other secrets derived from the SSCE
+root key) onto the current VAULT_KEY_VERSION without decrypting payloads.
+
+Each file's random file key is unwrapped with the old user key and wrapped
+again with the new one; the container header and HMAC are rewritten and the
+frames are copied byte for byte (ssce.rewrap_container).  Cost is one
+sequential read and write of each container — no zstd, no AES over the
+payload — so throughput is bounded by storage I/O.
+
+Covered:
+  - vault_payloads (deduplicated containers) — referencing vault_files rows
+    get the new hmac / encrypted_file_key / key_version / container_size
+  - legacy vault_files rows that own their container (payload_id IS NULL)
+  - two_factor_configs TOTP secrets (active and pending)
+  - vault_zstd_dictionaries
+
+How to rotate (see app.core.keyring for the key sources):
+  1. Add the new version to the key ring and make it current, keeping the
+     old one — on the app and for this script.  With VAULT_KEY_FILE the app
+     picks this up without a restart; otherwise set
+     VAULT_PREVIOUS_ENCRYPTION_KEY to the current key, VAULT_ENCRYPTION_KEY to
+     the new one and bump VAULT_KEY_VERSION.  The app then writes new
+     uploads under the new version and still reads the old one.
+  2. Run this script until it reports nothing left to rotate.
+  3. Remove the old version from the ring.
+
+Safety:
+  - Dry-run mode by default — pass --commit to apply changes.  A dry run
+    still re-wraps every container into a scratch buffer, so it proves that
+    the old key opens them all.
+  - The old HMAC is verified during the re-wrap; failures are reported and
+    the row is left alone.
+  - Each row is updated on its own, guarded by its old key_version (and old
+    locator), so concurrent deletes or re-uploads are never overwritten.
+    Re-running is safe at any point: rotated rows no longer match.
+  - Blob backends get the new container under a new locator; the old blob
+    is deleted only after the row update committed (--keep-old-blobs skips
+    that, e.g. while a backup still points at them).
+
+Usage:
+  DATABASE_URL=postgresql://... VAULT_KEY_VERSION=2 \
+  VAULT_ENCRYPTION_KEY=<new> VAULT_PREVIOUS_ENCRYPTION_KEY=<old> \
+      python rotate_vault_keys.py [--commit] [--batch 200] [--workers 8]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Make sure the backend app is on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.blobstore import INLINE_BACKEND, get_blob_store
+from app.core.ssce import ContainerView, configured_key_versions, current_key_version, rewrap_container
+
+SPOOL_BYTES = 8 * 1024 * 1024
+
+# table → rows that own a container
+_CONTAINER_TABLES = {
+    "vault_payloads": "key_version <> :current",
+    "vault_files":    "key_version <> :current AND payload_id IS NULL",
+}
+
+
+class _Stats:
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.ok      = 0
+        self.err     = 0
+        self.skipped = 0
+        self.bytes   = 0
+        self.started = time.monotonic()
+
+    def add(self, outcome: str, size: int = 0) -> None:
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.bytes += size
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{self.ok} rows, {self.bytes / 1e6:.1f} MB, "
+                f"{self.ok / elapsed:.1f} rows/s, {self.bytes / elapsed / 1e6:.1f} MB/s")
+
+
+def _locator_in_use(session, locator: str) -> bool:
+    return session.execute(text(
+        "SELECT 1 FROM vault_payloads WHERE storage_locator = :loc "
+        "UNION ALL SELECT 1 FROM vault_files WHERE storage_locator = :loc LIMIT 1"
+    ), {"loc": locator}).first() is not None
+
+
+def _rotate_row(Session, table: str, row_id, *, target: int, commit: bool,
+                keep_old_blobs: bool) -> tuple[str, int, str]:
+    """Re-wrap one container.  Returns (outcome, container bytes, message)."""
+    session = Session()
+    sink    = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    new_locator = None
+    try:
+        row = session.execute(text(
+            f"SELECT key_version, storage_backend, storage_locator, encrypted_data "
+            f"FROM {table} WHERE id = :id"
+        ), {"id": row_id}).first()
+        if row is None or row.key_version == target:
+            return "skipped", 0, "gone or already rotated"
+
+        inline = row.storage_backend == INLINE_BACKEND
+        store  = None if inline else get_blob_store(row.storage_backend)
+        if inline:
+            if row.encrypted_data is None:
+                return "skipped", 0, "no container"
+            size, _, digest = rewrap_container(bytes(row.encrypted_data), sink, key_version=target)
+        else:
+            with store.open_sequential(row.storage_locator) as source:
+                size, _, digest = rewrap_container(source, sink, key_version=target)
+        with ContainerView(sink) as view:
+            enc_key = view.enc_file_key
+
+        if not commit:
+            return "ok", size, f"v{row.key_version} → v{target} DRY-RUN OK"
+
+        sink.seek(0)
+        if inline:
+            new_data = sink.read()
+        else:
+            new_locator = store.put(sink)
+        values = {
+            "id":      row_id,
+            "old":     row.key_version,
+            "old_loc": row.storage_locator,
+            "version": target,
+            "hmac":    digest.hex(),
+            "key":     enc_key,
+            "size":    size,
+            "now":     datetime.utcnow(),
+        }
+        guard = "id = :id AND key_version = :old"
+        if inline:
+            sets  = "encrypted_data = :data"
+            values["data"] = new_data
+        else:
+            sets  = "storage_locator = :loc"
+            guard += " AND storage_locator = :old_loc"
+            values["loc"] = new_locator
+        sets += (", hmac = :hmac, encrypted_file_key = :key, "
+                 "key_version = :version, container_size = :size")
+        if table == "vault_files":
+            sets += ", updated_at = :now"
+
+        updated = session.execute(text(f"UPDATE {table} SET {sets} WHERE {guard}"), values).rowcount
+        if not updated:
+            session.rollback()
+            if new_locator is not None:
+                store.delete(new_locator)
+            return "skipped", 0, "changed concurrently"
+        if table == "vault_payloads":
+            session.execute(text("""
+                UPDATE vault_files SET
+                    hmac               = :hmac,
+                    encrypted_file_key = :key,
+                    key_version        = :version,
+                    container_size     = :size,
+                    updated_at         = :now
+                WHERE payload_id = :id
+            """), values)
+        session.commit()
+
+        committed, new_locator = new_locator, None     # the row owns it now
+        if committed is not None and not keep_old_blobs and row.storage_locator \
+                and not _locator_in_use(session, row.storage_locator):
+            store.delete(row.storage_locator)
+        return "ok", size, f"v{row.key_version} → v{target} OK"
+    except Exception as exc:
+        session.rollback()
+        if new_locator is not None:
+            try:
+                store.delete(new_locator)
+            except Exception:
+                pass
+        return "err", 0, f"FAIL ({exc})"
+    finally:
+        sink.close()
+        session.close()
+
+
+def _rotate_table(Session, table: str, *, target: int, commit: bool, batch_size: int, workers: int,
+                  keep_old_blobs: bool, stats: _Stats) -> None:
+    where  = _CONTAINER_TABLES[table]
+    params = {"current": target}
+    session = Session()
+    try:
+        versions = {r.key_version: r.n for r in session.execute(text(
+            f"SELECT key_version, COUNT(*) AS n FROM {table} WHERE {where} GROUP BY key_version"
+        ), params)}
+    finally:
+        session.close()
+    total = sum(versions.values())
+    print(f"{table}: {total} container(s) to rotate to v{target} {dict(sorted(versions.items()))}")
+    if total == 0:
+        return
+
+    unreadable = sorted(set(versions) - set(configured_key_versions()))
+    if unreadable:
+        print(f"  ERROR: no root key configured for version(s) {unreadable} — "
+              "set VAULT_PREVIOUS_ENCRYPTION_KEY", file=sys.stderr)
+        stats.err += sum(versions[v] for v in unreadable)
+        return
+
+    last_id = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rotate") as pool:
+        while True:
+            page = dict(params, limit=batch_size)
+            cond = where
+            if last_id is not None:
+                cond += " AND id > :last_id"
+                page["last_id"] = last_id
+            session = Session()
+            try:
+                ids = [r.id for r in session.execute(text(
+                    f"SELECT id FROM {table} WHERE {cond} ORDER BY id LIMIT :limit"
+                ), page).fetchall()]
+            finally:
+                session.close()
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            jobs = [pool.submit(_rotate_row, Session, table, row_id, target=target,
+                                commit=commit, keep_old_blobs=keep_old_blobs) for row_id in ids]
+            for row_id, job in zip(ids, jobs):
+                outcome, size, message = job.result()
+                stats.add(outcome, size)
+                if outcome != "ok":
+                    print(f"  {table} {row_id}  {message}")
+            print(f"    [checkpoint] {stats.line()}")
+
+
+def _rotate_secrets(Session, *, commit: bool, stats: _Stats) -> None:
+    """TOTP secrets and zstd dictionaries: few, small rows — done inline."""
+    from app.core import zstd_dicts
+    from app.core.twofa_service import rewrap_totp_secret
+
+    session = Session()
+    try:
+        totp = 0
+        for row in session.execute(text(
+            "SELECT id, user_id, totp_secret, totp_secret_pending FROM two_factor_configs"
+        )).fetchall():
+            try:
+                user_id = str(uuid.UUID(str(row.user_id)))      # canonical form the keys were derived from
+                updates = {}
+                for column in ("totp_secret", "totp_secret_pending"):
+                    stored = getattr(row, column)
+                    fresh  = rewrap_totp_secret(user_id, stored) if stored else None
+                    if fresh is not None:
+                        updates[column] = fresh
+            except Exception as exc:
+                print(f"  two_factor_configs {row.id}  FAIL ({exc or type(exc).__name__})")
+                stats.err += 1
+                continue
+            if updates and commit:
+                sets = ", ".join(f"{c} = :{c}" for c in updates)
+                session.execute(text(f"UPDATE two_factor_configs SET {sets} WHERE id = :id"),
+                                {**updates, "id": row.id})
+            totp += bool(updates)
+
+        dicts = 0
+        for row in session.execute(text(
+            "SELECT dict_id, nonce, encrypted_dict FROM vault_zstd_dictionaries"
+        )).fetchall():
+            try:
+                resealed = zstd_dicts.reseal(row.dict_id, bytes(row.nonce), bytes(row.encrypted_dict))
+            except Exception as exc:
+                print(f"  vault_zstd_dictionaries {row.dict_id}  FAIL ({exc or type(exc).__name__})")
+                stats.err += 1
+                continue
+            if resealed is not None and commit:
+                session.execute(text(
+                    "UPDATE vault_zstd_dictionaries SET nonce = :nonce, encrypted_dict = :sealed "
+                    "WHERE dict_id = :id"
+                ), {"nonce": resealed[0], "sealed": resealed[1], "id": row.dict_id})
+            dicts += resealed is not None
+
+        if commit:
+            session.commit()
+        print(f"two_factor_configs: {totp} re-encrypted   vault_zstd_dictionaries: {dicts} re-sealed")
+    finally:
+        session.close()
+
+
+def rotate(db_url: str, *, commit: bool, batch_size: int, workers: int, keep_old_blobs: bool) -> None:
+    engine  = create_engine(db_url, pool_pre_ping=True, pool_size=workers + 1, max_overflow=2)
+    Session = sessionmaker(bind=engine)
+
+    target = current_key_version()        # pinned for the run, even if the key file changes
+    print(f"Current key version: v{target}  readable: "
+          + ", ".join(f"v{v}" for v in configured_key_versions()))
+    stats = _Stats()
+    for table in _CONTAINER_TABLES:
+        _rotate_table(Session, table, target=target, commit=commit, batch_size=batch_size, workers=workers,
+                      keep_old_blobs=keep_old_blobs, stats=stats)
+    _rotate_secrets(Session, commit=commit, stats=stats)
+
+    print(f"\nDone. rotated={stats.ok}  skipped={stats.skipped}  errors={stats.err}  ({stats.line()})")
+    if not commit:
+        print("DRY RUN — no changes written. Pass --commit to apply.")
+    if stats.err > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-wrap vault file keys under the current VAULT_KEY_VERSION")
+    parser.add_argument("--commit", action="store_true",
+                        help="Actually write changes (default: dry-run)")
+    parser.add_argument("--batch",  type=int, default=200,
+                        help="Rows per keyset page (default: 200)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Containers re-wrapped in parallel (default: 8)")
+    parser.add_argument("--keep-old-blobs", action="store_true",
+                        help="Leave superseded blobs in the store (default: delete after commit)")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL", "")
+    if not db_url:
+        print("ERROR: DATABASE_URL not set", file=sys.stderr)
+        sys.exit(1)
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+
+    rotate(db_url, commit=args.commit, batch_size=max(1, args.batch),
+           workers=max(1, args.workers), keep_old_blobs=args.keep_old_blobs)
@@ -0,0 +1,89 @@
+"""
+Shared fixtures: the FastAPI app on a throwaway SQLite database.
+
+Run from backend/:  python -m pytest
+"""
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("VAULT_STORAGE_DIR", tempfile.mkdtemp(prefix="vault-test-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+import app.db.session as db_session  # noqa: E402
+from app.core.jwt import create_access_token  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def SessionLocal(db_url, monkeypatch):
+    """Session factory over a fresh database, also used by get_db and the workers."""
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(db_session, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def AsyncSessionLocal(db_url, SessionLocal, monkeypatch):
+    """asyncio session factory over the same database, used by get_async_db."""
+    pytest.importorskip("aiosqlite")
+    # NullPool: no connection outlives the TestClient's event loop
+    engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(db_session, "AsyncSessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def client(SessionLocal):
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(SessionLocal):
+    """Factory: a user with an active session -> (user, auth headers)."""
+    def _make():
+        db = SessionLocal()
+        user = models.User(email=f"{uuid.uuid4().hex}@example.com", password_hash="x", email_verified=True)
+        db.add(user)
+        db.flush()
+        session = models.Session(
+            user_id=user.id, refresh_token_hash=uuid.uuid4().hex,
+            expires_at=datetime.utcnow() + timedelta(days=1),
+        )
+        db.add(session)
+        db.commit()
+        db.close()
+        token = create_access_token(str(user.id), str(session.id), {"email": user.email})
+        return user, {"Authorization": f"Bearer {token}"}
+    return _make
+
+
+@pytest.fixture
+def upload(client):
+    """POST one file to /api/vault/upload; returns the file JSON."""
+    def _upload(headers, data: bytes, name: str = "file.bin", content_type: str = "application/octet-stream"):
+        response = client.post("/api/vault/upload", files={"file": (name, data, content_type)}, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["file"]
+    return _upload
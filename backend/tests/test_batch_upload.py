@@ -0,0 +1,55 @@
+import os
+import threading
+
+from app import vault_routes
+from app.db import models
+
+
+def _post_batch(client, headers, files):
+    return client.post("/api/vault/upload/batch", headers=headers,
+                       files=[("files", (name, data, "application/octet-stream")) for name, data in files])
+
+
+def test_batch_upload_dedups_and_round_trips(client, make_user, SessionLocal):
+    _, headers = make_user()
+    a, b = os.urandom(200_000), b"small text file " * 100
+    response = _post_batch(client, headers, [("a.bin", a), ("b.txt", b), ("a-copy.bin", a)])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["uploaded"] == 3
+    assert [f["deduplicated"] for f in body["files"]] == [False, False, True]
+
+    for entry, data in zip(body["files"], (a, b, a)):
+        download = client.get(f"/api/vault/files/{entry['file']['id']}/download", headers=headers)
+        assert download.status_code == 200
+        assert download.content == data
+
+    db = SessionLocal()
+    assert db.query(models.VaultPayload).count() == 2
+    db.close()
+
+
+def test_build_starts_before_the_batch_is_metered(client, make_user, monkeypatch):
+    # The last file's metering waits for some file's stage 2 to start: with
+    # builds queued behind all of the metering, this batch would time out.
+    stage2_started = threading.Event()
+    waited = []
+    meter, stage2 = vault_routes._meter_upload, vault_routes._scan_and_build_upload
+
+    def _meter(item, limit):
+        if item.filename == "last.bin":
+            waited.append(stage2_started.wait(10))
+        return meter(item, limit)
+
+    def _stage2(*args):
+        stage2_started.set()
+        return stage2(*args)
+
+    monkeypatch.setattr(vault_routes, "_meter_upload", _meter)
+    monkeypatch.setattr(vault_routes, "_scan_and_build_upload", _stage2)
+    _, headers = make_user()
+    files = [(f"f{i}.bin", os.urandom(50_000)) for i in range(4)] + [("last.bin", os.urandom(50_000))]
+    response = _post_batch(client, headers, files)
+    assert response.status_code == 200, response.text
+    assert response.json()["uploaded"] == 5
+    assert waited == [True]
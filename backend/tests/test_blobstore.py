@@ -0,0 +1,98 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app.core import blobstore
+from app.core.blobstore import BlobNotFound, FilesystemBlobStore
+from app.core.config import get_settings
+
+
+def _round_trip(store):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    locator = store.put(io.BytesIO(data))
+    assert locator == hashlib.sha256(data).hexdigest()
+    assert store.exists(locator)
+
+    with store.open(locator) as f:
+        assert f.read() == data
+        f.seek(1024 * 1024 - 5)
+        assert f.read(10) == data[1024 * 1024 - 5:1024 * 1024 + 5]
+        f.seek(-3, io.SEEK_END)
+        assert f.read() == data[-3:]
+    stream = store.open_sequential(locator)
+    assert stream.read() == data
+    stream.close()
+
+    # Content-addressed: storing the same bytes again is the same blob
+    assert store.put(io.BytesIO(data)) == locator
+
+    store.delete(locator)
+    assert not store.exists(locator)
+    with pytest.raises(BlobNotFound):
+        store.open(locator)
+    store.delete(locator)  # missing is not an error
+
+
+def test_filesystem_round_trip(tmp_path):
+    store = FilesystemBlobStore(str(tmp_path))
+    _round_trip(store)
+    assert not list((tmp_path / ".incoming").iterdir())
+
+
+def test_filesystem_rejects_path_locators(tmp_path):
+    store = FilesystemBlobStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.open("../" + "a" * 61)
+
+
+def test_s3_round_trip(monkeypatch):
+    # moto's in-process S3 stands in for MinIO
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        import boto3
+        boto3.client("s3").create_bucket(Bucket="vault")
+        store = blobstore.S3BlobStore(bucket="vault", prefix="containers/")
+        _round_trip(store)
+
+
+@pytest.mark.parametrize("backend", ["postgresql", "filesystem"])
+def test_vault_upload_download_per_backend(backend, tmp_path, monkeypatch, client, make_user, upload):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "VAULT_STORAGE_BACKEND", backend)
+    monkeypatch.setattr(settings, "VAULT_BLOB_DIR", str(tmp_path / "blobs"))
+    blobstore.get_blob_store.cache_clear()
+
+    _, headers = make_user()
+    data = os.urandom(2 * 1024 * 1024 + 100)
+    file = upload(headers, data)
+    response = client.get(f"/api/vault/files/{file['id']}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.content == data
+
+    def blobs():
+        return [p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]
+    assert len(blobs()) == (1 if backend == "filesystem" else 0)
+
+    assert client.delete(f"/api/vault/files/{file['id']}", headers=headers).status_code == 200
+    assert blobs() == []
+    blobstore.get_blob_store.cache_clear()
+
+
+def test_incomplete_backend_cannot_be_created():
+    class NoDelete(blobstore.BlobStore):
+        def put(self, source):
+            return ""
+
+        def open(self, locator):
+            return io.BytesIO()
+
+        def exists(self, locator):
+            return False
+
+    with pytest.raises(TypeError):
+        NoDelete()
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from app.core.ssce import DEFAULT_CHUNK_SIZE
+
+FRAME = DEFAULT_CHUNK_SIZE
+
+
+@pytest.fixture
+def stored(make_user, upload):
+    """A file spanning several frames -> (headers, file JSON, plaintext)."""
+    _, headers = make_user()
+    data = os.urandom(3 * FRAME + 12345)
+    return headers, upload(headers, data), data
+
+
+def _get(client, headers, file, **extra):
+    return client.get(f"/api/vault/files/{file['id']}/download", headers={**headers, **extra})
+
+
+@pytest.mark.parametrize("spec, start, end", [
+    ("bytes=0-99", 0, 99),
+    (f"bytes={FRAME - 10}-{FRAME + 9}", FRAME - 10, FRAME + 9),     # across a frame boundary
+    (f"bytes={FRAME}-{3 * FRAME}", FRAME, 3 * FRAME),               # whole frames plus one byte
+    (f"bytes={2 * FRAME + 5}-", 2 * FRAME + 5, None),                # open-ended
+    ("bytes=-500", -500, None),                                      # suffix
+    ("bytes=100-999999999", 100, None),                              # end clamped to the size
+])
+def test_range(client, stored, spec, start, end):
+    headers, file, data = stored
+    expected = data[start:] if end is None else data[start:end + 1]
+    response = _get(client, headers, file, Range=spec)
+    assert response.status_code == 206
+    assert response.content == expected
+    first = start if start >= 0 else len(data) + start
+    assert response.headers["Content-Range"] == f"bytes {first}-{first + len(expected) - 1}/{len(data)}"
+    assert response.headers["Content-Length"] == str(len(expected))
+
+
+def test_full_download_advertises_ranges(client, stored):
+    headers, file, data = stored
+    response = _get(client, headers, file)
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"] == f'"{file["sha256"]}"'
+
+
+def test_unsatisfiable_range(client, stored):
+    headers, file, data = stored
+    response = _get(client, headers, file, Range=f"bytes={len(data)}-")
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(data)}"
+
+
+@pytest.mark.parametrize("spec", ["bytes=0-1,5-6", "items=0-5", "bytes=9-3", "bytes=x-"])
+def test_ignored_ranges_get_the_whole_file(client, stored, spec):
+    headers, file, data = stored
+    response = _get(client, headers, file, Range=spec)
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_if_range(client, stored):
+    headers, file, data = stored
+    etag = _get(client, headers, file).headers["ETag"]
+    matching = _get(client, headers, file, Range="bytes=0-9", **{"If-Range": etag})
+    assert matching.status_code == 206 and matching.content == data[:10]
+    stale = _get(client, headers, file, Range="bytes=0-9", **{"If-Range": '"0000"'})
+    assert stale.status_code == 200 and stale.content == data
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Every container stream the download route opens."""
+    from app import vault_routes
+
+    streams = []
+    open_container = vault_routes._open_container
+
+    def _open(*args, **kwargs):
+        streams.append(open_container(*args, **kwargs))
+        return streams[-1]
+    monkeypatch.setattr(vault_routes, "_open_container", _open)
+    return streams
+
+
+def test_source_is_closed_after_the_download(client, stored, opened):
+    headers, file, data = stored
+    assert _get(client, headers, file, Range="bytes=0-9").content == data[:10]
+    assert _get(client, headers, file).content == data
+    assert len(opened) == 2 and all(s.closed for s in opened)
+
+
+def test_source_is_closed_when_the_response_is_never_sent(client, stored, opened, monkeypatch):
+    from app import vault_routes
+
+    headers, file, _ = stored
+    audit = vault_routes._audit
+
+    def _audit(db, **kwargs):
+        if kwargs.get("event_type") == "download":
+            raise RuntimeError("audit insert failed")
+        return audit(db, **kwargs)
+    monkeypatch.setattr(vault_routes, "_audit", _audit)
+    with pytest.raises(RuntimeError):
+        _get(client, headers, file)
+    assert len(opened) == 1 and opened[0].closed
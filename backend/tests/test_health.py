@@ -0,0 +1,25 @@
+import pytest
+
+from app.core.config import get_settings
+
+DETAILED = ["/health/keyring", "/health/keycache", "/health/scrubber", "/health/malware", "/health/db"]
+
+
+def test_liveness_is_public(client):
+    assert client.get("/health").json() == {"status": "ok"}
+
+
+@pytest.mark.parametrize("path", DETAILED)
+def test_details_disabled_without_token(client, monkeypatch, path):
+    monkeypatch.setattr(get_settings(), "HEALTH_DETAILS_TOKEN", "")
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("path", DETAILED)
+def test_details_require_token(client, monkeypatch, path):
+    monkeypatch.setattr(get_settings(), "HEALTH_DETAILS_TOKEN", "s3cret-health")
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get(path, headers={"Authorization": "Bearer s3cret-health"})
+    assert response.status_code == 200, response.text
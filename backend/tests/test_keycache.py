@@ -0,0 +1,60 @@
+import hashlib
+import threading
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.core.keycache import KeyCache
+
+
+def _derive(cache_key):
+    return lambda: hashlib.sha256(repr(cache_key).encode()).digest()
+
+
+def test_hit_miss_and_ttl():
+    now = [0.0]
+    cache = KeyCache(max_entries=4, ttl_seconds=10, clock=lambda: now[0])
+    ck = ("u1", 1, "vault-wrap")
+    assert cache.get_key(ck, _derive(ck)) == _derive(ck)()
+    assert cache.get_key(ck, lambda: b"never called") == _derive(ck)()
+    now[0] = 11
+    assert cache.get_key(ck, lambda: b"\x01" * 32) == b"\x01" * 32
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_invalidate_by_user():
+    cache = KeyCache(max_entries=8, ttl_seconds=60)
+    for ck in (("a", 1, "p"), ("a", 2, "p"), ("b", 1, "p")):
+        cache.get_key(ck, _derive(ck))
+    cache.invalidate(user_id="a")
+    assert cache.stats()["size"] == 1
+
+
+def test_concurrent_eviction_never_returns_wiped_keys():
+    # More live keys than slots, so entries are evicted (and zeroed) while
+    # other threads are handing them out.
+    cache = KeyCache(max_entries=2, ttl_seconds=60)
+    keys = [(f"user{i}", 1, "vault-wrap") for i in range(5)]
+    errors = []
+
+    def worker(offset):
+        for n in range(3000):
+            ck = keys[(n + offset) % len(keys)]
+            expected = _derive(ck)()
+            if cache.get_key(ck, _derive(ck)) != expected:
+                errors.append(("key", ck))
+            sealed = cache.get_cipher(ck, _derive(ck)).encrypt(b"\x00" * 12, b"probe", None)
+            try:
+                AESGCM(expected).decrypt(b"\x00" * 12, sealed, None)
+            except InvalidTag:
+                errors.append(("cipher", ck))
+            if n % 500 == 0:
+                cache.invalidate(user_id=ck[0])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
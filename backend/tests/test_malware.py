@@ -0,0 +1,403 @@
+import os
+import socket
+import struct
+import threading
+
+import pytest
+
+from app.core import malware
+from app.core.config import get_settings
+from app.core.malware import ClamdPool, ScanStream, ScanWorker, VerdictCache, scan_blocks, scan_status
+from app.db import models
+
+EICAR = b"X5O!P%@AP[4\\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+
+
+class FakeClamd:
+    """Just enough of clamd's socket protocol: IDSESSION, INSTREAM, VERSION, PING, END.
+
+    Streams containing EICAR are FOUND, streams containing ``error_marker``
+    get an ERROR reply, and streams longer than ``stream_max`` are cut off
+    the way clamd enforces StreamMaxLength.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = 27000
+        self.stream_max = 1 << 30
+        self.error_marker = b"\0trigger-error\0"
+        self.connects = 0
+        self.scans = 0
+        self._conns: list[socket.socket] = []
+        self._srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._srv.bind(path)
+        self._srv.listen(16)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def stop(self) -> None:
+        """Shut down the daemon, ending every open session."""
+        self._srv.close()
+        for conn in self._conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        os.unlink(self.path)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            self.connects += 1
+            self._conns.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(conn, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            part = conn.recv(n - len(data))
+            if not part:
+                raise EOFError
+            data += part
+        return data
+
+    def _command(self, conn) -> bytes:
+        data = b""
+        while not data.endswith(b"\0"):
+            data += self._read(conn, 1)
+        return data[:-1]
+
+    def _serve(self, conn) -> None:
+        try:
+            if self._command(conn) != b"zIDSESSION":
+                return
+            ident = 0
+            while True:
+                command = self._command(conn)
+                if command == b"zEND":
+                    return
+                ident += 1
+                prefix = f"{ident}: ".encode()
+                if command == b"zPING":
+                    conn.sendall(prefix + b"PONG\0")
+                elif command == b"zVERSION":
+                    conn.sendall(prefix + f"ClamAV 1.4.1/{self.db}/Sat Oct 18 09:00:00 2026\0".encode())
+                elif command == b"zINSTREAM":
+                    if not self._instream(conn, prefix):
+                        return
+                else:
+                    conn.sendall(prefix + b"UNKNOWN COMMAND\0")
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _instream(self, conn, prefix: bytes) -> bool:
+        data = b""
+        while True:
+            (length,) = struct.unpack("!L", self._read(conn, 4))
+            if length == 0:
+                break
+            data += self._read(conn, length)
+            if len(data) > self.stream_max:
+                conn.sendall(prefix + b"INSTREAM size limit exceeded. ERROR\0")
+                return False
+        self.scans += 1
+        if EICAR in data:
+            conn.sendall(prefix + b"stream: Eicar-Test-Signature FOUND\0")
+        elif self.error_marker in data:
+            conn.sendall(prefix + b"stream: Can't allocate memory ERROR\0")
+        else:
+            conn.sendall(prefix + b"stream: OK\0")
+        return True
+
+
+@pytest.fixture
+def clamd(tmp_path):
+    daemon = FakeClamd(str(tmp_path / "clamd.sock"))
+    yield daemon
+    try:
+        daemon.stop()
+    except OSError:
+        pass
+
+
+@pytest.fixture
+def pool(clamd):
+    pool = ClamdPool(socket_path=clamd.path, size=2, timeout=5)
+    yield pool
+    pool.close()
+
+
+def test_sessions_are_reused(clamd, pool):
+    for _ in range(5):
+        result, reached = scan_blocks([b"hello ", b"world"], pool)
+        assert reached and result.clean and result.scanner == "clamav"
+    assert clamd.scans == 5
+    assert clamd.connects == 1
+    assert pool.stats()["reused"] == 4
+
+
+def test_found_reply_is_a_detection(clamd, pool):
+    stream = ScanStream(pool)
+    stream.feed(b"prefix " + EICAR[:20])
+    stream.feed(EICAR[20:] + b" suffix")
+    result = stream.finish()
+    assert not result.clean
+    assert result.threat == "Eicar-Test-Signature"
+    assert scan_status(result) == "infected"
+    assert pool.stats()["infected"] == 1
+    # The session is still good for the next scan
+    assert scan_blocks([b"clean"], pool)[0].clean
+    assert clamd.connects == 1
+
+
+def test_error_reply_is_unavailable_not_infected(clamd, pool, SessionLocal):
+    result, reached = scan_blocks([b"data" + clamd.error_marker], pool)
+    assert result.clean
+    assert result.scanner == "unavailable:clamd-error"
+    assert scan_status(result) == "unavailable"
+    assert pool.stats()["infected"] == 0
+
+    cache = VerdictCache(pool)
+    cache.store("a" * 64, result)
+    assert cache.lookup("a" * 64) is None
+    db = SessionLocal()
+    assert db.query(models.VaultScanVerdict).count() == 0
+    db.close()
+
+    # The session that answered with an error is not reused
+    assert scan_blocks([b"clean"], pool)[0].clean
+    assert clamd.connects == 2
+
+
+def test_unrecognised_reply_is_unavailable():
+    result, well_formed = malware._parse_verdict("stream: something else entirely")
+    assert not well_formed
+    assert result.clean and scan_status(result) == "unavailable"
+
+
+def test_reconnects_after_clamd_restarts(tmp_path, clamd, pool):
+    assert scan_blocks([b"one"], pool)[0].scanner == "clamav"
+    clamd.stop()
+    # The pooled session is dead and nothing listens: an unavailable PASS
+    result, reached = scan_blocks([b"two"], pool)
+    assert not reached and scan_status(result) == "unavailable"
+    assert not pool.available()
+
+    restarted = FakeClamd(clamd.path)
+    try:
+        pool._down_until = 0.0                  # skip the backoff window
+        result, reached = scan_blocks([EICAR], pool)
+        assert reached and not result.clean
+        assert restarted.connects == 1
+    finally:
+        restarted.stop()
+
+
+def test_worker_scans_pending_uploads(clamd, pool, make_user, upload, SessionLocal, monkeypatch):
+    monkeypatch.setattr(get_settings(), "VAULT_SCAN_MODE", "async")
+    _, headers = make_user()
+    clean = upload(headers, b"nothing to see here", name="clean.txt")
+    infected = upload(headers, EICAR, name="eicar.com")
+    assert clean["malware_scan_status"] == infected["malware_scan_status"] == "pending"
+
+    worker = ScanWorker(batch=10, pool=pool, cache=VerdictCache(pool))
+    assert worker.walk()
+    assert not worker.walk()
+
+    db = SessionLocal()
+    status = {str(f.id): f.malware_scan_status for f in db.query(models.VaultFile)}
+    blocked = db.query(models.VaultAuditLog).filter_by(event_type="malware_blocked").count()
+    verdicts = db.query(models.VaultScanVerdict).count()
+    db.close()
+    assert status == {clean["id"]: "clean", infected["id"]: "infected"}
+    assert blocked == 1
+    assert verdicts == 2
+    assert worker.stats()["scanned"] == 1 and worker.stats()["infected"] == 1
+    assert clamd.connects == 1
+
+
+def test_stream_limit_refuses_the_file(clamd, pool, SessionLocal):
+    clamd.stream_max = 100 * 1024
+    result, reached = scan_blocks([os.urandom(64 * 1024) for _ in range(8)], pool)
+    assert reached
+    assert not result.clean
+    assert scan_status(result) == malware.UNSCANNABLE
+    assert pool.stats()["refused"] == 1 and pool.stats()["infected"] == 0
+
+    cache = VerdictCache(pool)
+    cache.store("b" * 64, result)
+    assert cache.lookup("b" * 64) is None
+
+
+def test_inline_upload_over_stream_limit_is_rejected(clamd, pool, client, make_user, SessionLocal, monkeypatch):
+    monkeypatch.setattr(malware, "clamd_pool", pool)
+    monkeypatch.setattr(malware, "verdict_cache", VerdictCache(pool))
+    clamd.stream_max = 100 * 1024
+    _, headers = make_user()
+
+    response = client.post("/api/vault/upload", headers=headers,
+                           files={"file": ("big.bin", os.urandom(300 * 1024), "application/octet-stream")})
+    assert response.status_code == 413
+    assert "too large to scan" in response.json()["detail"]
+
+    db = SessionLocal()
+    assert db.query(models.VaultFile).count() == 0
+    assert db.query(models.VaultAuditLog).filter_by(event_type="scan_refused").count() == 1
+    db.close()
+
+
+def test_worker_quarantines_files_over_stream_limit(clamd, pool, client, make_user, upload, monkeypatch):
+    monkeypatch.setattr(get_settings(), "VAULT_SCAN_MODE", "async")
+    clamd.stream_max = 100 * 1024
+    _, headers = make_user()
+    big = upload(headers, os.urandom(300 * 1024), name="big.bin")
+
+    worker = ScanWorker(batch=10, pool=pool, cache=VerdictCache(pool))
+    worker.walk()
+    assert worker.stats()[malware.UNSCANNABLE] == 1
+
+    response = client.get(f"/api/vault/files/{big['id']}/download", headers=headers)
+    assert response.status_code == 403
+    assert "too large to scan" in response.json()["detail"]
+
+
+def test_worker_quarantines_unreadable_containers(clamd, pool, client, make_user, upload, SessionLocal, monkeypatch):
+    monkeypatch.setattr(get_settings(), "VAULT_SCAN_MODE", "async")
+    _, headers = make_user()
+    file = upload(headers, os.urandom(5000), name="damaged.bin")
+    db = SessionLocal()
+    payload = db.query(models.VaultPayload).one()
+    payload.encrypted_data = payload.encrypted_data[:-100]
+    db.commit()
+    db.close()
+
+    worker = ScanWorker(batch=10, pool=pool, cache=VerdictCache(pool))
+    worker.walk()
+    assert worker.stats()["unreadable"] == 1 and worker.stats()["scanned"] == 0
+    assert clamd.scans == 0
+
+    db = SessionLocal()
+    assert db.query(models.VaultFile).one().malware_scan_status == malware.SCAN_ERROR
+    assert db.query(models.VaultAuditLog).filter_by(event_type="scan_failed").count() == 1
+    assert db.query(models.VaultScanVerdict).count() == 0
+    db.close()
+    response = client.get(f"/api/vault/files/{file['id']}/download", headers=headers)
+    assert response.status_code == 403
+    assert "could not be read" in response.json()["detail"]
+
+
+def test_verdict_cache_keeps_newer_signature_versions(clamd, pool, SessionLocal):
+    new_node = VerdictCache(pool)
+    old_pool = ClamdPool(socket_path=clamd.path, size=1, timeout=5)
+    old_node = VerdictCache(old_pool)
+    clean = malware.MalwareScanResult(clean=True)
+
+    clamd.db = 27000
+    new_node.store("1" * 64, clean)
+    assert old_pool.signature_version() == "ClamAV 1.4.1/27000"
+    clamd.db = 27001                            # rolling update: only new_node sees it
+    pool._version_at = 0.0
+    new_node.store("2" * 64, clean)             # purges the 27000 row
+    old_node.store("3" * 64, clean)             # a node still on 27000 must not purge 27001
+
+    db = SessionLocal()
+    remaining = {r.sha256: r.signature_version for r in db.query(models.VaultScanVerdict)}
+    db.close()
+    assert remaining == {"2" * 64: "ClamAV 1.4.1/27001", "3" * 64: "ClamAV 1.4.1/27000"}
+    assert new_node.lookup("2" * 64) is not None
+
+    old_pool._version_at = 0.0                  # old_node picks up the new database
+    clamd.db = 27001
+    old_node.store("4" * 64, clean)
+    db = SessionLocal()
+    remaining = {r.sha256: r.signature_version for r in db.query(models.VaultScanVerdict)}
+    db.close()
+    assert remaining == {"2" * 64: "ClamAV 1.4.1/27001", "4" * 64: "ClamAV 1.4.1/27001"}
+    old_pool.close()
+
+
+def test_resumable_upload_refused_by_the_scan_is_dropped(clamd, pool, client, make_user, monkeypatch):
+    monkeypatch.setattr(malware, "clamd_pool", pool)
+    monkeypatch.setattr(malware, "verdict_cache", VerdictCache(pool))
+    clamd.stream_max = 100 * 1024
+    _, headers = make_user()
+    data = os.urandom(300 * 1024)
+
+    created = client.post("/api/vault/uploads", headers=headers,
+                          json={"filename": "big.bin", "size": len(data)}).json()
+    step = created["chunk_size"]
+    for offset in range(0, len(data), step):
+        response = client.put(f"/api/vault/uploads/{created['upload_id']}/chunks/{offset}",
+                              content=data[offset:offset + step], headers=headers)
+        assert response.status_code == 200, response.text
+    response = client.post(f"/api/vault/uploads/{created['upload_id']}/complete", headers=headers)
+    assert response.status_code == 413
+    assert client.get(f"/api/vault/uploads/{created['upload_id']}", headers=headers).status_code == 404
+
+
+def test_inline_upload_scans_and_builds_in_one_pass(clamd, pool, client, make_user, upload, SessionLocal, monkeypatch):
+    from app import vault_routes
+
+    monkeypatch.setattr(malware, "clamd_pool", pool)
+    monkeypatch.setattr(malware, "verdict_cache", VerdictCache(pool))
+    passes = []
+    reread = vault_routes._reread
+    monkeypatch.setattr(vault_routes, "_reread", lambda f: passes.append(1) or reread(f))
+    _, headers = make_user()
+    data = os.urandom(3 * 1024 * 1024)
+
+    assert upload(headers, data)["malware_scan_status"] == "clean"
+    assert (len(passes), clamd.scans) == (1, 1)
+    # Cached verdict and a dedup hit: nothing to read again
+    upload(headers, data, name="copy.bin")
+    assert (len(passes), clamd.scans) == (1, 1)
+
+    response = client.post("/api/vault/upload", headers=headers,
+                           files={"file": ("eicar.com", data[:1000] + EICAR, "application/octet-stream")})
+    assert response.status_code == 422
+    assert (len(passes), clamd.scans) == (2, 2)
+    db = SessionLocal()
+    assert db.query(models.VaultPayload).count() == 1
+    db.close()
+
+
+def test_batch_upload_scans_each_content_once(clamd, pool, client, make_user, SessionLocal, monkeypatch):
+    monkeypatch.setattr(malware, "clamd_pool", pool)
+    monkeypatch.setattr(malware, "verdict_cache", VerdictCache(pool))
+    _, headers = make_user()
+    data = os.urandom(100_000)
+    files = [("a.bin", data), ("eicar.com", EICAR), ("a-copy.bin", data)]
+    response = client.post("/api/vault/upload/batch", headers=headers,
+                           files=[("files", (n, d, "application/octet-stream")) for n, d in files])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["uploaded"] == 2
+    assert "malware detected" in body["files"][1]["error"]
+    assert clamd.scans == 2
+
+    db = SessionLocal()
+    assert db.query(models.VaultPayload).count() == 1
+    assert db.query(models.VaultAuditLog).filter_by(event_type="malware_blocked").count() == 1
+    db.close()
+
+
+def test_infected_upload_is_not_a_dictionary_sample(clamd, pool, client, make_user, upload, monkeypatch):
+    from app.core import zstd_dicts
+
+    monkeypatch.setattr(malware, "clamd_pool", pool)
+    monkeypatch.setattr(malware, "verdict_cache", VerdictCache(pool))
+    monkeypatch.setattr(get_settings(), "VAULT_ZSTD_DICT_ENABLED", True)
+    monkeypatch.setattr(zstd_dicts, "_pools", zstd_dicts._Reservoirs(capacity=16, max_bytes=1 << 20))
+    user, headers = make_user()
+
+    upload(headers, b"quarterly figures, clean " * 20, name="clean.txt")
+    response = client.post("/api/vault/upload", headers=headers,
+                           files={"file": ("eicar.txt", b"notes " * 20 + EICAR, "text/plain")})
+    assert response.status_code == 422
+    assert zstd_dicts._pools.take(str(user.id)) == [b"quarterly figures, clean " * 20]
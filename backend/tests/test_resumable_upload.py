@@ -0,0 +1,117 @@
+import hashlib
+import os
+
+import pytest
+
+from app import vault_routes
+from app.db import models
+
+
+class Resumable:
+    """Client side of one resumable upload."""
+
+    def __init__(self, client, headers, data: bytes, filename: str = "big.bin"):
+        self.client, self.headers, self.data = client, headers, data
+        response = client.post("/api/vault/uploads", headers=headers,
+                               json={"filename": filename, "size": len(data)})
+        assert response.status_code == 200, response.text
+        self.status = response.json()
+        self.id = self.status["upload_id"]
+        self.chunk_size = self.status["chunk_size"]
+
+    def put(self, offset: int, body: bytes = None, sha256: str = None):
+        body = self.data[offset:offset + self.chunk_size] if body is None else body
+        headers = dict(self.headers)
+        if sha256:
+            headers["X-Chunk-SHA256"] = sha256
+        return self.client.put(f"/api/vault/uploads/{self.id}/chunks/{offset}", content=body, headers=headers)
+
+    def get(self):
+        return self.client.get(f"/api/vault/uploads/{self.id}", headers=self.headers)
+
+    def complete(self):
+        return self.client.post(f"/api/vault/uploads/{self.id}/complete", headers=self.headers)
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()[1]
+
+
+def test_out_of_order_chunks_round_trip(client, user, SessionLocal):
+    data = os.urandom(3 * vault_routes.RESUMABLE_CHUNK_SIZE + 12345)
+    up = Resumable(client, user, data)
+    cs = up.chunk_size
+    assert up.status["chunk_count"] == 4
+    assert up.status["missing"] == [0, cs, 2 * cs, 3 * cs]
+
+    assert up.put(3 * cs).json()["size"] == 12345
+    assert up.put(cs).status_code == 200
+    assert up.put(cs).status_code == 200                    # re-sending a stored chunk is a no-op
+
+    early = up.complete()
+    assert early.status_code == 409
+    assert early.json()["detail"]["missing"] == [0, 2 * cs]
+
+    progress = up.get().json()
+    assert progress["missing"] == [0, 2 * cs]
+    assert [c["offset"] for c in progress["received"]] == [cs, 3 * cs]
+    assert progress["received"][0]["sha256"] == hashlib.sha256(data[cs:2 * cs]).hexdigest()
+
+    for offset in progress["missing"]:
+        assert up.put(offset, sha256=hashlib.sha256(data[offset:offset + cs]).hexdigest()).status_code == 200
+    done = up.complete()
+    assert done.status_code == 200, done.text
+    assert done.json()["deduplicated"] is False
+    file_id = done.json()["file"]["id"]
+    assert client.get(f"/api/vault/files/{file_id}/download", headers=user).content == data
+
+    assert up.get().status_code == 404
+    db = SessionLocal()
+    assert db.query(models.VaultUploadChunk).count() == 0
+    assert db.query(models.VaultUploadSession).count() == 0
+    db.close()
+
+    again = Resumable(client, user, data, filename="copy.bin")
+    for offset in again.status["missing"]:
+        again.put(offset)
+    assert again.complete().json()["deduplicated"] is True
+
+
+def test_chunk_validation(client, user):
+    up = Resumable(client, user, os.urandom(1000))
+    assert up.put(0, sha256="00" * 32).status_code == 400
+    assert up.put(0, body=b"short").status_code == 400
+    assert up.put(7).status_code == 400                      # not a chunk boundary
+    assert up.put(0).status_code == 200
+
+
+def test_empty_file(client, user):
+    done = Resumable(client, user, b"", filename="empty.txt").complete()
+    assert done.status_code == 200, done.text
+    assert done.json()["file"]["size_bytes"] == 0
+
+
+def test_cancel_and_size_limit(client, user):
+    up = Resumable(client, user, b"0123456789")
+    assert client.delete(f"/api/vault/uploads/{up.id}", headers=user).json() == {"success": True}
+    assert up.get().status_code == 404
+    too_big = client.post("/api/vault/uploads", headers=user,
+                          json={"filename": "x", "size": vault_routes.MAX_FILE_SIZE + 1})
+    assert too_big.status_code == 413
+
+
+def test_corrupt_staged_chunk_is_asked_for_again(client, user, SessionLocal):
+    up = Resumable(client, user, os.urandom(100), filename="c.bin")
+    up.put(0)
+    db = SessionLocal()
+    chunk = db.query(models.VaultUploadChunk).one()
+    chunk.encrypted_data = chunk.encrypted_data[:-1] + bytes([chunk.encrypted_data[-1] ^ 1])
+    db.commit()
+    db.close()
+
+    response = up.complete()
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing"] == [0]
+    up.put(0)
+    assert up.complete().status_code == 200
@@ -0,0 +1,117 @@
+import io
+import os
+import uuid
+
+import pytest
+
+import rotate_vault_keys
+from app.core import blobstore, ssce
+from app.core.config import get_settings
+from app.core.keycache import key_cache
+from app.core.keyring import KeyRing
+from app.db import models
+
+SECRETS = {1: "old-root-secret-" + "a" * 32, 2: "new-root-secret-" + "b" * 32}
+
+
+@pytest.fixture
+def use_ring(monkeypatch):
+    """Factory: install a ring with the given versions (default both) and current version."""
+    def _use(current: int, versions=(1, 2)):
+        ring = KeyRing(current=current, secrets={v: SECRETS[v] for v in versions})
+        monkeypatch.setattr(ssce, "key_ring", ring)
+        key_cache.clear()
+        return ring
+    yield _use
+    key_cache.clear()
+
+
+def _v1_container(data: bytes, user_id: str) -> bytes:
+    container, meta = ssce.build_container(data, filename="a.bin", content_type="application/octet-stream",
+                                           user_id=user_id)
+    assert meta.key_version == 1
+    return container
+
+
+@pytest.mark.parametrize("block_size", [1024 * 1024, 7])
+def test_rewrap_round_trip(use_ring, block_size):
+    use_ring(current=1)
+    user_id = str(uuid.uuid4())
+    data = os.urandom(2 * ssce.DEFAULT_CHUNK_SIZE + 12345)
+    old = _v1_container(data, user_id)
+
+    use_ring(current=2)
+    sink = io.BytesIO()
+    size, meta, digest = ssce.rewrap_container(old, sink, block_size=block_size)
+    new = sink.getvalue()
+    assert size == len(new)
+    assert meta.key_version == 2
+    assert new[-32:] == digest
+    assert len(new) == len(old)
+
+    # Only the new root is needed from here on
+    use_ring(current=2, versions=(2,))
+    assert ssce.verify_container_integrity(new)["hmac_valid"]
+    plaintext, parsed = ssce.parse_container(new)
+    assert plaintext == data
+    assert parsed.key_version == 2
+    with pytest.raises(ValueError):
+        ssce.parse_container(old)
+
+
+def test_rewrap_refuses_tampered_or_truncated_containers(use_ring):
+    use_ring(current=1)
+    old = _v1_container(os.urandom(5000), str(uuid.uuid4()))
+    use_ring(current=2)
+
+    tampered = bytearray(old)
+    tampered[len(old) // 2] ^= 1
+    with pytest.raises(ValueError):
+        ssce.rewrap_container(bytes(tampered), io.BytesIO())
+    with pytest.raises(ValueError):
+        ssce.rewrap_container(old[:-40], io.BytesIO())
+
+
+@pytest.mark.parametrize("backend", ["postgresql", "filesystem"])
+def test_rotate_vault_keys(backend, tmp_path, monkeypatch, use_ring, client, make_user, upload, SessionLocal):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "VAULT_STORAGE_BACKEND", backend)
+    monkeypatch.setattr(settings, "VAULT_BLOB_DIR", str(tmp_path / "blobs"))
+    blobstore.get_blob_store.cache_clear()
+
+    use_ring(current=1)
+    _, headers = make_user()
+    data = os.urandom(ssce.DEFAULT_CHUNK_SIZE + 999)
+    files = [upload(headers, data, name="a.bin"), upload(headers, data, name="a-copy.bin")]
+    db = SessionLocal()
+    old_locator = db.query(models.VaultPayload).one().storage_locator
+    db.close()
+
+    use_ring(current=2)
+    stats = rotate_vault_keys._Stats()
+    rotate_vault_keys._rotate_table(SessionLocal, "vault_payloads", target=2, commit=True, batch_size=10,
+                                    workers=2, keep_old_blobs=False, stats=stats)
+    assert (stats.ok, stats.err) == (1, 0)
+
+    db = SessionLocal()
+    payload = db.query(models.VaultPayload).one()
+    assert payload.key_version == 2
+    assert {f.key_version for f in db.query(models.VaultFile)} == {2}
+    assert {f.hmac for f in db.query(models.VaultFile)} == {payload.hmac}
+    db.close()
+    if backend == "filesystem":
+        assert payload.storage_locator != old_locator
+        assert [p.name for p in (tmp_path / "blobs").rglob("*") if p.is_file()] == [payload.storage_locator]
+
+    use_ring(current=2, versions=(2,))
+    for file in files:
+        response = client.get(f"/api/vault/files/{file['id']}/download", headers=headers)
+        assert response.status_code == 200
+        assert response.content == data
+
+    # Nothing left to rotate: a second run skips every row
+    again = rotate_vault_keys._Stats()
+    rotate_vault_keys._rotate_table(SessionLocal, "vault_payloads", target=2, commit=True, batch_size=10,
+                                    workers=2, keep_old_blobs=False, stats=again)
+    assert (again.ok, again.err) == (0, 0)
+    blobstore.get_blob_store.cache_clear()
@@ -0,0 +1,53 @@
+import os
+import tracemalloc
+
+import pytest
+
+from app.core import ssce
+
+USER = "00000000-0000-0000-0000-000000000001"
+
+
+def _container(data: bytes) -> bytes:
+    container, _ = ssce.build_container(data, filename="f.bin", content_type="application/octet-stream",
+                                        user_id=USER)
+    return container
+
+
+def _verify_in_blocks(container: bytes, block_size: int) -> dict:
+    verifier = ssce.ContainerVerifier()
+    for off in range(0, len(container), block_size):
+        verifier.update(container[off:off + block_size])
+    return verifier.result()
+
+
+@pytest.mark.parametrize("size", [0, 100, ssce.DEFAULT_CHUNK_SIZE * 2 + 5])
+def test_build_parse_round_trip(size):
+    data = os.urandom(size)
+    plaintext, meta = ssce.parse_container(_container(data))
+    assert plaintext == data
+    assert meta.original_size == size
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 4096, 10 ** 9])
+def test_streaming_verifier_any_block_size(block_size):
+    container = _container(os.urandom(70_000) if block_size > 1 else b"small payload" * 50)
+    assert _verify_in_blocks(container, block_size)["integrity_ok"]
+
+
+def test_verifier_detects_tampering():
+    container = bytearray(_container(os.urandom(50_000)))
+    container[len(container) // 2] ^= 1
+    result = ssce.verify_container_integrity(bytes(container))
+    assert not result["hmac_valid"] and not result["integrity_ok"]
+
+
+def test_verify_in_place_does_not_copy_the_container():
+    container = _container(os.urandom(16 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        assert ssce.verify_container_integrity(container)["integrity_ok"]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 1024 * 1024
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+import reconcile_vault_usage
+from app import vault_routes
+from app.core import usage
+from app.db import models
+
+
+def test_current_does_not_write(SessionLocal, make_user, upload):
+    user, headers = make_user()
+    upload(headers, b"a" * 1000)
+    db = SessionLocal()
+    db.query(models.VaultUsage).delete()
+    db.commit()
+
+    row = usage.current(db, user.id)
+    assert (row.file_count, row.plaintext_bytes) == (1, 1000)
+    assert row not in db
+    db.commit()
+    assert db.query(models.VaultUsage).count() == 0
+
+    # The write paths create the row
+    usage.charge(db, user.id, plaintext=10, container=20)
+    db.commit()
+    assert db.get(models.VaultUsage, user.id).plaintext_bytes == 1010
+    db.close()
+
+
+def test_read_paths_leave_no_usage_row_behind(client, SessionLocal, AsyncSessionLocal, make_user):
+    _, headers = make_user()
+    for path in ("/api/dashboard", "/api/vault/storage/stats"):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+    db = SessionLocal()
+    assert db.query(models.VaultUsage).count() == 0
+    db.close()
+
+
+def _counters(SessionLocal, user_id):
+    db = SessionLocal()
+    row = db.get(models.VaultUsage, user_id)
+    counters = (row.file_count, row.plaintext_bytes, row.container_bytes)
+    assert dict(zip(usage._FIELDS, counters)) == usage.aggregate(db, user_id)
+    db.close()
+    return counters
+
+
+def test_upload_and_delete_keep_the_counters(client, SessionLocal, make_user, upload):
+    user, headers = make_user()
+    a, b = os.urandom(3000), os.urandom(5000)
+    first = upload(headers, a, name="a.bin")
+    files, plaintext, container = _counters(SessionLocal, user.id)
+    assert (files, plaintext) == (1, 3000)
+    assert container == first["container_size"]
+
+    copy = upload(headers, a, name="a-copy.bin")             # deduplicated: no new container bytes
+    assert _counters(SessionLocal, user.id) == (2, 6000, container)
+    upload(headers, b, name="b.bin")
+    assert _counters(SessionLocal, user.id)[:2] == (3, 11000)
+
+    for file in (first, copy):
+        assert client.delete(f"/api/vault/files/{file['id']}", headers=headers).status_code == 200
+    assert _counters(SessionLocal, user.id)[:2] == (1, 5000)
+
+    stats = client.get("/api/vault/storage/stats", headers=headers).json()
+    assert (stats["file_count"], stats["total_size_bytes"]) == (1, 5000)
+
+
+def test_quota_refuses_the_upload_that_does_not_fit(client, SessionLocal, make_user, upload, monkeypatch):
+    monkeypatch.setattr(vault_routes, "VAULT_QUOTA", 1500)
+    user, headers = make_user()
+    upload(headers, b"a" * 1000)
+    response = client.post("/api/vault/upload", files={"file": ("b.bin", b"b" * 1000)}, headers=headers)
+    assert response.status_code == 413
+    assert _counters(SessionLocal, user.id)[:2] == (1, 1000)
+
+    db = SessionLocal()
+    assert db.query(models.VaultAuditLog).filter_by(user_id=user.id, event_type="quota_exceeded").count() == 1
+    with pytest.raises(usage.QuotaExceeded) as refused:
+        usage.charge(db, user.id, plaintext=501, quota=1500)
+    assert (refused.value.used, refused.value.requested) == (1000, 501)
+    usage.charge(db, user.id, plaintext=500, quota=1500)
+    db.commit()
+    assert db.get(models.VaultUsage, user.id).plaintext_bytes == 1500
+    db.close()
+
+
+def test_reconcile_repairs_drift(SessionLocal, db_url, make_user, upload, capsys):
+    user, headers = make_user()
+    upload(headers, os.urandom(2000))
+    expected = _counters(SessionLocal, user.id)
+
+    db = SessionLocal()
+    row = db.get(models.VaultUsage, user.id)
+    row.file_count, row.plaintext_bytes = 5, 1
+    db.commit()
+    drift = usage.reconcile(db, user.id)
+    assert drift == {"file_count": -4, "plaintext_bytes": 1999, "container_bytes": 0}
+    db.rollback()
+    db.close()
+
+    reconcile_vault_usage.reconcile(db_url, commit=False)
+    assert "drifted=1" in capsys.readouterr().out
+    reconcile_vault_usage.reconcile(db_url, commit=True)
+    assert _counters(SessionLocal, user.id) == expected
+    reconcile_vault_usage.reconcile(db_url, commit=True)
+    assert "drifted=0" in capsys.readouterr().out
@@ -0,0 +1,83 @@
+from app.core import zstd_dicts
+import app.db.session as db_session
+
+
+def test_train_without_database_skips_training(monkeypatch):
+    monkeypatch.setattr(db_session, "SessionLocal", None)
+    calls = []
+    monkeypatch.setattr(zstd_dicts.zstd, "train_dictionary", lambda *a, **kw: calls.append(a))
+    assert zstd_dicts.train("user", [b"sample %d" % i * 20 for i in range(50)]) is None
+    assert calls == []
+
+
+def _samples(tag: bytes, n: int = 200) -> list[bytes]:
+    return [b'{"owner": "%s", "record": %d, "status": "active", "notes": "quarterly figures"}' % (tag, i) * 4
+            for i in range(n)]
+
+
+def test_dictionaries_are_scoped_to_their_user(SessionLocal, make_user, monkeypatch):
+    from app.core import ssce
+    from app.core.config import get_settings
+    from app.db.models import VaultZstdDictionary
+
+    monkeypatch.setattr(get_settings(), "VAULT_ZSTD_DICT_ENABLED", True)
+    monkeypatch.setattr(zstd_dicts, "_active", type(zstd_dicts._active)())
+    alice, _ = make_user()
+    bob, _ = make_user()
+
+    dict_id = zstd_dicts.train(alice.id, _samples(b"alice"), dict_size=4096)
+    assert dict_id is not None
+    db = SessionLocal()
+    assert db.get(VaultZstdDictionary, dict_id).user_id == alice.id
+    db.close()
+
+    small = _samples(b"alice", 1)[0]
+    _, meta = ssce.build_container(small, filename="a.json", content_type="application/json",
+                                   user_id=str(alice.id))
+    assert meta.dict_id == dict_id
+    _, meta = ssce.build_container(small, filename="b.json", content_type="application/json",
+                                   user_id=str(bob.id))
+    assert not meta.dict_id
+    assert zstd_dicts.active_dictionary(bob.id) is None
+
+
+def test_sample_reservoirs_stay_within_budget():
+    pools = zstd_dicts._Reservoirs(capacity=4, max_bytes=1000)
+    for i in range(10):
+        pools.add("a", b"x" * 100)
+    assert len(pools.take("a")) == 4
+    for user in ("a", "b", "c"):
+        for _ in range(4):
+            pools.add(user, b"y" * 100)
+    assert pools.take("a") == []             # least recently offered, evicted
+    assert len(pools.take("c")) == 4
+
+
+def test_slow_refresh_does_not_block_other_lookups(monkeypatch):
+    import threading
+
+    from app.core.config import get_settings
+
+    monkeypatch.setattr(get_settings(), "VAULT_ZSTD_DICT_ENABLED", True)
+    monkeypatch.setattr(zstd_dicts, "_active", type(zstd_dicts._active)())
+    inside, release = threading.Event(), threading.Event()
+
+    def _fetch(user_id, known_id):
+        if user_id == "slow":
+            inside.set()
+            release.wait(10)
+        return None
+
+    monkeypatch.setattr(zstd_dicts, "_fetch_active", _fetch)
+    slow = threading.Thread(target=zstd_dicts.active_dictionary, args=("slow",))
+    slow.start()
+    assert inside.wait(10)
+    try:
+        fast = threading.Thread(target=zstd_dicts.active_dictionary, args=("fast",))
+        fast.start()
+        fast.join(5)
+        assert not fast.is_alive()
+        assert zstd_dicts.active_dictionary("slow") is None       # its own refresh in flight: cached value
+    finally:
+        release.set()
+        slow.join()
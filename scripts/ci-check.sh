@@ -4,10 +4,10 @@ set -euo pipefail
 REPO_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 cd "$REPO_ROOT"
 
-echo "[1/3] Backend syntax compile check"
+echo "[1/4] Backend syntax compile check"
 python -m compileall -q backend
 
-echo "[2/3] Backend import smoke check"
+echo "[2/4] Backend import smoke check"
 python - <<'PY'
 import importlib
 import pathlib
@@ -33,7 +33,13 @@ if failures:
 print("All backend modules imported successfully.")
 PY
 
-echo "[3/3] Frontend production build"
+echo "[3/4] Backend tests"
+(
+  cd backend
+  python -m pytest -q
+)
+
+echo "[4/4] Frontend production build"
 (
   cd frontend
   npm run build